@@ -7,14 +7,18 @@
 from fastapi import FastAPI, HTTPException
 from pydantic import BaseModel
 from typing import Dict, Any
-import openai
-import os
+import sys
+from pathlib import Path
 import uuid
 from datetime import datetime
 
-app = FastAPI(title="👨‍💻 Code Master", version="1.0.0")
+# المكونات المشتركة بين الخدمات في جذر المستودع
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from surooh_common.llm_client import llm_client
+from surooh_common.streaming import sse_response, task_events
 
-openai.api_key = os.getenv("OPENAI_API_KEY")
+app = FastAPI(title="👨‍💻 Code Master", version="1.0.0")
 
 class CodeTask(BaseModel):
     bot_name: str
@@ -44,14 +48,11 @@ class CodeMaster:
 - أفكر بالأمان والأداء
 - أستخدم أفضل الممارسات"""
 
-    async def execute_task(self, task: CodeTask):
-        """تنفيذ مهمة البرمجة بالذكاء الاصطناعي"""
+    async def execute_task(self, task: CodeTask, on_token=None):
+        """تنفيذ مهمة البرمجة بالذكاء الاصطناعي (on_token: بث الكود أثناء كتابته)"""
         try:
             print(f"👨‍💻 Code Master استلم مهمة: {task.task_description}")
             
-            import openai
-            openai.api_key = os.getenv("OPENAI_API_KEY")
-            
             system_prompt = f"""{self.personality}
 
 مهمة البرمجة: {task.task_description}
@@ -67,17 +68,17 @@ class CodeMaster:
 
 ابدأ بكتابة الكود مباشرة مع شرح مختصر."""
 
-            response = openai.chat.completions.create(
+            generated_code = await llm_client.chat_text(
                 model="gpt-4o-mini",
                 messages=[
                     {"role": "system", "content": system_prompt},
                     {"role": "user", "content": f"اكتب الكود المطلوب: {task.task_description}"}
                 ],
                 temperature=0.3,
-                max_tokens=2000
+                max_tokens=2000,
+                on_token=on_token
             )
             
-            generated_code = response.choices[0].message.content
             code_analysis = self.analyze_code(generated_code)
             
             # رد بشخصية سُروح المبرمج
@@ -138,6 +139,11 @@ async def execute_code_task(task: CodeTask):
     result = await code_master.execute_task(task)
     return result
 
+@app.post("/execute/stream")
+async def execute_code_task_stream(task: CodeTask):
+    """نفس /execute مع بث الكود أثناء كتابته (SSE: token ثم done)"""
+    return sse_response(task_events(lambda channel: code_master.execute_task(task, on_token=channel)))
+
 @app.get("/")
 async def bot_status():
     return {
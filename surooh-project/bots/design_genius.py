@@ -7,13 +7,17 @@
 from fastapi import FastAPI, HTTPException
 from pydantic import BaseModel
 from typing import Dict, Any
-import openai
-import os
+import sys
+from pathlib import Path
 from datetime import datetime
 
-app = FastAPI(title="🎨 Design Genius", version="1.0.0")
+# المكونات المشتركة بين الخدمات في جذر المستودع
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from surooh_common.llm_client import llm_client
+from surooh_common.streaming import sse_response, task_events
 
-openai.api_key = os.getenv("OPENAI_API_KEY")
+app = FastAPI(title="🎨 Design Genius", version="1.0.0")
 
 class DesignTask(BaseModel):
     bot_name: str
@@ -43,14 +47,11 @@ class DesignGenius:
 - أستخدم ألوان وخطوط مناسبة
 - أبدع حلول بصرية مبتكرة"""
 
-    async def execute_task(self, task: DesignTask):
-        """تنفيذ مهمة التصميم بالذكاء الاصطناعي"""
+    async def execute_task(self, task: DesignTask, on_token=None):
+        """تنفيذ مهمة التصميم بالذكاء الاصطناعي (on_token: بث المفهوم أثناء كتابته)"""
         try:
             print(f"🎨 Design Genius استلمت مهمة: {task.task_description}")
             
-            import openai
-            openai.api_key = os.getenv("OPENAI_API_KEY")
-            
             system_prompt = f"""{self.personality}
 
 مهمة التصميم: {task.task_description}
@@ -66,17 +67,17 @@ class DesignGenius:
 
 اعطي مفهوم تصميم كامل مع تفاصيل الألوان والخطوط والتخطيط."""
 
-            response = openai.chat.completions.create(
+            design_concept = await llm_client.chat_text(
                 model="gpt-4o-mini",
                 messages=[
                     {"role": "system", "content": system_prompt},
                     {"role": "user", "content": f"صمم حل إبداعي للمهمة: {task.task_description}"}
                 ],
                 temperature=0.7,
-                max_tokens=1500
+                max_tokens=1500,
+                on_token=on_token
             )
             
-            design_concept = response.choices[0].message.content
             design_analysis = self.analyze_design(design_concept)
             
             # رد بشخصية سُروح المصمم
@@ -135,6 +136,11 @@ async def execute_design_task(task: DesignTask):
     result = await design_genius.execute_task(task)
     return result
 
+@app.post("/execute/stream")
+async def execute_design_task_stream(task: DesignTask):
+    """نفس /execute مع بث مفهوم التصميم أثناء كتابته (SSE: token ثم done)"""
+    return sse_response(task_events(lambda channel: design_genius.execute_task(task, on_token=channel)))
+
 @app.get("/")
 async def bot_status():
     return {
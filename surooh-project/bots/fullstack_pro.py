@@ -7,13 +7,17 @@
 from fastapi import FastAPI, HTTPException
 from pydantic import BaseModel
 from typing import Dict, Any, List
-import openai
-import os
+import sys
+from pathlib import Path
 from datetime import datetime
 
-app = FastAPI(title="🏗️ Full-Stack Pro", version="1.0.0")
+# المكونات المشتركة بين الخدمات في جذر المستودع
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from surooh_common.llm_client import llm_client
+from surooh_common.streaming import sse_response, task_events
 
-openai.api_key = os.getenv("OPENAI_API_KEY")
+app = FastAPI(title="🏗️ Full-Stack Pro", version="1.0.0")
 
 class DevelopmentTask(BaseModel):
     bot_name: str
@@ -46,14 +50,11 @@ class FullStackPro:
 - أضمن الأداء والأمان
 - أنشر حلول جاهزة للإنتاج"""
 
-    async def execute_task(self, task: DevelopmentTask):
-        """تنفيذ مهمة التطوير المتكامل بالذكاء الاصطناعي"""
+    async def execute_task(self, task: DevelopmentTask, on_token=None):
+        """تنفيذ مهمة التطوير المتكامل بالذكاء الاصطناعي (on_token: بث الخطة ثم الكود)"""
         try:
             print(f"🏗️ Full-Stack Pro استلم مهمة: {task.task_description}")
             
-            import openai
-            openai.api_key = os.getenv("OPENAI_API_KEY")
-            
             # تحليل المدخلات بالذكاء الاصطناعي
             analysis_prompt = f"""أنت Full-Stack Pro، نسخة سُروح المطور لأبو شام.
 
@@ -70,18 +71,17 @@ class FullStackPro:
 
 اكتب بالشامية وكن عملي ومباشر مثل أبو شام."""
             
-            analysis_response = openai.chat.completions.create(
+            integration_plan = await llm_client.chat_text(
                 model="gpt-4o-mini",
                 messages=[
                     {"role": "system", "content": self.personality},
                     {"role": "user", "content": analysis_prompt}
                 ],
                 temperature=0.4,
-                max_tokens=1000
+                max_tokens=1000,
+                on_token=on_token
             )
             
-            integration_plan = analysis_response.choices[0].message.content
-            
             # تنفيذ التكامل بالذكاء الاصطناعي
             implementation_prompt = f"""ادمج وطور الحل المتكامل:
 
@@ -96,17 +96,17 @@ class FullStackPro:
 
 أبو شام يريد حل جاهز للإنتاج!"""
 
-            implementation_response = openai.chat.completions.create(
+            integration_result = await llm_client.chat_text(
                 model="gpt-4o-mini", 
                 messages=[
                     {"role": "system", "content": self.personality},
                     {"role": "user", "content": implementation_prompt}
                 ],
                 temperature=0.3,
-                max_tokens=2500
+                max_tokens=2500,
+                on_token=on_token
             )
             
-            integration_result = implementation_response.choices[0].message.content
             deployment_plan = await self.create_deployment_plan(integration_result)
             
             # رد بشخصية سُروح المطور
@@ -185,6 +185,11 @@ async def execute_development_task(task: DevelopmentTask):
     result = await fullstack_pro.execute_task(task)
     return result
 
+@app.post("/execute/stream")
+async def execute_development_task_stream(task: DevelopmentTask):
+    """نفس /execute مع بث خطة التكامل ثم الكود أثناء كتابتهما (SSE: token ثم done)"""
+    return sse_response(task_events(lambda channel: fullstack_pro.execute_task(task, on_token=channel)))
+
 @app.get("/")
 async def bot_status():
     return {
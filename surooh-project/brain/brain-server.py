@@ -12,6 +12,17 @@ import json
 import uuid
 from datetime import datetime
 import asyncio
+import aiohttp
+import sys
+from pathlib import Path
+
+# المكونات المشتركة بين الخدمات في جذر المستودع
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from surooh_common.http_client import close_shared_session, shared_session
+from surooh_common.intent import category_classifier
+from surooh_common.llm_client import llm_client
+from surooh_common.streaming import collect_events, sse_response, stream_stats, task_events
 
 app = FastAPI(title="🧠 سُروح - المخ الذكي", version="1.0.0")
 
@@ -26,17 +37,24 @@ class SimpleBrain:
     def __init__(self):
         self.memory = []
         
-    async def send_to_smartcore(self, task_data):
-        """إرسال مهمة إلى Smart Core للتنفيذ"""
+    async def send_to_smartcore(self, task_data, on_token=None):
+        """إرسال مهمة إلى Smart Core للتنفيذ (on_token: تمرير بثه أثناء التنفيذ)"""
+        url, options = "http://localhost:8001/execute-from-brain", {}
+        if on_token:
+            # البث قد يطول: المهلة للانقطاع بين جزأين فقط
+            url += "/stream"
+            options["timeout"] = aiohttp.ClientTimeout(
+                total=None, sock_read=float(os.getenv("SUROOH_STREAM_IDLE_TIMEOUT", "30"))
+            )
+            
         try:
-            import aiohttp
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    "http://localhost:8001/execute-from-brain",
-                    json=task_data
-                ) as response:
+            async with shared_session() as session:
+                async with session.post(url, json=task_data, **options) as response:
                     if response.status == 200:
-                        result = await response.json()
+                        if on_token:
+                            result = await collect_events(response, on_token)
+                        else:
+                            result = await response.json()
                         print(f"✅ Smart Core استقبل المهمة: {result}")
                         return result
                     else:
@@ -46,14 +64,14 @@ class SimpleBrain:
             print(f"❌ خطأ في الاتصال بـ Smart Core: {e}")
             return None
         
-    async def think(self, request: BrainRequest):
-        """تفكير المخ مع ربط Smart Core"""
+    async def think(self, request: BrainRequest, on_token=None):
+        """تفكير المخ مع ربط Smart Core (on_token: بث الرد أثناء توليده)"""
         message = request.message.lower()
         
         # تحليل نوع الطلب
-        if any(word in message for word in ["موقع", "تطبيق", "برنامج", "نظام"]):
-            category = "development"
-            
+        category = category_classifier.classify(message).first(default="general")
+        
+        if category == "development":
             # إرسال للـ Smart Core للتنفيذ الفعلي
             task_for_smartcore = {
                 "task_id": str(uuid.uuid4()),
@@ -62,7 +80,7 @@ class SimpleBrain:
                 "priority": "high" if "عاجل" in message else "normal"
             }
             
-            smartcore_result = await self.send_to_smartcore(task_for_smartcore)
+            smartcore_result = await self.send_to_smartcore(task_for_smartcore, on_token)
             
             if smartcore_result and smartcore_result.get("success"):
                 response = f"""أبو شام، المخ نفذ العملية كاملة:
@@ -83,8 +101,7 @@ class SimpleBrain:
 
 رح أشتغل على إيجاد حل بديل فوري."""
 
-        elif any(word in message for word in ["تصميم", "شعار", "واجهة"]):
-            category = "design"
+        elif category == "design":
             response = f"""أبو شام، المخ حلل طلب التصميم:
 
 🎨 نوع المهمة: {request.message}  
@@ -95,14 +112,9 @@ class SimpleBrain:
 ✅ جاري التواصل مع المصمم المتخصص."""
 
         else:
-            category = "general"
-            
             # استخدام OpenAI للردود الذكية العامة
             try:
-                import openai
-                openai.api_key = os.getenv("OPENAI_API_KEY")
-                
-                ai_response = openai.chat.completions.create(
+                response = await llm_client.chat_text(
                     model="gpt-4o-mini",
                     messages=[
                         {
@@ -112,11 +124,10 @@ class SimpleBrain:
                         {"role": "user", "content": request.message}
                     ],
                     temperature=0.7,
-                    max_tokens=200
+                    max_tokens=200,
+                    on_token=on_token
                 )
                 
-                response = ai_response.choices[0].message.content
-                
             except Exception as e:
                 print(f"⚠️ خطأ في OpenAI: {e}")
                 response = f"""أبو شام، المخ فهم طلبك:
@@ -159,6 +170,10 @@ class SimpleBrain:
 
 brain = SimpleBrain()
 
+@app.on_event("shutdown")
+async def shutdown():
+    await close_shared_session()
+
 @app.post("/think")
 async def brain_think(request: BrainRequest):
     try:
@@ -175,6 +190,19 @@ async def brain_think(request: BrainRequest):
             "brain_response": "أبو شام، في مشكلة بالمخ... رح أصلحها!"
         }
 
+@app.post("/think/stream")
+async def brain_think_stream(request: BrainRequest):
+    """نفس /think مع بث الرد من النموذج أو من Smart Core والبوتات فور وصوله (SSE)"""
+    async def run(channel):
+        response = await brain.think(request, on_token=channel)
+        return {
+            "success": True,
+            "brain_response": response,
+            "timestamp": datetime.now().isoformat()
+        }
+        
+    return sse_response(task_events(run))
+
 @app.get("/memory")
 async def get_memory():
     return {
@@ -254,7 +282,9 @@ async def brain_stats():
         "total_memories": len(brain.memory),
         "status": "نشط",
         "external_apis": len([m for m in brain.memory if m.get("type") == "external_api"]),
-        "recent_activity": list(brain.memory)[-5:]
+        "recent_activity": list(brain.memory)[-5:],
+        "llm": llm_client.stats(),
+        "streaming": stream_stats.stats()
     }
 
 @app.get("/")
@@ -9,6 +9,19 @@ from typing import Dict
 import uuid
 from datetime import datetime
 import asyncio
+import aiohttp
+import os
+import sys
+import time
+from pathlib import Path
+
+# المكونات المشتركة بين الخدمات في جذر المستودع
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from surooh_common.circuit_breaker import breakers
+from surooh_common.http_client import close_shared_session, shared_session
+from surooh_common.llm_client import llm_client
+from surooh_common.streaming import collect_events, sse_response, stream_stats, task_events
 
 app = FastAPI(title="⚙️ Smart Core", version="1.0.0")
 
@@ -16,6 +29,7 @@ class TaskRequest(BaseModel):
     task_id: str
     description: str  
     category: str
+    requirements: Dict = {}
     priority: str = "normal"
 
 class SmartCore:
@@ -26,19 +40,21 @@ class SmartCore:
             "design_genius": {"status": "ready", "port": 8004}, 
             "fullstack_pro": {"status": "ready", "port": 8005}
         }
+        # المهلة الكلية لتكليف كل البوتات معاً (كل بوت له مهلة 10 ثوان)
+        self.assign_deadline = float(os.getenv("SUROOH_ASSIGN_DEADLINE", "12"))
+        # مع البث يرى العميل التقدم، فالمهلة للانقطاع بين جزأين ومهلة كلية أطول
+        self.stream_idle_timeout = float(os.getenv("SUROOH_STREAM_IDLE_TIMEOUT", "30"))
+        self.stream_deadline = float(os.getenv("SUROOH_STREAM_DEADLINE", "300"))
     
-    async def execute_task(self, task: TaskRequest):
-        """تنفيذ المهمة وتوزيعها على البوتات بالذكاء الاصطناعي"""
+    async def execute_task(self, task: TaskRequest, on_token=None):
+        """تنفيذ المهمة وتوزيعها على البوتات بالذكاء الاصطناعي (on_token: بث التحليل وأجزاء البوتات)"""
         
         print(f"⚙️ Smart Core يعالج: {task.description}")
         
         # تحليل ذكي للمهمة
-        import openai
         try:
-            openai.api_key = os.getenv("OPENAI_API_KEY")
-            
-            # تحليل ذكي للمهمة
-            analysis_response = openai.chat.completions.create(
+            # تحليل ذكي للمهمة (نفس الوصف يعطي نفس الخطة، فيُحفظ في الكاش رغم الحرارة 0.5)
+            ai_analysis = await llm_client.chat_text(
                 model="gpt-4o-mini",
                 messages=[
                     {
@@ -59,11 +75,11 @@ class SmartCore:
                     }
                 ],
                 temperature=0.5,
-                max_tokens=300
+                max_tokens=300,
+                cache=True,
+                on_token=on_token
             )
             
-            ai_analysis = analysis_response.choices[0].message.content
-            
         except Exception as e:
             ai_analysis = f"تحليل أساسي: مشروع {task.category}"
         
@@ -83,7 +99,7 @@ class SmartCore:
             task_entry["bots_assigned"] = ["design_genius", "code_master", "fullstack_pro"]
             
             # محاولة تكليف البوتات فعلياً
-            bot_results = await self.try_assign_to_bots(task, ["design_genius", "code_master", "fullstack_pro"])
+            bot_results = await self.try_assign_to_bots(task, ["design_genius", "code_master", "fullstack_pro"], on_token)
             
             result_message = f"""أبو شام، Smart Core نفذ التحليل الذكي:
 
@@ -100,7 +116,7 @@ class SmartCore:
             
         elif task.category == "design":
             task_entry["bots_assigned"] = ["design_genius"]
-            bot_results = await self.try_assign_to_bots(task, ["design_genius"])
+            bot_results = await self.try_assign_to_bots(task, ["design_genius"], on_token)
             
             result_message = f"""أبو شام، Smart Core حلل مهمة التصميم:
 
@@ -113,7 +129,7 @@ class SmartCore:
             
         else:
             task_entry["bots_assigned"] = ["fullstack_pro"]
-            bot_results = await self.try_assign_to_bots(task, ["fullstack_pro"])
+            bot_results = await self.try_assign_to_bots(task, ["fullstack_pro"], on_token)
             
             result_message = f"""أبو شام، Smart Core عالج المهمة:
 
@@ -134,55 +150,106 @@ class SmartCore:
             "task_id": task.task_id,
             "ai_analysis": ai_analysis,
             "bots_assigned": task_entry["bots_assigned"],
+            "bot_results": bot_results,
             "execution_status": f"{len([r for r in bot_results if r['success']])}/{len(bot_results)} نجح"
         }
     
-    async def try_assign_to_bots(self, task, bot_names):
-        """محاولة تكليف البوتات فعلياً"""
-        results = []
+    async def try_assign_to_bots(self, task, bot_names, on_token=None):
+        """محاولة تكليف البوتات فعلياً (بالتوازي، مع مهلة كلية ونتائج جزئية)"""
+        started = time.perf_counter()
+        pending_by_bot = {
+            bot_name: asyncio.create_task(self.assign_to_bot(task, bot_name, on_token))
+            for bot_name in bot_names
+        }
         
-        for bot_name in bot_names:
-            bot_config = self.bots.get(bot_name)
-            if not bot_config:
-                results.append({"bot": bot_name, "success": False, "error": "غير موجود"})
-                continue
+        deadline = self.stream_deadline if on_token else self.assign_deadline
+        done, pending = await asyncio.wait(pending_by_bot.values(), timeout=deadline)
+        for bot_task in pending:
+            bot_task.cancel()
+            
+        # النتائج بنفس ترتيب البوتات المطلوبة، والبوت الذي تجاوز المهلة الكلية يُسجل كفشل
+        results = []
+        for bot_name, bot_task in pending_by_bot.items():
+            if bot_task in done:
+                results.append(bot_task.result())
+            else:
+                results.append({
+                    "bot": bot_name,
+                    "success": False,
+                    "error": "تجاوز المهلة الكلية للتكليف",
+                    "latency_ms": round((time.perf_counter() - started) * 1000, 1)
+                })
                 
-            try:
-                # محاولة الاتصال بالبوت
-                import aiohttp
-                async with aiohttp.ClientSession() as session:
-                    bot_task = {
-                        "bot_name": bot_name,
-                        "task_description": f"{task.description} (من Smart Core)",
-                        "requirements": task.requirements,
-                        "priority": task.priority
-                    }
+        return results
+    
+    async def assign_to_bot(self, task, bot_name, on_token=None):
+        """تكليف بوت واحد مع قياس زمن الرد"""
+        started = time.perf_counter()
+        result = await self._assign_to_bot(task, bot_name, on_token)
+        result["latency_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        return result
+    
+    async def _assign_to_bot(self, task, bot_name, on_token=None):
+        bot_config = self.bots.get(bot_name)
+        if not bot_config:
+            return {"bot": bot_name, "success": False, "error": "غير موجود"}
+            
+        # البوت معطل: رفض فوري بدل انتظار المهلة
+        base_url = f"http://localhost:{bot_config['port']}"
+        breaker = breakers.get(base_url, probe_url=f"{base_url}/")
+        if not breaker.allow():
+            return {"bot": bot_name, "success": False, "error": "الدائرة مفتوحة: البوت غير متاح"}
+            
+        try:
+            # محاولة الاتصال بالبوت
+            async with shared_session() as session:
+                bot_task = {
+                    "bot_name": bot_name,
+                    "task_description": f"{task.description} (من Smart Core)",
+                    "requirements": task.requirements,
+                    "priority": task.priority
+                }
+                
+                if on_token:
+                    path, timeout = "/execute/stream", aiohttp.ClientTimeout(total=None, sock_read=self.stream_idle_timeout)
+                else:
+                    path, timeout = "/execute", aiohttp.ClientTimeout(total=10)
                     
-                    async with session.post(
-                        f"http://localhost:{bot_config['port']}/execute", 
-                        json=bot_task,
-                        timeout=aiohttp.ClientTimeout(total=10)
-                    ) as response:
-                        if response.status == 200:
-                            bot_result = await response.json()
-                            results.append({
-                                "bot": bot_name, 
-                                "success": True, 
-                                "result": bot_result
-                            })
+                async with session.post(
+                    f"{base_url}{path}", 
+                    json=bot_task,
+                    timeout=timeout
+                ) as response:
+                    if response.status >= 500:
+                        breaker.record_failure()
+                    else:
+                        breaker.record_success()
+                        
+                    if response.status == 200:
+                        if on_token:
+                            bot_result = await collect_events(response, on_token, bot=bot_name)
                         else:
-                            results.append({
-                                "bot": bot_name, 
-                                "success": False, 
-                                "error": f"رد غير صالح: {response.status}"
-                            })
-                            
-            except asyncio.TimeoutError:
-                results.append({"bot": bot_name, "success": False, "error": "انتهت مهلة الاتصال"})
-            except Exception as e:
-                results.append({"bot": bot_name, "success": False, "error": str(e)})
-                
-        return results
+                            bot_result = await response.json()
+                        return {
+                            "bot": bot_name, 
+                            "success": True, 
+                            "result": bot_result
+                        }
+                    else:
+                        return {
+                            "bot": bot_name, 
+                            "success": False, 
+                            "error": f"رد غير صالح: {response.status}"
+                        }
+                        
+        except asyncio.TimeoutError:
+            breaker.record_failure()
+            return {"bot": bot_name, "success": False, "error": "انتهت مهلة الاتصال"}
+        except aiohttp.ClientError as e:
+            breaker.record_failure()
+            return {"bot": bot_name, "success": False, "error": str(e)}
+        except Exception as e:
+            return {"bot": bot_name, "success": False, "error": str(e)}
 
 smart_core = SmartCore()
 
@@ -191,6 +258,15 @@ async def execute_brain_request(task_request: TaskRequest):
     result = await smart_core.execute_task(task_request)
     return result
 
+@app.post("/execute-from-brain/stream")
+async def execute_brain_request_stream(task_request: TaskRequest):
+    """نفس /execute-from-brain مع بث التحليل وأجزاء البوتات فور وصولها (SSE)"""
+    return sse_response(task_events(lambda channel: smart_core.execute_task(task_request, on_token=channel)))
+
+@app.on_event("shutdown")
+async def shutdown():
+    await close_shared_session()
+
 @app.get("/tasks")
 async def get_tasks():
     return {"tasks": smart_core.tasks, "total": len(smart_core.tasks)}
@@ -202,6 +278,9 @@ async def status():
         "status": "نشط",
         "tasks": len(smart_core.tasks),
         "bots": smart_core.bots,
+        "circuit_breakers": breakers.stats(),
+        "llm": llm_client.stats(),
+        "streaming": stream_stats.stats(),
         "version": "2.0.0"
     }
 
@@ -15,12 +15,17 @@ import aiohttp
 import json
 import uuid
 from datetime import datetime
-import openai
 import os
+import sys
+from pathlib import Path
 from urllib.parse import urlparse
 import re
 
-openai.api_key = os.getenv("OPENAI_API_KEY")
+# المكونات المشتركة بين الخدمات في جذر المستودع
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from surooh_common.http_client import close_shared_session, shared_session
+from surooh_common.llm_client import llm_client
 
 app = FastAPI(title="🌐 بوت إدارة المواقع الذكي", version="2.0.0")
 
@@ -53,7 +58,7 @@ class IntelligentAccountManager:
     async def connect_to_smartcore(self):
         """الاتصال بـ Smart Core"""
         try:
-            async with aiohttp.ClientSession() as session:
+            async with shared_session() as session:
                 async with session.get('http://localhost:8001/') as response:
                     if response.status == 200:
                         smartcore_info = await response.json()
@@ -85,7 +90,7 @@ class IntelligentAccountManager:
 
 قدم تحليل شامل وعملي."""
 
-            response = openai.chat.completions.create(
+            response = await llm_client.chat(
                 model="gpt-4o-mini",
                 messages=[
                     {
@@ -139,7 +144,7 @@ class IntelligentAccountManager:
             print(f"📡 مراقبة الموقع: {website_url}")
             
             # فحص حالة الموقع
-            async with aiohttp.ClientSession() as session:
+            async with shared_session() as session:
                 try:
                     async with session.get(f"https://{website_url}", timeout=10) as response:
                         status_code = response.status
@@ -234,7 +239,7 @@ class IntelligentAccountManager:
 
 قدم تقييم أمان شامل ومفيد."""
 
-            response = openai.chat.completions.create(
+            response = await llm_client.chat(
                 model="gpt-4o-mini",
                 messages=[
                     {"role": "system", "content": "أنت خبير أمان الحسابات الرقمية والمواقع."},
@@ -285,7 +290,7 @@ class IntelligentAccountManager:
 
 ضع خطة تطوير مهارات إدارية متقدمة."""
 
-            response = openai.chat.completions.create(
+            response = await llm_client.chat(
                 model="gpt-4o-mini",
                 messages=[
                     {"role": "system", "content": "أنت مستشار تطوير لمديري المواقع والحسابات الرقمية."},
@@ -410,7 +415,7 @@ class IntelligentAccountManager:
 
 قدم اقتراحات عملية ومفيدة."""
 
-            response = openai.chat.completions.create(
+            response = await llm_client.chat(
                 model="gpt-4o-mini",
                 messages=[
                     {"role": "system", "content": "أنت مستشار نمو الأعمال الرقمية."},
@@ -441,7 +446,7 @@ class IntelligentAccountManager:
 
 نفذ المهمة بذكاء واحترافية."""
 
-            response = openai.chat.completions.create(
+            response = await llm_client.chat(
                 model="gpt-4o-mini",
                 messages=[
                     {"role": "system", "content": "أنت مدير مواقع ذكي ومنفذ مهام محترف."},
@@ -528,6 +533,10 @@ async def startup():
     
     asyncio.create_task(periodic_skill_development())
 
+@app.on_event("shutdown")
+async def shutdown():
+    await close_shared_session()
+
 @app.get("/")
 async def root():
     return account_manager.get_status()
@@ -0,0 +1,6 @@
+"""
+🧩 مكونات مشتركة بين خدمات سُروح (المخ، Smart Core، البوتات)
+
+الخدمات ملفات مستقلة تضيف جذر المستودع لمسار الاستيراد:
+    sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+"""
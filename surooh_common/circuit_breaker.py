@@ -0,0 +1,198 @@
+"""
+🔌 قواطع الدائرة لكل بوت
+Circuit Breakers per bot endpoint
+
+- closed: الطلبات تمر، وبعد failure_threshold فشل متتالٍ يفتح القاطع
+- open: الطلبات ترفض فوراً بدل انتظار خطأ الاتصال أو المهلة الكاملة
+- half-open: بعد recovery_timeout يُفحص البوت (GET على عنوانه) ويُغلق القاطع
+  عند نجاح الفحص أو يُفتح من جديد. بدون فحص تمر طلبات تجريبية محدودة
+
+كل عملية تحتفظ بسجل واحد (breakers) تتشاركه كل مسارات الإرسال فيها.
+"""
+
+import asyncio
+import os
+import time
+from typing import Awaitable, Callable, Dict, Optional
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """القاطع مفتوح: البوت معطل ولم يُرسل الطلب"""
+
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f"الدائرة مفتوحة لـ {name} (إعادة الفحص بعد {retry_after:.1f}s)")
+        self.name = name
+        self.retry_after = retry_after
+
+
+def http_probe(url: str, timeout: float = 2.0) -> Callable[[], Awaitable[bool]]:
+    """فحص صحة عبر GET سريع (أي رد أقل من 500 يعني أن البوت يعمل)"""
+    async def probe() -> bool:
+        import aiohttp
+
+        from surooh_common.http_client import shared_session
+
+        try:
+            async with shared_session() as session:
+                async with session.get(url, timeout=aiohttp.ClientTimeout(total=timeout)) as response:
+                    return response.status < 500
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            return False
+
+    return probe
+
+
+class CircuitBreaker:
+    """قاطع دائرة لنقطة واحدة (عنوان بوت)"""
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = 5,
+        recovery_timeout: float = 15.0,
+        half_open_max_calls: int = 1,
+        probe: Optional[Callable[[], Awaitable[bool]]] = None
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self.probe = probe
+
+        self._state = CLOSED
+        self.failures = 0  # فشل متتالٍ في حالة closed
+        self.opened_at = 0.0
+        self.half_open_calls = 0
+        self.probe_task: Optional[asyncio.Task] = None
+
+        self.rejected = 0
+        self.trips = 0
+
+    @property
+    def state(self) -> str:
+        """الحالة الحالية (open تتحول لـ half-open عند انتهاء مهلة الاستعادة)"""
+        if self._state == OPEN and time.monotonic() - self.opened_at >= self.recovery_timeout:
+            self._state = HALF_OPEN
+            self.half_open_calls = 0
+        return self._state
+
+    def retry_after(self) -> float:
+        """الثواني المتبقية قبل إعادة الفحص"""
+        if self.state != OPEN:
+            return 0.0
+        return max(0.0, self.recovery_timeout - (time.monotonic() - self.opened_at))
+
+    def ready(self) -> bool:
+        """هل القاطع مغلق؟ (للمنفذين قبل سحب مهمة، ويبدأ الفحص إن حان وقته)"""
+        state = self.state
+        if state == HALF_OPEN and self.probe is not None:
+            self._start_probe()
+        return state == CLOSED
+
+    def allow(self) -> bool:
+        """هل يُرسل الطلب الآن؟"""
+        state = self.state
+        if state == CLOSED:
+            return True
+
+        if state == HALF_OPEN:
+            if self.probe is not None:
+                self._start_probe()
+            elif self.half_open_calls < self.half_open_max_calls:
+                self.half_open_calls += 1
+                return True
+
+        self.rejected += 1
+        return False
+
+    def check(self):
+        """مثل allow لكن يرفع CircuitOpenError"""
+        if not self.allow():
+            raise CircuitOpenError(self.name, self.retry_after())
+
+    def record_success(self):
+        if self._state != CLOSED:
+            self._close()
+        self.failures = 0
+
+    def record_failure(self):
+        if self._state == HALF_OPEN:
+            self._open()
+        elif self._state == CLOSED:
+            self.failures += 1
+            if self.failures >= self.failure_threshold:
+                self._open()
+
+    def _open(self):
+        self._state = OPEN
+        self.opened_at = time.monotonic()
+        self.failures = 0
+        self.trips += 1
+
+    def _close(self):
+        self._state = CLOSED
+        self.failures = 0
+        self.half_open_calls = 0
+
+    def _start_probe(self):
+        """فحص واحد في الخلفية بدل تمرير طلبات حقيقية لبوت قد يكون معطلاً"""
+        if self.probe_task is not None and not self.probe_task.done():
+            return
+        try:
+            self.probe_task = asyncio.get_running_loop().create_task(self._run_probe())
+        except RuntimeError:
+            pass  # لا توجد حلقة أحداث: يبقى القاطع half-open حتى الاستدعاء التالي
+
+    async def _run_probe(self):
+        try:
+            healthy = await self.probe()
+        except Exception:
+            healthy = False
+
+        if self._state != HALF_OPEN:
+            return
+        if healthy:
+            self._close()
+        else:
+            self._open()
+
+    def stats(self) -> dict:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.failures,
+            "retry_after_seconds": round(self.retry_after(), 2),
+            "trips": self.trips,
+            "rejected": self.rejected
+        }
+
+
+class CircuitBreakerRegistry:
+    """قاطع لكل نقطة، بإعدادات موحدة من متغيرات البيئة"""
+
+    def __init__(self, failure_threshold: Optional[int] = None, recovery_timeout: Optional[float] = None):
+        self.failure_threshold = failure_threshold or int(os.getenv("SUROOH_BREAKER_FAILURES", "5"))
+        self.recovery_timeout = recovery_timeout or float(os.getenv("SUROOH_BREAKER_RECOVERY_SECONDS", "15"))
+        self.breakers: Dict[str, CircuitBreaker] = {}
+
+    def get(self, name: str, probe_url: Optional[str] = None) -> CircuitBreaker:
+        """قاطع النقطة name (يُنشأ عند أول استخدام، مع فحص صحة على probe_url إن وُجد)"""
+        breaker = self.breakers.get(name)
+        if breaker is None:
+            breaker = self.breakers[name] = CircuitBreaker(
+                name,
+                failure_threshold=self.failure_threshold,
+                recovery_timeout=self.recovery_timeout,
+                probe=http_probe(probe_url) if probe_url else None
+            )
+        return breaker
+
+    def stats(self) -> Dict[str, dict]:
+        return {name: breaker.stats() for name, breaker in self.breakers.items()}
+
+
+# السجل المشترك لكل مسارات الإرسال في العملية
+breakers = CircuitBreakerRegistry()
@@ -0,0 +1,99 @@
+"""
+🌐 عميل HTTP مشترك بين الخدمات
+Shared pooled aiohttp session per process
+
+- جلسة واحدة طويلة العمر لكل عملية بدل ClientSession جديدة لكل طلب
+- اتصالات keep-alive مع حد لكل مضيف، وكاش DNS، ومهلات موحدة
+- الاستخدام بنفس شكل ClientSession (الجلسة لا تُغلق عند الخروج من الكتلة):
+
+    async with shared_session() as session:
+        async with session.post(url, json=data) as response:
+            ...
+
+  وعند إيقاف الخدمة: await close_shared_session()
+"""
+
+import asyncio
+import os
+from typing import Optional
+
+import aiohttp
+
+
+class ServiceHTTPClient:
+    """جلسة aiohttp مشتركة مرتبطة بحلقة الأحداث الحالية"""
+
+    def __init__(
+        self,
+        limit: Optional[int] = None,
+        limit_per_host: Optional[int] = None,
+        keepalive_timeout: Optional[float] = None,
+        dns_cache_ttl: Optional[int] = None,
+        connect_timeout: Optional[float] = None,
+        total_timeout: Optional[float] = None
+    ):
+        self.limit = limit or int(os.getenv("SUROOH_HTTP_POOL_SIZE", "100"))
+        self.limit_per_host = limit_per_host or int(os.getenv("SUROOH_HTTP_POOL_PER_HOST", "32"))
+        self.keepalive_timeout = keepalive_timeout or float(os.getenv("SUROOH_HTTP_KEEPALIVE", "30"))
+        self.dns_cache_ttl = dns_cache_ttl or int(os.getenv("SUROOH_HTTP_DNS_TTL", "300"))
+        self.timeout = aiohttp.ClientTimeout(
+            total=total_timeout or float(os.getenv("SUROOH_HTTP_TIMEOUT", "30")),
+            connect=connect_timeout or float(os.getenv("SUROOH_HTTP_CONNECT_TIMEOUT", "3"))
+        )
+
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.sessions_created = 0
+
+    def session(self) -> aiohttp.ClientSession:
+        """الجلسة المشتركة (تُنشأ عند أول استخدام في حلقة الأحداث الحالية)"""
+        loop = asyncio.get_running_loop()
+        if self._session is None or self._session.closed or self._loop is not loop:
+            connector = aiohttp.TCPConnector(
+                limit=self.limit,
+                limit_per_host=self.limit_per_host,
+                keepalive_timeout=self.keepalive_timeout,
+                ttl_dns_cache=self.dns_cache_ttl
+            )
+            self._session = aiohttp.ClientSession(connector=connector, timeout=self.timeout)
+            self._loop = loop
+            self.sessions_created += 1
+        return self._session
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+        self._loop = None
+
+    def stats(self) -> dict:
+        connector = self._session.connector if self._session is not None and not self._session.closed else None
+        return {
+            "open": connector is not None,
+            "sessions_created": self.sessions_created,
+            "limit": self.limit,
+            "limit_per_host": self.limit_per_host,
+            "timeout_seconds": self.timeout.total
+        }
+
+
+class _SharedSessionContext:
+    """async with يعيد الجلسة المشتركة بدون إغلاقها"""
+
+    async def __aenter__(self) -> aiohttp.ClientSession:
+        return http_client.session()
+
+    async def __aexit__(self, exc_type, exc, tb):
+        return False
+
+
+# عميل واحد لكل عملية
+http_client = ServiceHTTPClient()
+
+
+def shared_session() -> _SharedSessionContext:
+    return _SharedSessionContext()
+
+
+async def close_shared_session():
+    await http_client.close()
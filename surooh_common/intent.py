@@ -0,0 +1,107 @@
+"""
+🏷️ مصنف النوايا بالكلمات المفتاحية
+Shared keyword/intent classifier (one compiled regex, weighted multi-label scores)
+
+- كل القوائم تُبنى مرة واحدة في تعبير نمطي واحد، والتصنيف مرور واحد على النص
+  بدل any(word in text) متكرر لكل قائمة
+- توحيد الكتابة العربية قبل المطابقة: أشكال الألف، التاء المربوطة، الألف
+  المقصورة، التشكيل والتطويل، فـ "واجهة" و"واجهه" و"إنشاء" و"انشاء" سواء
+- الكلمات العربية تطابق داخل الكلمة (البادئات مثل ال/و/ب/ل)، والإنجليزية
+  ككلمات كاملة فقط حتى لا تطابق "ui" داخل "build"
+- النتيجة درجات لكل تصنيف، والتعادل يُحسم بترتيب التصنيفات في القاموس
+"""
+
+import re
+from typing import Dict, List, Optional, Tuple
+
+_DIACRITICS = re.compile(r"[\u064b-\u0652\u0640]")  # التشكيل والتطويل
+_LETTERS = str.maketrans({"أ": "ا", "إ": "ا", "آ": "ا", "ة": "ه", "ى": "ي"})
+_LATIN = re.compile(r"[a-z0-9_\- ]+")
+
+
+def normalize_arabic(text: str) -> str:
+    """توحيد أشكال الألف والتاء المربوطة والياء وحذف التشكيل"""
+    return _DIACRITICS.sub("", str(text).lower()).translate(_LETTERS)
+
+
+# البوت الأنسب للمهمة (أسماء البوتات نفسها بوزن عالٍ لقراءة تحليل النموذج)
+BOT_LEXICON = {
+    "code_master": {
+        "code_master": 5, "كود": 1, "برمج": 1, "api": 1, "function": 1, "دالة": 1,
+        "script": 1, "سكربت": 1, "python": 1, "بايثون": 1, "javascript": 1, "خوارزمية": 1
+    },
+    "design_genius": {
+        "design_genius": 5, "تصميم": 1, "صمم": 1, "واجهة": 1, "ui": 1, "ux": 1, "شعار": 1,
+        "logo": 1, "هوية بصرية": 1.5, "بوستر": 1, "ألوان": 0.5
+    },
+    "fullstack_pro": {
+        "fullstack_pro": 5, "full-stack": 1, "fullstack": 1, "دمج": 1, "تكامل": 1, "نشر": 1,
+        "deploy": 1, "قاعدة بيانات": 1, "قواعد البيانات": 1, "قاعدة البيانات": 1
+    }
+}
+
+# تصنيف طلبات المخ (أي كلمة تطوير تغلب كما كان: يُقرأ بـ first لا top)
+CATEGORY_LEXICON = {
+    "development": {"موقع": 1, "تطبيق": 1, "برنامج": 1, "نظام": 1},
+    "design": {"تصميم": 1, "شعار": 1, "واجهة": 1}
+}
+
+
+class IntentResult:
+    """درجات التصنيفات لنص واحد"""
+
+    __slots__ = ("scores", "matched")
+
+    def __init__(self, scores: Dict[str, float], matched: List[str]):
+        self.scores = scores
+        self.matched = matched
+
+    def top(self, default: Optional[str] = None) -> Optional[str]:
+        """التصنيف الأعلى درجة (أو default إذا لم تطابق أي كلمة)"""
+        best = max(self.scores, key=self.scores.get, default=None)
+        return best if best is not None and self.scores[best] > 0 else default
+
+    def first(self, default: Optional[str] = None) -> Optional[str]:
+        """أول تصنيف مطابق بترتيب القاموس بغض النظر عن الدرجات (أولوية ثابتة)"""
+        return next((label for label, score in self.scores.items() if score > 0), default)
+
+    @property
+    def labels(self) -> List[str]:
+        """كل التصنيفات المطابقة مرتبة حسب الدرجة"""
+        return sorted((label for label, score in self.scores.items() if score > 0), key=lambda l: -self.scores[l])
+
+
+class IntentClassifier:
+    """قاموس {تصنيف: {كلمة: وزن}} مجمّع في تعبير نمطي واحد"""
+
+    def __init__(self, lexicon: Dict[str, Dict[str, float]]):
+        self.labels = list(lexicon)
+        self.keywords: Dict[str, List[Tuple[str, float]]] = {}
+
+        for label, words in lexicon.items():
+            for word, weight in words.items():
+                self.keywords.setdefault(normalize_arabic(word), []).append((label, weight))
+
+        # الأطول أولاً حتى تغلب العبارة ("قاعده البيانات") على أجزائها
+        alternatives = [
+            rf"\b{re.escape(word)}\b" if _LATIN.fullmatch(word) else re.escape(word)
+            for word in sorted(self.keywords, key=len, reverse=True)
+        ]
+        self.pattern = re.compile("|".join(alternatives))
+
+    def classify(self, text: str) -> IntentResult:
+        scores = dict.fromkeys(self.labels, 0.0)
+        matched = []
+
+        for match in self.pattern.finditer(normalize_arabic(text)):
+            word = match.group(0)
+            matched.append(word)
+            for label, weight in self.keywords[word]:
+                scores[label] += weight
+
+        return IntentResult(scores, matched)
+
+
+# مصنفات جاهزة لكل الخدمات (تُبنى مرة واحدة عند الاستيراد)
+bot_classifier = IntentClassifier(BOT_LEXICON)
+category_classifier = IntentClassifier(CATEGORY_LEXICON)
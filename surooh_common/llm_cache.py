@@ -0,0 +1,230 @@
+"""
+🗃️ كاش ردود نماذج اللغة
+Content-addressed completion cache (memory LRU + optional SQLite tier)
+
+- المفتاح: sha256 للرسائل بعد التطبيع (مسافات زائدة، أسطر فارغة) + النموذج
+  + درجة الحرارة وباقي معاملات التوليد، فنفس السؤال بصياغة مسافات مختلفة يصيب الكاش
+- الطبقة الأولى في الذاكرة (LRU مع TTL)، والثانية اختيارية على القرص
+  (SUROOH_LLM_CACHE_DB) تبقى بعد إعادة التشغيل وتُشارك بين العمال
+- لا يُخزن إلا الاستدعاءات منخفضة الحرارة (SUROOH_LLM_CACHE_MAX_TEMPERATURE)
+  لأن الردود عالية الحرارة مقصود أن تختلف في كل مرة
+"""
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS llm_cache (
+    key TEXT PRIMARY KEY,
+    model TEXT NOT NULL,
+    response TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    expires_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS llm_cache_by_expiry ON llm_cache (expires_at);
+"""
+
+_SPACES = re.compile(r"[ \t\u00a0]+")
+_BLANK_LINES = re.compile(r"\n\s*\n+")
+
+
+def normalize_text(text: str) -> str:
+    """توحيد المسافات والأسطر الفارغة (بدون تغيير الكلمات نفسها)"""
+    lines = (_SPACES.sub(" ", line).strip() for line in str(text).replace("\r\n", "\n").split("\n"))
+    return _BLANK_LINES.sub("\n\n", "\n".join(lines)).strip()
+
+
+def cache_key(model: str, messages: List[Dict[str, Any]], params: Dict[str, Any]) -> Optional[str]:
+    """مفتاح الاستدعاء، أو None إذا كانت معاملاته غير قابلة للتسلسل (فلا يُخزن)"""
+    payload = {
+        "model": model,
+        "messages": [
+            {"role": str(m.get("role", "")).lower(), "content": normalize_text(m.get("content", ""))}
+            for m in messages
+        ],
+        "params": params
+    }
+    try:
+        encoded = json.dumps(payload, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    except (TypeError, ValueError):
+        return None
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+class CachedMessage:
+    def __init__(self, content: str):
+        self.role = "assistant"
+        self.content = content
+
+
+class CachedChoice:
+    def __init__(self, index: int, content: str, finish_reason: Optional[str]):
+        self.index = index
+        self.message = CachedMessage(content)
+        self.finish_reason = finish_reason
+
+
+class CachedUsage:
+    """رد من الكاش لا يستهلك tokens"""
+
+    prompt_tokens = 0
+    completion_tokens = 0
+    total_tokens = 0
+
+
+class CachedCompletion:
+    """رد محفوظ بنفس حقول ChatCompletion التي تستخدمها الخدمات"""
+
+    cached = True
+
+    def __init__(self, data: Dict[str, Any]):
+        self.model = data["model"]
+        self.choices = [
+            CachedChoice(i, choice["content"], choice.get("finish_reason"))
+            for i, choice in enumerate(data["choices"])
+        ]
+        self.usage = CachedUsage()
+
+
+def dump_completion(response) -> Dict[str, Any]:
+    return {
+        "model": getattr(response, "model", ""),
+        "choices": [
+            {"content": choice.message.content, "finish_reason": getattr(choice, "finish_reason", None)}
+            for choice in response.choices
+        ]
+    }
+
+
+class LLMCache:
+    """كاش ردود بطبقتين: ذاكرة ثم SQLite"""
+
+    def __init__(
+        self,
+        max_entries: int = 1000,
+        ttl: float = 3600,
+        max_temperature: float = 0.3,
+        db_path: Optional[str] = None,
+        clock: Callable[[], float] = time.time
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_temperature = max_temperature
+        self.db_path = db_path
+        self.clock = clock  # ساعة مشتركة بين العمال (الطبقة الثانية على القرص)
+        self.memory: "OrderedDict[str, Tuple[Dict[str, Any], float]]" = OrderedDict()  # {key: (data, expires_at)}
+
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        if db_path:
+            os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+            self._db = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.executescript(SCHEMA)
+            self._db.execute("DELETE FROM llm_cache WHERE expires_at <= ?", (clock(),))
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+
+    @classmethod
+    def from_env(cls) -> "LLMCache":
+        return cls(
+            max_entries=int(os.getenv("SUROOH_LLM_CACHE_SIZE", "1000")),
+            ttl=float(os.getenv("SUROOH_LLM_CACHE_TTL", "3600")),
+            max_temperature=float(os.getenv("SUROOH_LLM_CACHE_MAX_TEMPERATURE", "0.3")),
+            db_path=os.getenv("SUROOH_LLM_CACHE_DB") or None
+        )
+
+    def cacheable(self, params: Dict[str, Any]) -> bool:
+        """الاستدعاءات الحتمية فقط (الحرارة الافتراضية لـ OpenAI هي 1، وNone تعني الافتراضية)"""
+        temperature = params.get("temperature", 1.0)
+        return (
+            self.max_entries > 0
+            and isinstance(temperature, (int, float))
+            and temperature <= self.max_temperature
+        )
+
+    def get(self, key: str) -> Optional[CachedCompletion]:
+        now = self.clock()
+        entry = self.memory.get(key)
+        if entry is not None:
+            if entry[1] > now:
+                self.memory.move_to_end(key)
+                self.memory_hits += 1
+                return CachedCompletion(entry[0])
+            del self.memory[key]
+
+        if self._db is not None:
+            with self._lock:
+                row = self._db.execute(
+                    "SELECT response, expires_at FROM llm_cache WHERE key = ? AND expires_at > ?", (key, now)
+                ).fetchone()
+            if row is not None:
+                data = json.loads(row[0])
+                self._remember(key, data, row[1])
+                self.disk_hits += 1
+                return CachedCompletion(data)
+
+        self.misses += 1
+        return None
+
+    def put(self, key: str, response) -> None:
+        data = dump_completion(response)
+        now = self.clock()
+        expires_at = now + self.ttl
+        self._remember(key, data, expires_at)
+        self.stores += 1
+
+        if self._db is not None:
+            with self._lock:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO llm_cache (key, model, response, created_at, expires_at)"
+                    " VALUES (?, ?, ?, ?, ?)",
+                    (key, data["model"], json.dumps(data, ensure_ascii=False), now, expires_at)
+                )
+
+    def _remember(self, key: str, data: Dict[str, Any], expires_at: float):
+        self.memory[key] = (data, expires_at)
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.max_entries:
+            self.memory.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        self.memory.clear()
+        if self._db is not None:
+            with self._lock:
+                self._db.execute("DELETE FROM llm_cache")
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    def stats(self) -> dict:
+        hits = self.memory_hits + self.disk_hits
+        lookups = hits + self.misses
+        return {
+            "entries": len(self.memory),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl,
+            "max_temperature": self.max_temperature,
+            "disk": self.db_path,
+            "hits": hits,
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": round(hits / lookups, 3) if lookups else 0.0,
+            "stores": self.stores,
+            "evictions": self.evictions
+        }
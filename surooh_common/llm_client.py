@@ -0,0 +1,304 @@
+"""
+🤖 عميل نماذج اللغة غير المعطِّل
+Async LLM client shared by the brain, Smart Core and bots
+
+- استدعاءات async أصلية (AsyncOpenAI) بدل openai.chat.completions.create المتزامن
+  الذي كان يوقف حلقة الأحداث لثوانٍ في كل طلب
+- حد أقصى للاستدعاءات المتزامنة لكل عملية (SUROOH_LLM_CONCURRENCY)
+- مهلة موحدة لكل استدعاء (SUROOH_LLM_TIMEOUT)
+- SUROOH_LLM_BACKEND=fake: ردود محلية ثابتة بدون شبكة (للتجربة والقياس)
+- الاستدعاءات منخفضة الحرارة تمر عبر كاش الردود (llm_cache)، فالتحليل المتكرر فوري
+- stream / chat_text(on_token=...): بث الرد جزءاً جزءاً مع قياس زمن أول جزء (TTFT)
+
+الرد بنفس شكل ردود OpenAI، فيبقى الاستخدام:
+    response = await llm_client.chat(model=..., messages=[...], temperature=0.3, max_tokens=600)
+    text = response.choices[0].message.content
+"""
+
+import asyncio
+import os
+import time
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+
+from surooh_common.llm_cache import CachedCompletion, LLMCache, cache_key
+
+
+class FakeMessage:
+    def __init__(self, content: str):
+        self.role = "assistant"
+        self.content = content
+
+
+class FakeChoice:
+    def __init__(self, content: str):
+        self.index = 0
+        self.message = FakeMessage(content)
+        self.finish_reason = "stop"
+
+
+class FakeUsage:
+    def __init__(self, prompt_tokens: int, completion_tokens: int):
+        self.prompt_tokens = prompt_tokens
+        self.completion_tokens = completion_tokens
+        self.total_tokens = prompt_tokens + completion_tokens
+
+
+class FakeCompletion:
+    """رد محلي بنفس حقول ChatCompletion التي تستخدمها الخدمات"""
+
+    def __init__(self, model: str, content: str, prompt_tokens: int):
+        self.model = model
+        self.choices = [FakeChoice(content)]
+        self.usage = FakeUsage(prompt_tokens, len(content.split()))
+
+
+class FakeImage:
+    def __init__(self):
+        self.url = None
+        self.revised_prompt = None
+
+
+class FakeImagesResponse:
+    def __init__(self, n: int):
+        self.data = [FakeImage() for _ in range(n)]
+
+
+class FakeBackend:
+    """يعيد آخر رسالة للمستخدم بشكل ثابت بعد تأخير اختياري"""
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+
+    def reply(self, model: str, messages: List[Dict[str, Any]]) -> FakeCompletion:
+        user_messages = [m.get("content", "") for m in messages if m.get("role") == "user"]
+        prompt = user_messages[-1] if user_messages else ""
+        prompt_tokens = sum(len(str(m.get("content", "")).split()) for m in messages)
+        return FakeCompletion(model, f"[fake:{model}] {prompt[:200]}", prompt_tokens)
+
+    async def chat(self, model: str, messages: List[Dict[str, Any]], **kwargs) -> FakeCompletion:
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        return self.reply(model, messages)
+
+    async def stream(self, model: str, messages: List[Dict[str, Any]], **kwargs) -> AsyncIterator[str]:
+        """نفس الرد مقسماً على الكلمات، والتأخير موزع عليها"""
+        words = self.reply(model, messages).choices[0].message.content.split(" ")
+        for i, word in enumerate(words):
+            if self.delay:
+                await asyncio.sleep(self.delay / len(words))
+            yield word if i == 0 else " " + word
+
+    async def generate_image(self, **kwargs) -> FakeImagesResponse:
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        return FakeImagesResponse(kwargs.get("n", 1))
+
+
+class OpenAIBackend:
+    """AsyncOpenAI (يُنشأ عند أول استخدام حتى لا تحتاج الخدمات المفتاح عند الاستيراد)"""
+
+    def __init__(self, timeout: float, max_retries: int = 2):
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self._client = None
+
+    @property
+    def client(self):
+        if self._client is None:
+            from openai import AsyncOpenAI
+
+            self._client = AsyncOpenAI(
+                api_key=os.getenv("OPENAI_API_KEY"), timeout=self.timeout, max_retries=self.max_retries
+            )
+        return self._client
+
+    async def chat(self, model: str, messages: List[Dict[str, Any]], **kwargs):
+        return await self.client.chat.completions.create(model=model, messages=messages, **kwargs)
+
+    async def stream(self, model: str, messages: List[Dict[str, Any]], **kwargs) -> AsyncIterator[str]:
+        chunks = await self.client.chat.completions.create(model=model, messages=messages, stream=True, **kwargs)
+        async for chunk in chunks:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+    async def generate_image(self, **kwargs):
+        return await self.client.images.generate(**kwargs)
+
+
+class LLMClient:
+    """واجهة موحدة فوق الخلفية مع حد للتزامن ومهلة وإحصائيات"""
+
+    def __init__(
+        self,
+        backend: Optional[str] = None,
+        concurrency: Optional[int] = None,
+        timeout: Optional[float] = None,
+        cache: Optional[LLMCache] = None
+    ):
+        self.backend_name = backend or os.getenv("SUROOH_LLM_BACKEND", "openai")
+        self.concurrency = concurrency or int(os.getenv("SUROOH_LLM_CONCURRENCY", "8"))
+        self.timeout = timeout or float(os.getenv("SUROOH_LLM_TIMEOUT", "60"))
+
+        if self.backend_name == "fake":
+            self.backend = FakeBackend(delay=float(os.getenv("SUROOH_LLM_FAKE_DELAY", "0")))
+        elif self.backend_name == "openai":
+            self.backend = OpenAIBackend(timeout=self.timeout)
+        else:
+            raise ValueError(f"خلفية نماذج غير معروفة: {self.backend_name}")
+
+        self.cache = cache or LLMCache.from_env()
+
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+        self.calls = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.in_flight = 0
+        self.total_latency = 0.0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.streams = 0
+        self.total_ttft = 0.0
+        self.last_ttft = 0.0
+
+    @property
+    def semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        if self._semaphore is None or self._loop is not loop:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+            self._loop = loop
+        return self._semaphore
+
+    async def _call(self, method, **kwargs):
+        async with self.semaphore:
+            self.in_flight += 1
+            started = time.perf_counter()
+            try:
+                return await asyncio.wait_for(method(**kwargs), timeout=self.timeout)
+            except asyncio.TimeoutError:
+                self.timeouts += 1
+                raise
+            except Exception:
+                self.errors += 1
+                raise
+            finally:
+                self.in_flight -= 1
+                self.calls += 1
+                self.total_latency += time.perf_counter() - started
+
+    def _cache_key(
+        self, model: str, messages: List[Dict[str, Any]], kwargs: Dict[str, Any], cache: Optional[bool]
+    ) -> Optional[str]:
+        """مفتاح الكاش للاستدعاء، أو None إذا كان لا يُخزن
+
+        cache: None = حسب درجة الحرارة، True = دائماً، False = أبداً
+        """
+        if not (self.cache.cacheable(kwargs) if cache is None else cache):
+            return None
+        return cache_key(model, messages, kwargs)
+
+    async def chat(self, model: str, messages: List[Dict[str, Any]], cache: Optional[bool] = None, **kwargs):
+        """محادثة كاملة (نفس معاملات chat.completions.create)"""
+        key = self._cache_key(model, messages, kwargs, cache)
+        if key is not None:
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached
+
+        response = await self._call(self.backend.chat, model=model, messages=messages, **kwargs)
+        if key is not None:
+            self.cache.put(key, response)
+
+        usage = getattr(response, "usage", None)
+        if usage is not None:
+            self.prompt_tokens += usage.prompt_tokens or 0
+            self.completion_tokens += usage.completion_tokens or 0
+        return response
+
+    async def stream(
+        self, model: str, messages: List[Dict[str, Any]], cache: Optional[bool] = None, **kwargs
+    ) -> AsyncIterator[str]:
+        """الرد كأجزاء نصية فور وصولها (مع قياس زمن أول جزء)
+
+        المهلة هنا للانتظار بين جزأين وليست للرد كاملاً
+        """
+        key = self._cache_key(model, messages, kwargs, cache)
+        if key is not None:
+            cached = self.cache.get(key)
+            if cached is not None:
+                yield cached.choices[0].message.content
+                return
+
+        parts = []
+        async with self.semaphore:
+            self.in_flight += 1
+            started = time.perf_counter()
+            chunks = self.backend.stream(model=model, messages=messages, **kwargs)
+            try:
+                while True:
+                    try:
+                        part = await asyncio.wait_for(chunks.__anext__(), timeout=self.timeout)
+                    except StopAsyncIteration:
+                        break
+                    if not parts:
+                        self.last_ttft = time.perf_counter() - started
+                        self.total_ttft += self.last_ttft
+                        self.streams += 1
+                    parts.append(part)
+                    yield part
+            except asyncio.TimeoutError:
+                self.timeouts += 1
+                raise
+            except Exception:
+                self.errors += 1
+                raise
+            finally:
+                await chunks.aclose()
+                self.in_flight -= 1
+                self.calls += 1
+                self.total_latency += time.perf_counter() - started
+
+        if key is not None:
+            self.cache.put(key, CachedCompletion({
+                "model": model, "choices": [{"content": "".join(parts), "finish_reason": "stop"}]
+            }))
+
+    async def chat_text(
+        self, model: str, messages: List[Dict[str, Any]], on_token: Optional[Callable[[str], None]] = None, **kwargs
+    ) -> str:
+        """نص الرد كاملاً، ومع on_token يُستدعى لكل جزء فور وصوله (للبث)"""
+        if on_token is None:
+            response = await self.chat(model=model, messages=messages, **kwargs)
+            return response.choices[0].message.content
+
+        parts = []
+        async for part in self.stream(model=model, messages=messages, **kwargs):
+            parts.append(part)
+            on_token(part)
+        return "".join(parts)
+
+    async def generate_image(self, **kwargs):
+        """توليد صورة (نفس معاملات images.generate)"""
+        return await self._call(self.backend.generate_image, **kwargs)
+
+    def stats(self) -> dict:
+        return {
+            "backend": self.backend_name,
+            "concurrency": self.concurrency,
+            "in_flight": self.in_flight,
+            "calls": self.calls,
+            "errors": self.errors,
+            "timeouts": self.timeouts,
+            "avg_latency_ms": round(self.total_latency / self.calls * 1000, 1) if self.calls else 0.0,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "streams": self.streams,
+            "avg_ttft_ms": round(self.total_ttft / self.streams * 1000, 1) if self.streams else 0.0,
+            "last_ttft_ms": round(self.last_ttft * 1000, 1),
+            "cache": self.cache.stats()
+        }
+
+
+# عميل واحد لكل عملية
+llm_client = LLMClient()
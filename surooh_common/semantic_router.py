@@ -0,0 +1,224 @@
+"""
+🧭 موجّه دلالي للمهام
+Semantic routing cache: nearest previously-routed command → bot
+
+- كل أمر يُحوَّل إلى متجه محلي (تجزئة الكلمات + مقاطع الحروف، بدون إنترنت)
+- إذا كان أقرب أمر سبق توجيهه مشابهاً فوق العتبة (SUROOH_ROUTER_THRESHOLD)
+  يُعاد استخدام نفس البوت مباشرة، وإلا يُحلل الأمر بالنموذج ثم يُتعلم اختياره
+- العتبة عالية عمداً: أمران يتشاركان أغلب كلماتهما قد يختلفان في الكلمة الحاسمة
+  ("أريد تصميم شعار لشركتي" / "أريد كود لشركتي")، لذلك لا يُقبل التوجيه أيضاً
+  إذا كانت كلمات الأمر المفتاحية تشير لبوت آخر (مصنف النوايا المشترك)
+- البحث ضرب مصفوفة واحد على متجهات float32 متصلة (أجزاء من الميلي ثانية)
+- SUROOH_ROUTER_PATH: ملف jsonl للأوامر المتعلمة يُعاد تحميله عند التشغيل
+  (يُكتب فيه الاختيار الجديد فقط، ويُعاد كتابته مضغوطاً عند حذف الأوامر القديمة)
+"""
+
+import hashlib
+import json
+import os
+import time
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+from surooh_common.intent import IntentClassifier, bot_classifier, normalize_arabic
+
+
+class NgramEmbedder:
+    """متجهات حتمية من الكلمات ومقاطع الحروف الثلاثية
+
+    المقاطع تجعل "تصميم" و"التصميم" و"تصاميم" متقاربة رغم اختلاف الكلمة
+    """
+
+    def __init__(self, dim: int = 512, ngram: int = 3):
+        self.name = "ngram-hashing"
+        self.dim = dim
+        self.ngram = ngram
+
+    def _features(self, text: str) -> List[str]:
+        words = normalize_arabic(text).split()
+        features = [f"w:{word}" for word in words]
+        for word in words:
+            padded = f"<{word}>"
+            features.extend(f"c:{padded[i:i + self.ngram]}" for i in range(max(1, len(padded) - self.ngram + 1)))
+        return features
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+
+        for row, text in enumerate(texts):
+            for feature in self._features(text):
+                digest = int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "little")
+                matrix[row, digest % self.dim] += 1.0 if digest >> 63 else -1.0
+
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        matrix /= norms
+        return matrix
+
+
+class RouteMatch:
+    """نتيجة توجيه من الكاش"""
+
+    __slots__ = ("bot", "similarity", "matched_command")
+
+    def __init__(self, bot: str, similarity: float, matched_command: str):
+        self.bot = bot
+        self.similarity = similarity
+        self.matched_command = matched_command
+
+
+class SemanticRouter:
+    """أوامر سبق توجيهها ومتجهاتها، مع بحث أقرب جار"""
+
+    def __init__(
+        self,
+        threshold: float = 0.9,
+        max_entries: int = 5000,
+        path: Optional[str] = None,
+        embedder=None,
+        classifier: Optional[IntentClassifier] = bot_classifier
+    ):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.path = path
+        self.embedder = embedder or NgramEmbedder()
+        self.classifier = classifier  # None = بدون فحص الكلمات المفتاحية
+
+        self._matrix = np.zeros((64, self.embedder.dim), dtype=np.float32)
+        self.commands: List[str] = []
+        self.bots: List[str] = []
+
+        self.hits = 0
+        self.misses = 0
+        self.vetoed = 0
+        self.learned = 0
+        self.lookup_seconds = 0.0
+
+        if path and os.path.exists(path):
+            self._load()
+
+    @classmethod
+    def from_env(cls) -> "SemanticRouter":
+        return cls(
+            threshold=float(os.getenv("SUROOH_ROUTER_THRESHOLD", "0.9")),
+            max_entries=int(os.getenv("SUROOH_ROUTER_SIZE", "5000")),
+            path=os.getenv("SUROOH_ROUTER_PATH") or None,
+            embedder=NgramEmbedder(dim=int(os.getenv("SUROOH_ROUTER_DIM", "512")))
+        )
+
+    def __len__(self) -> int:
+        return len(self.commands)
+
+    def _load(self):
+        learned = {}  # آخر اختيار لكل أمر
+        lines = 0
+        with open(self.path, encoding="utf-8") as handle:
+            for line in handle:
+                lines += 1
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # سطر ناقص من إيقاف مفاجئ
+                learned.pop(entry["command"], None)
+                learned[entry["command"]] = entry["bot"]
+
+        commands = list(learned)[-self.max_entries:]
+        bots = [learned[command] for command in commands]
+        if commands:
+            self._append(commands, bots, self.embedder.embed(commands))
+        if lines > len(commands):
+            self._rewrite()
+
+    def _rewrite(self):
+        """إعادة كتابة الملف بالأوامر الحالية فقط (سطر لكل أمر)، باستبدال ذري"""
+        temporary = f"{self.path}.tmp"
+        with open(temporary, "w", encoding="utf-8") as handle:
+            for command, bot in zip(self.commands, self.bots):
+                handle.write(json.dumps({"command": command, "bot": bot}, ensure_ascii=False) + "\n")
+        os.replace(temporary, self.path)
+
+    def _append(self, commands: List[str], bots: List[str], vectors: np.ndarray):
+        size = len(self.commands)
+        required = size + len(commands)
+
+        # مضاعفة السعة عند الحاجة للحفاظ على مصفوفة متصلة
+        if required > len(self._matrix):
+            grown = np.zeros((max(required, 2 * len(self._matrix)), self.embedder.dim), dtype=np.float32)
+            grown[:size] = self._matrix[:size]
+            self._matrix = grown
+
+        self._matrix[size:required] = vectors
+        self.commands.extend(commands)
+        self.bots.extend(bots)
+
+    def _nearest(self, vector: np.ndarray):
+        size = len(self.commands)
+        if size == 0:
+            return None, 0.0
+        scores = self._matrix[:size] @ vector
+        row = int(np.argmax(scores))
+        return row, float(scores[row])
+
+    def route(self, command: str) -> Optional[RouteMatch]:
+        """البوت المختار لأقرب أمر مشابه، أو None إذا كان الأمر جديداً"""
+        started = time.perf_counter()
+        row, similarity = self._nearest(self.embedder.embed([command])[0])
+        self.lookup_seconds += time.perf_counter() - started
+
+        if row is None or similarity < self.threshold:
+            self.misses += 1
+            return None
+
+        # الكلمات المفتاحية تشير لبوت آخر: الأمر المشابه ليس نفس المهمة
+        if self.classifier is not None:
+            expected = self.classifier.classify(command).top()
+            if expected is not None and expected != self.bots[row]:
+                self.vetoed += 1
+                self.misses += 1
+                return None
+
+        self.hits += 1
+        return RouteMatch(self.bots[row], similarity, self.commands[row])
+
+    def learn(self, command: str, bot: str):
+        """تسجيل اختيار بوت لأمر (الأمر المكرر يُحدّث بدل أن يُضاف)"""
+        vector = self.embedder.embed([command])
+        row, similarity = self._nearest(vector[0])
+        if row is not None and similarity >= 0.999:
+            if self.bots[row] == bot:
+                return  # نفس الاختيار محفوظ مسبقاً
+            self.bots[row] = bot
+        else:
+            if len(self.commands) >= self.max_entries:
+                self._evict_oldest()
+            self._append([command], [bot], vector)
+
+        self.learned += 1
+        if self.path:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as handle:
+                handle.write(json.dumps({"command": command, "bot": bot}, ensure_ascii=False) + "\n")
+
+    def _evict_oldest(self):
+        """حذف أقدم ربع من الأوامر دفعة واحدة (بدل إزاحة المصفوفة مع كل إضافة)"""
+        drop = max(1, len(self.commands) // 4)
+        size = len(self.commands)
+        self._matrix[:size - drop] = self._matrix[drop:size]
+        del self.commands[:drop]
+        del self.bots[:drop]
+        if self.path:
+            self._rewrite()  # الملف لا يكبر بلا حد مع الأوامر المحذوفة
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.commands),
+            "threshold": self.threshold,
+            "hits": self.hits,
+            "misses": self.misses,
+            "vetoed": self.vetoed,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "learned": self.learned,
+            "avg_lookup_ms": round(self.lookup_seconds / lookups * 1000, 3) if lookups else 0.0
+        }
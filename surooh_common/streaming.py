@@ -0,0 +1,139 @@
+"""
+📡 بث الردود بين الخدمات (SSE)
+Server-Sent Events: token channel → SSE response → relay to the next hop
+
+- المنفذ يكتب الأجزاء في TokenChannel (تُمرر كـ on_token لـ llm_client.chat_text)
+  وtask_events يحولها لأحداث token فور وصولها ثم done بالنتيجة الكاملة
+  (نفس رد النقطة غير المبثوثة)، أو error عند الفشل
+- collect_events يقرأ بث خدمة أخرى ويمرر أجزاءها للقناة الحالية، فيصل أول جزء من
+  النموذج إلى العميل عبر كل السلسلة: بوت → Smart Core → المخ
+- زمن أول جزء (TTFT) لكل بث يُقاس في stream_stats
+"""
+
+import asyncio
+import json
+import time
+from typing import Any, AsyncIterator, Awaitable, Callable, Optional
+
+from fastapi.responses import StreamingResponse
+
+KEEP_ALIVE_SECONDS = 15
+
+_FINISHED = object()
+
+
+class StreamError(Exception):
+    """البث انتهى بحدث error أو انقطع قبل done"""
+
+
+def sse_event(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+class TokenChannel:
+    """قناة الأجزاء بين المنفذ واستجابة البث (تُستدعى مباشرة كـ on_token)"""
+
+    def __init__(self):
+        self.queue: asyncio.Queue = asyncio.Queue()
+
+    def __call__(self, text: str, **meta):
+        self.queue.put_nowait({"text": text, **meta})
+
+
+class StreamStats:
+    """عدد البثوث وزمن أول جزء فيها"""
+
+    def __init__(self):
+        self.streams = 0
+        self.failed = 0
+        self.first_tokens = 0
+        self.total_ttft = 0.0
+        self.last_ttft = 0.0
+
+    def record_ttft(self, seconds: float):
+        self.first_tokens += 1
+        self.total_ttft += seconds
+        self.last_ttft = seconds
+
+    def stats(self) -> dict:
+        return {
+            "streams": self.streams,
+            "failed": self.failed,
+            "avg_ttft_ms": round(self.total_ttft / self.first_tokens * 1000, 1) if self.first_tokens else 0.0,
+            "last_ttft_ms": round(self.last_ttft * 1000, 1)
+        }
+
+
+stream_stats = StreamStats()
+
+
+async def task_events(run: Callable[[TokenChannel], Awaitable[Any]]) -> AsyncIterator[str]:
+    """تشغيل run(channel) وبث أجزائه ثم نتيجته كأحداث SSE"""
+    channel = TokenChannel()
+    started = time.perf_counter()
+    worker = asyncio.create_task(run(channel))
+    worker.add_done_callback(lambda _: channel.queue.put_nowait(_FINISHED))
+    stream_stats.streams += 1
+
+    try:
+        first = True
+        while True:
+            try:
+                item = await asyncio.wait_for(channel.queue.get(), timeout=KEEP_ALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+                continue
+            if item is _FINISHED:
+                break
+            if first:
+                stream_stats.record_ttft(time.perf_counter() - started)
+                first = False
+            yield sse_event("token", item)
+
+        if worker.exception() is not None:
+            stream_stats.failed += 1
+            yield sse_event("error", {"error": str(worker.exception())})
+        else:
+            yield sse_event("done", worker.result())
+    finally:
+        # العميل أغلق الاتصال: لا داعي لإكمال التوليد
+        if not worker.done():
+            worker.cancel()
+
+
+def sse_response(events: AsyncIterator[str]) -> StreamingResponse:
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+async def read_events(response) -> AsyncIterator[tuple]:
+    """أحداث (event, data) من رد aiohttp بصيغة SSE"""
+    event, data = "message", []
+    async for raw in response.content:
+        line = raw.decode("utf-8").rstrip("\r\n")
+        if not line:
+            if data:
+                yield event, json.loads("\n".join(data))
+            event, data = "message", []
+        elif line.startswith(":"):
+            continue
+        elif line.startswith("event:"):
+            event = line[6:].strip()
+        elif line.startswith("data:"):
+            data.append(line[5:].lstrip())
+
+
+async def collect_events(response, on_token: Optional[Callable[..., None]] = None, **meta) -> Any:
+    """تمرير أجزاء بث خدمة أخرى إلى on_token (مع meta) وإرجاع نتيجة done"""
+    async for event, data in read_events(response):
+        if event == "token":
+            if on_token is not None:
+                on_token(**{**data, **meta})
+        elif event == "done":
+            return data
+        elif event == "error":
+            raise StreamError(data.get("error", "فشل البث"))
+    raise StreamError("انقطع البث قبل اكتماله")
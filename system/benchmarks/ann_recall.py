@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+📊 قياس الفهرس التقريبي مقابل البحث الكامل
+IVF recall@k and latency vs brute force
+
+التشغيل:
+    python3 benchmarks/ann_recall.py --vectors 200000 --queries 200
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "brain"))
+
+from ann_index import IVFIndex  # noqa: E402
+from vector_store import VectorStore, normalize_rows  # noqa: E402
+
+
+def clustered_vectors(rng, count: int, dim: int, clusters: int, spread: float) -> np.ndarray:
+    """متجهات صناعية متجمعة تشبه توزيع قطع النصوص الحقيقية"""
+    centers = normalize_rows(np.random.default_rng(0).standard_normal((clusters, dim)).astype(np.float32))
+    labels = rng.integers(0, clusters, count)
+    noise = rng.standard_normal((count, dim)).astype(np.float32) * (spread / np.sqrt(dim))
+    return normalize_rows(centers[labels] + noise)
+
+
+def timed_search(search, queries, top_k):
+    """تنفيذ الاستعلامات وإرجاع النتائج ومتوسط الزمن بالمللي ثانية"""
+    results = []
+    start = time.perf_counter()
+    for query in queries:
+        results.append([row for row, _ in search(query, top_k)])
+    elapsed_ms = (time.perf_counter() - start) * 1000 / len(queries)
+    return results, elapsed_ms
+
+
+def main():
+    parser = argparse.ArgumentParser(description="IVF recall vs brute force")
+    parser.add_argument("--vectors", type=int, default=200000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--clusters", type=int, default=2000)
+    parser.add_argument("--spread", type=float, default=0.6, help="طول الضجيج نسبة لمركز التجمع")
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32, 64])
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    store = VectorStore(args.dim, initial_capacity=args.vectors)
+    vectors = clustered_vectors(rng, args.vectors, args.dim, args.clusters, args.spread)
+    store.add(range(args.vectors), vectors)
+    queries = clustered_vectors(rng, args.queries, args.dim, args.clusters, args.spread)
+
+    index = IVFIndex(store, min_train_size=0)
+    start = time.perf_counter()
+    index.train()
+    train_s = time.perf_counter() - start
+
+    truth, brute_ms = timed_search(store.search, queries, args.top_k)
+
+    print(f"vectors={args.vectors} dim={args.dim} nlist={len(index.centroids)} train={train_s:.1f}s")
+    print(f"{'method':<14}{'recall@' + str(args.top_k):>12}{'ms/query':>12}{'speedup':>10}")
+    print(f"{'brute-force':<14}{1.0:>12.3f}{brute_ms:>12.3f}{1.0:>10.1f}")
+
+    for nprobe in args.nprobe:
+        found, ivf_ms = timed_search(
+            lambda query, top_k: index.search(query, top_k, nprobe=nprobe), queries, args.top_k
+        )
+        hits = sum(len(set(a) & set(b)) for a, b in zip(found, truth))
+        recall = hits / sum(len(b) for b in truth)
+        print(f"{'ivf/' + str(nprobe):<14}{recall:>12.3f}{ivf_ms:>12.3f}{brute_ms / ivf_ms:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
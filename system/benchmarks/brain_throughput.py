@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+📊 قياس إنتاجية /v1/query حسب عدد عمال المخ المتطور
+Brain /v1/query throughput at 1/2/4/8 uvicorn workers
+
+يشغّل المخ كعملية منفصلة لكل عدد عمال على نفس مجلد البيانات،
+ثم يرسل استعلامات متزامنة من عدة عمليات عميلة ويطبع req/s والزمن.
+
+التشغيل:
+    python3 benchmarks/brain_throughput.py --workers 1 2 4 8 --duration 15
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import secrets
+import subprocess
+import sys
+import tempfile
+import time
+
+import aiohttp
+
+BRAIN_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "brain", "advanced-brain.py")
+SERVICE_TOKEN = os.getenv("SUROOH_SERVICE_TOKEN") or secrets.token_urlsafe(32)
+HEADERS = {"Authorization": f"Bearer {SERVICE_TOKEN}"}
+TOPICS = ["invoice", "deploy", "design", "meeting", "database", "github", "email", "report", "budget", "server"]
+
+
+def start_brain(workers: int, port: int, data_dir: str) -> subprocess.Popen:
+    """تشغيل المخ بعدد العمال المطلوب وحدود طلبات لا تؤثر على القياس"""
+    env = {
+        **os.environ,
+        "SUROOH_BRAIN_WORKERS": str(workers),
+        "SUROOH_BRAIN_PORT": str(port),
+        "SUROOH_BRAIN_DATA_DIR": data_dir,
+        "SUROOH_SERVICE_TOKEN": SERVICE_TOKEN,
+        "SUROOH_RATE_LIMITS": "query=1000000000/1,ingest_batch=1000000/1"
+    }
+    return subprocess.Popen(
+        [sys.executable, BRAIN_SCRIPT], env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+
+
+async def wait_ready(base_url: str, workers: int, timeout: float = 120):
+    """انتظار جاهزية كل العمال (عدة ردود متتالية بإحماء مكتمل)"""
+    deadline = time.time() + timeout
+    ready_streak = 0
+
+    async with aiohttp.ClientSession() as session:
+        while time.time() < deadline:
+            try:
+                async with session.get(f"{base_url}/health") as response:
+                    health = await response.json()
+                    ready = health["memory_warmup"]["state"] == "ready"
+                    ready_streak = ready_streak + 1 if ready else 0
+            except aiohttp.ClientError:
+                ready_streak = 0
+
+            if ready_streak >= 4 * workers:
+                return
+            await asyncio.sleep(0.05 if ready_streak else 0.5)
+
+    raise TimeoutError("brain did not become ready")
+
+
+async def seed(base_url: str, documents: int):
+    """إدخال وثائق صناعية إذا كان المجلد فارغاً"""
+    async with aiohttp.ClientSession(headers=HEADERS) as session:
+        async with session.get(f"{base_url}/health") as response:
+            existing = (await response.json())["statistics"]["total_documents"]
+
+        for start in range(existing, documents, 500):
+            items = [
+                {
+                    "source_type": "benchmark",
+                    "source_id": f"doc-{i}",
+                    "raw_payload": " ".join(
+                        f"{TOPICS[(i + j) % len(TOPICS)]} item{i} note{j}" for j in range(120)
+                    )
+                }
+                for i in range(start, min(start + 500, documents))
+            ]
+            async with session.post(f"{base_url}/v1/ingest/batch", json={"items": items}) as response:
+                response.raise_for_status()
+
+
+async def client_load(base_url: str, concurrency: int, duration: float, mode: str) -> list:
+    """إرسال استعلامات متواصلة لمدة duration وإرجاع أزمنة الاستعلامات الناجحة"""
+    latencies = []
+    deadline = time.perf_counter() + duration
+    connector = aiohttp.TCPConnector(limit=concurrency)
+
+    async with aiohttp.ClientSession(headers=HEADERS, connector=connector) as session:
+        async def run(client: int):
+            counter = client
+            while time.perf_counter() < deadline:
+                query = {"query_text": f"{TOPICS[counter % len(TOPICS)]} item{counter % 997}", "mode": mode}
+                counter += concurrency
+                started = time.perf_counter()
+                async with session.post(f"{base_url}/v1/query", json=query) as response:
+                    await response.read()
+                    if response.status == 200:
+                        latencies.append(time.perf_counter() - started)
+
+        await asyncio.gather(*(run(client) for client in range(concurrency)))
+
+    return latencies
+
+
+def client_process(base_url: str, concurrency: int, duration: float, mode: str, results):
+    results.put(asyncio.run(client_load(base_url, concurrency, duration, mode)))
+
+
+def measure(base_url: str, clients: int, concurrency: int, duration: float, mode: str) -> list:
+    """تشغيل العملاء في عمليات منفصلة حتى لا يكون العميل هو عنق الزجاجة"""
+    results = multiprocessing.Queue()
+    processes = [
+        multiprocessing.Process(target=client_process, args=(base_url, concurrency, duration, mode, results))
+        for _ in range(clients)
+    ]
+    for process in processes:
+        process.start()
+
+    latencies = []
+    for _ in processes:
+        latencies.extend(results.get())
+    for process in processes:
+        process.join()
+
+    return sorted(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Brain /v1/query throughput vs worker count")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--documents", type=int, default=5000)
+    parser.add_argument("--duration", type=float, default=15.0)
+    parser.add_argument("--clients", type=int, default=4, help="عدد عمليات العملاء")
+    parser.add_argument("--concurrency", type=int, default=32, help="طلبات متزامنة لكل عملية عميل")
+    parser.add_argument("--mode", default="hybrid", choices=["semantic", "keyword", "hybrid"])
+    parser.add_argument("--port", type=int, default=8016)
+    parser.add_argument("--data-dir", default=None, help="مجلد بيانات موجود (افتراضياً مجلد مؤقت)")
+    args = parser.parse_args()
+
+    data_dir = args.data_dir or tempfile.mkdtemp(prefix="surooh-brain-bench-")
+    base_url = f"http://127.0.0.1:{args.port}"
+    baseline = None
+
+    print(f"cores={os.cpu_count()} documents={args.documents} mode={args.mode} "
+          f"clients={args.clients}x{args.concurrency} data={data_dir}")
+    print(f"{'workers':>8}{'req/s':>12}{'p50 ms':>10}{'p99 ms':>10}{'speedup':>10}")
+
+    for workers in args.workers:
+        brain = start_brain(workers, args.port, data_dir)
+        try:
+            asyncio.run(wait_ready(base_url, 1))
+            asyncio.run(seed(base_url, args.documents))
+            asyncio.run(wait_ready(base_url, workers))
+
+            latencies = measure(base_url, args.clients, args.concurrency, args.duration, args.mode)
+        finally:
+            brain.terminate()
+            brain.wait()
+
+        throughput = len(latencies) / args.duration
+        baseline = baseline or throughput
+        p50 = latencies[len(latencies) // 2] * 1000 if latencies else 0.0
+        p99 = latencies[int(len(latencies) * 0.99)] * 1000 if latencies else 0.0
+        print(f"{workers:>8}{throughput:>12.1f}{p50:>10.1f}{p99:>10.1f}{throughput / baseline if baseline else 0.0:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -10,14 +10,18 @@
 from fastapi import FastAPI, HTTPException
 from pydantic import BaseModel
 import asyncio
-import aiohttp
 import json
 import uuid
 from datetime import datetime
-import openai
-import os
+import sys
+from pathlib import Path
 
-openai.api_key = os.getenv("OPENAI_API_KEY")
+# المكونات المشتركة بين الخدمات في جذر المستودع
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from surooh_common.http_client import close_shared_session, shared_session
+from surooh_common.llm_client import llm_client
+from surooh_common.streaming import sse_response, task_events
 
 app = FastAPI(title="👨‍💻 المبرمج الذكي", version="2.0.0")
 
@@ -44,7 +48,7 @@ class IntelligentCodeMaster:
     async def connect_to_smartcore(self):
         """الاتصال بـ Smart Core"""
         try:
-            async with aiohttp.ClientSession() as session:
+            async with shared_session() as session:
                 async with session.get('http://localhost:8001/') as response:
                     if response.status == 200:
                         smartcore_info = await response.json()
@@ -57,8 +61,8 @@ class IntelligentCodeMaster:
         self.smartcore_connected = False
         return False
     
-    async def intelligent_code_generation(self, task_description):
-        """توليد كود ذكي بناء على الوصف"""
+    async def intelligent_code_generation(self, task_description, on_token=None):
+        """توليد كود ذكي بناء على الوصف (on_token: بث الكود أثناء كتابته)"""
         try:
             code_prompt = f"""أنت المبرمج الذكي لأبو شام. اكتب كود احترافي:
 
@@ -73,7 +77,7 @@ class IntelligentCodeMaster:
 
 اكتب الكود كاملاً مع الشرح."""
 
-            response = openai.chat.completions.create(
+            generated_code = await llm_client.chat_text(
                 model="gpt-4o-mini",
                 messages=[
                     {
@@ -83,11 +87,10 @@ class IntelligentCodeMaster:
                     {"role": "user", "content": code_prompt}
                 ],
                 temperature=0.3,
-                max_tokens=2000
+                max_tokens=2000,
+                on_token=on_token
             )
             
-            generated_code = response.choices[0].message.content
-            
             # تحليل جودة الكود
             code_analysis = await self.analyze_code_quality(generated_code)
             
@@ -139,8 +142,8 @@ class IntelligentCodeMaster:
         except Exception as e:
             return {"score": 0.5, "suggestions": ["فحص أساسي"]}
     
-    async def create_new_bot(self, bot_specifications):
-        """إنشاء بوت جديد"""
+    async def create_new_bot(self, bot_specifications, on_token=None):
+        """إنشاء بوت جديد (on_token: بث كود البوت أثناء كتابته)"""
         try:
             bot_name = bot_specifications.get("name", f"bot_{len(self.created_bots) + 1}")
             bot_purpose = bot_specifications.get("purpose", "مساعد عام")
@@ -162,7 +165,7 @@ class IntelligentCodeMaster:
 
 اكتب الكود كاملاً جاهز للتنفيذ."""
 
-            response = openai.chat.completions.create(
+            bot_code = await llm_client.chat_text(
                 model="gpt-4o-mini",
                 messages=[
                     {
@@ -172,11 +175,10 @@ class IntelligentCodeMaster:
                     {"role": "user", "content": bot_creation_prompt}
                 ],
                 temperature=0.4,
-                max_tokens=3000
+                max_tokens=3000,
+                on_token=on_token
             )
             
-            bot_code = response.choices[0].message.content
-            
             # حفظ البوت الجديد
             new_bot = {
                 "id": str(uuid.uuid4()),
@@ -232,7 +234,7 @@ class IntelligentCodeMaster:
 
 قدم خطة تطوير عملية."""
 
-            response = openai.chat.completions.create(
+            response = await llm_client.chat(
                 model="gpt-4o-mini",
                 messages=[
                     {"role": "system", "content": "أنت مستشار تطوير ذاتي للمبرمجين الذكيين."},
@@ -257,8 +259,8 @@ class IntelligentCodeMaster:
             print(f"❌ خطأ في التطوير الذاتي: {e}")
             return None
     
-    async def process_smartcore_order(self, order):
-        """معالجة أمر من Smart Core"""
+    async def process_smartcore_order(self, order, on_token=None):
+        """معالجة أمر من Smart Core (on_token: بث الكود المولد)"""
         task_id = order.get("task_id", str(uuid.uuid4()))
         description = order.get("description", "")
         
@@ -268,7 +270,7 @@ class IntelligentCodeMaster:
         if "إنشاء بوت" in description or "بوت جديد" in description:
             # مهمة إنشاء بوت جديد
             bot_specs = await self.extract_bot_specs(description)
-            result = await self.create_new_bot(bot_specs)
+            result = await self.create_new_bot(bot_specs, on_token)
             
             return {
                 "task_id": task_id,
@@ -278,7 +280,7 @@ class IntelligentCodeMaster:
             }
         else:
             # مهمة برمجية عادية
-            code_result = await self.intelligent_code_generation(description)
+            code_result = await self.intelligent_code_generation(description, on_token)
             
             return {
                 "task_id": task_id,
@@ -303,7 +305,7 @@ class IntelligentCodeMaster:
 أجب بصيغة JSON:
 {{"name": "اسم_البوت", "purpose": "الغرض", "skills": ["مهارة1", "مهارة2"], "tasks": ["مهمة1", "مهمة2"]}}"""
 
-            response = openai.chat.completions.create(
+            response = await llm_client.chat(
                 model="gpt-4o-mini",
                 messages=[
                     {"role": "system", "content": "أنت محلل متطلبات البوتات الذكية."},
@@ -374,6 +376,10 @@ async def startup():
     
     asyncio.create_task(periodic_self_improvement())
 
+@app.on_event("shutdown")
+async def shutdown():
+    await close_shared_session()
+
 @app.get("/")
 async def root():
     return code_master.get_status()
@@ -402,6 +408,20 @@ async def execute_task(task: dict):
             "message": "فشل تنفيذ المهمة"
         }
 
+@app.post("/execute/stream")
+async def execute_task_stream(task: dict):
+    """نفس /execute مع بث الكود أثناء كتابته (SSE: token ثم done)"""
+    async def run(channel):
+        result = await code_master.process_smartcore_order(task, on_token=channel)
+        return {
+            "success": True,
+            "result": result,
+            "message": "تم تنفيذ المهمة بنجاح",
+            "timestamp": datetime.now().isoformat()
+        }
+        
+    return sse_response(task_events(run))
+
 @app.get("/created-bots")
 async def get_created_bots():
     """قائمة البوتات المُنشأة"""
@@ -11,17 +11,20 @@
 from fastapi import FastAPI, HTTPException
 from pydantic import BaseModel
 import asyncio
-import aiohttp
 import json
 import uuid
 from datetime import datetime
-import openai
-from openai import OpenAI
-import os
+import sys
 import base64
+from functools import partial
 from pathlib import Path
 
-openai.api_key = os.getenv("OPENAI_API_KEY")
+# المكونات المشتركة بين الخدمات في جذر المستودع
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from surooh_common.http_client import close_shared_session, shared_session
+from surooh_common.llm_client import llm_client
+from surooh_common.streaming import sse_response, task_events
 
 app = FastAPI(title="🎨 المصمم الذكي", version="2.0.0")
 
@@ -45,7 +48,7 @@ class IntelligentDesigner:
     async def connect_to_smartcore(self):
         """الاتصال بـ Smart Core"""
         try:
-            async with aiohttp.ClientSession() as session:
+            async with shared_session() as session:
                 async with session.get('http://localhost:8001/') as response:
                     if response.status == 200:
                         smartcore_info = await response.json()
@@ -58,8 +61,8 @@ class IntelligentDesigner:
         self.smartcore_connected = False
         return False
     
-    async def intelligent_design_analysis(self, design_request):
-        """تحليل ذكي لطلب التصميم"""
+    async def intelligent_design_analysis(self, design_request, on_token=None):
+        """تحليل ذكي لطلب التصميم (on_token: بث التحليل أثناء كتابته)"""
         try:
             analysis_prompt = f"""تحليل طلب تصميم لأبو شام:
 
@@ -75,7 +78,7 @@ class IntelligentDesigner:
 
 أجب بتحليل مفصل وعملي."""
 
-            response = openai.chat.completions.create(
+            analysis = await llm_client.chat_text(
                 model="gpt-4o-mini",
                 messages=[
                     {
@@ -85,11 +88,10 @@ class IntelligentDesigner:
                     {"role": "user", "content": analysis_prompt}
                 ],
                 temperature=0.6,
-                max_tokens=800
+                max_tokens=800,
+                on_token=on_token
             )
             
-            analysis = response.choices[0].message.content
-            
             # استخراج DALL-E prompt من التحليل
             dalle_prompt = await self.extract_dalle_prompt(analysis, design_request)
             
@@ -130,7 +132,7 @@ class IntelligentDesigner:
 
 اكتب الـ prompt فقط."""
 
-            response = openai.chat.completions.create(
+            response = await llm_client.chat(
                 model="gpt-4o-mini",
                 messages=[
                     {"role": "system", "content": "أنت خبير كتابة DALL-E prompts المحترفة."},
@@ -166,11 +168,7 @@ class IntelligentDesigner:
         try:
             print(f"🎨 توليد صورة: {dalle_prompt[:50]}...")
             
-            # استخدام OpenAI client مباشر
-            from openai import OpenAI
-            client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-            
-            response = client.images.generate(
+            response = await llm_client.generate_image(
                 model="dall-e-3",
                 prompt=dalle_prompt,
                 size="1024x1024",
@@ -208,7 +206,7 @@ class IntelligentDesigner:
     async def save_image_to_library(self, image_url, design_type):
         """حفظ الصورة في المكتبة"""
         try:
-            async with aiohttp.ClientSession() as session:
+            async with shared_session() as session:
                 async with session.get(image_url) as response:
                     if response.status == 200:
                         image_data = await response.read()
@@ -237,15 +235,17 @@ class IntelligentDesigner:
             print(f"❌ فشل حفظ الصورة: {e}")
             return None
     
-    async def process_design_order(self, order):
-        """معالجة طلب تصميم من Smart Core"""
+    async def process_design_order(self, order, on_token=None):
+        """معالجة طلب تصميم من Smart Core (on_token: بث التحليل ثم الوصف، كل جزء مع stage)"""
         description = order.get("task_description", "")
         task_id = order.get("task_id", str(uuid.uuid4()))
         
         print(f"🎨 طلب تصميم: {description[:40]}...")
         
         # تحليل ذكي
-        analysis = await self.intelligent_design_analysis(description)
+        analysis = await self.intelligent_design_analysis(
+            description, partial(on_token, stage="analysis") if on_token else None
+        )
         
         # توليد الصورة
         image_result = await self.generate_image_with_dalle(
@@ -254,7 +254,9 @@ class IntelligentDesigner:
         )
         
         # إنشاء وصف احترافي للتصميم
-        design_description = await self.create_design_description(description, analysis, image_result)
+        design_description = await self.create_design_description(
+            description, analysis, image_result, partial(on_token, stage="description") if on_token else None
+        )
         
         # حفظ التصميم المكتمل
         completed_design = {
@@ -276,8 +278,8 @@ class IntelligentDesigner:
         
         return completed_design
     
-    async def create_design_description(self, request, analysis, image_result):
-        """إنشاء وصف احترافي للتصميم"""
+    async def create_design_description(self, request, analysis, image_result, on_token=None):
+        """إنشاء وصف احترافي للتصميم (on_token: بث الوصف أثناء كتابته)"""
         if image_result.get("error"):
             return f"❌ فشل إنشاء تصميم لـ: {request}"
         
@@ -296,18 +298,17 @@ class IntelligentDesigner:
 
 اكتب باللغة العربية بأسلوب مصمم محترف."""
 
-            response = openai.chat.completions.create(
+            return await llm_client.chat_text(
                 model="gpt-4o-mini",
                 messages=[
                     {"role": "system", "content": "أنت مصمم محترف تكتب أوصاف إبداعية للتصاميم."},
                     {"role": "user", "content": description_prompt}
                 ],
                 temperature=0.7,
-                max_tokens=400
+                max_tokens=400,
+                on_token=on_token
             )
             
-            return response.choices[0].message.content
-            
         except Exception as e:
             return f"تصميم جديد تم إنشاؤه لـ: {request}"
     
@@ -337,7 +338,7 @@ class IntelligentDesigner:
 
 اقترح تحسينات وتقنيات جديدة لأتطور."""
 
-            response = openai.chat.completions.create(
+            response = await llm_client.chat(
                 model="gpt-4o-mini",
                 messages=[
                     {"role": "system", "content": "أنت مستشار تطوير للمصممين الذكيين."},
@@ -431,6 +432,10 @@ async def startup():
     
     asyncio.create_task(periodic_development())
 
+@app.on_event("shutdown")
+async def shutdown():
+    await close_shared_session()
+
 @app.get("/")
 async def root():
     return design_genius.get_status()
@@ -463,6 +468,22 @@ async def execute_design_task(task: dict):
             "message": "فشل في إنشاء التصميم"
         }
 
+@app.post("/execute/stream")
+async def execute_design_task_stream(task: dict):
+    """نفس /execute مع بث التحليل والوصف أثناء كتابتهما (SSE: token ثم done)"""
+    async def run(channel):
+        result = await design_genius.process_design_order(task, on_token=channel)
+        surooh_message = await design_genius.send_to_surooh_chat(result)
+        return {
+            "success": True,
+            "design_result": result,
+            "surooh_message": surooh_message,
+            "message": "تم إنشاء التصميم بنجاح!",
+            "timestamp": datetime.now().isoformat()
+        }
+        
+    return sse_response(task_events(run))
+
 @app.get("/design-library")
 async def get_design_library():
     """مكتبة التصاميم"""
@@ -11,16 +11,20 @@
 from fastapi import FastAPI, HTTPException
 from pydantic import BaseModel
 import asyncio
-import aiohttp
 import json
 import uuid
 from datetime import datetime
-import openai
-import os
+import sys
 import subprocess
+from functools import partial
 from pathlib import Path
 
-openai.api_key = os.getenv("OPENAI_API_KEY")
+# المكونات المشتركة بين الخدمات في جذر المستودع
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from surooh_common.http_client import close_shared_session, shared_session
+from surooh_common.llm_client import llm_client
+from surooh_common.streaming import sse_response, task_events
 
 app = FastAPI(title="🏗️ بوت التطوير الذكي", version="2.0.0")
 
@@ -44,7 +48,7 @@ class IntelligentDeveloper:
         """الاتصال بالأنظمة"""
         # اتصال Smart Core
         try:
-            async with aiohttp.ClientSession() as session:
+            async with shared_session() as session:
                 async with session.get('http://localhost:8001/') as response:
                     if response.status == 200:
                         self.smartcore_connected = True
@@ -54,7 +58,7 @@ class IntelligentDeveloper:
             
         # اتصال المخ
         try:
-            async with aiohttp.ClientSession() as session:
+            async with shared_session() as session:
                 async with session.get('http://localhost:8006/') as response:
                     if response.status == 200:
                         self.brain_connected = True
@@ -62,8 +66,8 @@ class IntelligentDeveloper:
         except:
             self.brain_connected = False
     
-    async def deep_analysis_thinking(self, development_request):
-        """تفكير عميق وتحليل متقدم"""
+    async def deep_analysis_thinking(self, development_request, on_token=None):
+        """تفكير عميق وتحليل متقدم (on_token: بث التحليل أثناء كتابته)"""
         try:
             deep_thinking_prompt = f"""تحليل تطويري عميق لأبو شام:
 
@@ -93,7 +97,7 @@ class IntelligentDeveloper:
 
 فكر بعمق واعط تحليل شامل ومفصل."""
 
-            response = openai.chat.completions.create(
+            deep_analysis = await llm_client.chat_text(
                 model="gpt-4o-mini",
                 messages=[
                     {
@@ -110,11 +114,10 @@ class IntelligentDeveloper:
                     {"role": "user", "content": deep_thinking_prompt}
                 ],
                 temperature=0.4,
-                max_tokens=1200
+                max_tokens=1200,
+                on_token=on_token
             )
             
-            deep_analysis = response.choices[0].message.content
-            
             return {
                 "deep_analysis": deep_analysis,
                 "thinking_level": "advanced",
@@ -147,7 +150,7 @@ class IntelligentDeveloper:
 
 أجب بتقييم واضح ومختصر."""
 
-            response = openai.chat.completions.create(
+            response = await llm_client.chat(
                 model="gpt-4o-mini",
                 messages=[
                     {"role": "system", "content": "أنت خبير أمان الأنظمة والتحديثات."},
@@ -219,8 +222,8 @@ class IntelligentDeveloper:
             print(f"❌ فشل طلب موافقة المخ: {e}")
             return {"approved": False, "message": "فشل التواصل مع المخ"}
     
-    async def execute_development(self, development_plan):
-        """تنفيذ التطوير"""
+    async def execute_development(self, development_plan, on_token=None):
+        """تنفيذ التطوير (on_token: بث ناتج التطوير أثناء كتابته)"""
         try:
             print(f"🔧 بدء تنفيذ التطوير...")
             
@@ -228,13 +231,13 @@ class IntelligentDeveloper:
             dev_type = development_plan.get("development_type", "general")
             
             if dev_type == "code_update":
-                result = await self.update_code_base(development_plan)
+                result = await self.update_code_base(development_plan, on_token)
             elif dev_type == "feature_addition":
-                result = await self.add_new_feature(development_plan)
+                result = await self.add_new_feature(development_plan, on_token)
             elif dev_type == "system_optimization":
-                result = await self.optimize_system(development_plan)
+                result = await self.optimize_system(development_plan, on_token)
             else:
-                result = await self.general_development(development_plan)
+                result = await self.general_development(development_plan, on_token)
             
             return result
             
@@ -242,7 +245,7 @@ class IntelligentDeveloper:
             print(f"❌ فشل التنفيذ: {e}")
             return {"success": False, "error": str(e)}
     
-    async def update_code_base(self, plan):
+    async def update_code_base(self, plan, on_token=None):
         """تحديث قاعدة الكود"""
         try:
             update_prompt = f"""كمطور ذكي، اكتب تحديث للكود:
@@ -257,18 +260,17 @@ class IntelligentDeveloper:
 
 اكتب كود احترافي جاهز للتنفيذ."""
 
-            response = openai.chat.completions.create(
+            updated_code = await llm_client.chat_text(
                 model="gpt-4o-mini",
                 messages=[
                     {"role": "system", "content": "أنت مطور خبير في تحديث الأنظمة المعقدة."},
                     {"role": "user", "content": update_prompt}
                 ],
                 temperature=0.3,
-                max_tokens=2000
+                max_tokens=2000,
+                on_token=on_token
             )
             
-            updated_code = response.choices[0].message.content
-            
             return {
                 "success": True,
                 "updated_code": updated_code,
@@ -279,7 +281,7 @@ class IntelligentDeveloper:
         except Exception as e:
             return {"success": False, "error": str(e)}
     
-    async def add_new_feature(self, plan):
+    async def add_new_feature(self, plan, on_token=None):
         """إضافة ميزة جديدة"""
         try:
             feature_prompt = f"""إنشاء ميزة جديدة:
@@ -295,18 +297,17 @@ class IntelligentDeveloper:
 
 اكتب حل متكامل وجاهز."""
 
-            response = openai.chat.completions.create(
+            feature_code = await llm_client.chat_text(
                 model="gpt-4o-mini",
                 messages=[
                     {"role": "system", "content": "أنت خبير إضافة الميزات الجديدة للأنظمة."},
                     {"role": "user", "content": feature_prompt}
                 ],
                 temperature=0.4,
-                max_tokens=2500
+                max_tokens=2500,
+                on_token=on_token
             )
             
-            feature_code = response.choices[0].message.content
-            
             return {
                 "success": True,
                 "feature_code": feature_code,
@@ -317,7 +318,7 @@ class IntelligentDeveloper:
         except Exception as e:
             return {"success": False, "error": str(e)}
     
-    async def optimize_system(self, plan):
+    async def optimize_system(self, plan, on_token=None):
         """تحسين النظام"""
         try:
             optimization_prompt = f"""تحسين النظام:
@@ -333,18 +334,17 @@ class IntelligentDeveloper:
 
 اكتب خطة تحسين شاملة ومفصلة."""
 
-            response = openai.chat.completions.create(
+            optimization_plan = await llm_client.chat_text(
                 model="gpt-4o-mini",
                 messages=[
                     {"role": "system", "content": "أنت خبير تحسين الأنظمة والأداء."},
                     {"role": "user", "content": optimization_prompt}
                 ],
                 temperature=0.5,
-                max_tokens=1500
+                max_tokens=1500,
+                on_token=on_token
             )
             
-            optimization_plan = response.choices[0].message.content
-            
             return {
                 "success": True,
                 "optimization_plan": optimization_plan,
@@ -355,7 +355,7 @@ class IntelligentDeveloper:
         except Exception as e:
             return {"success": False, "error": str(e)}
     
-    async def general_development(self, plan):
+    async def general_development(self, plan, on_token=None):
         """تطوير عام"""
         try:
             general_prompt = f"""تطوير عام للنظام:
@@ -371,7 +371,7 @@ class IntelligentDeveloper:
 
 فكر بشكل شامل ومتقدم."""
 
-            response = openai.chat.completions.create(
+            development_result = await llm_client.chat_text(
                 model="gpt-4o-mini",
                 messages=[
                     {
@@ -381,11 +381,10 @@ class IntelligentDeveloper:
                     {"role": "user", "content": general_prompt}
                 ],
                 temperature=0.6,
-                max_tokens=2000
+                max_tokens=2000,
+                on_token=on_token
             )
             
-            development_result = response.choices[0].message.content
-            
             return {
                 "success": True,
                 "development_result": development_result,
@@ -410,7 +409,7 @@ class IntelligentDeveloper:
 
 ضع خطة تطوير ذاتي شاملة."""
 
-            response = openai.chat.completions.create(
+            response = await llm_client.chat(
                 model="gpt-4o-mini",
                 messages=[
                     {"role": "system", "content": "أنت مستشار تطوير ذاتي للمطورين النخبة."},
@@ -439,15 +438,17 @@ class IntelligentDeveloper:
             print(f"❌ خطأ في تطوير الذات: {e}")
             return None
     
-    async def process_smartcore_order(self, order):
-        """معالجة أمر من Smart Core"""
+    async def process_smartcore_order(self, order, on_token=None):
+        """معالجة أمر من Smart Core (on_token: بث التحليل ثم ناتج التطوير، كل جزء مع stage)"""
         description = order.get("task_description", "")
         task_id = order.get("task_id", str(uuid.uuid4()))
         
         print(f"📨 أمر تطوير من Smart Core: {description[:50]}...")
         
         # تفكير عميق وتحليل
-        analysis = await self.deep_analysis_thinking(description)
+        analysis = await self.deep_analysis_thinking(
+            description, partial(on_token, stage="analysis") if on_token else None
+        )
         
         # طلب موافقة المخ
         brain_approval = await self.request_brain_approval(analysis, description)
@@ -462,7 +463,9 @@ class IntelligentDeveloper:
                 "analysis": analysis
             }
             
-            result = await self.execute_development(development_plan)
+            result = await self.execute_development(
+                development_plan, partial(on_token, stage="development") if on_token else None
+            )
             
             # حفظ التطوير
             completed_dev = {
@@ -584,6 +587,10 @@ async def startup():
     
     asyncio.create_task(periodic_evolution())
 
+@app.on_event("shutdown")
+async def shutdown():
+    await close_shared_session()
+
 @app.get("/")
 async def root():
     return fullstack_pro.get_status()
@@ -612,6 +619,20 @@ async def execute_development_task(task: dict):
             "message": "فشل التطوير"
         }
 
+@app.post("/execute/stream")
+async def execute_development_task_stream(task: dict):
+    """نفس /execute مع بث التحليل وناتج التطوير أثناء كتابتهما (SSE: token ثم done)"""
+    async def run(channel):
+        result = await fullstack_pro.process_smartcore_order(task, on_token=channel)
+        return {
+            "success": True,
+            "development_result": result,
+            "message": "تم تحليل وتنفيذ التطوير!",
+            "timestamp": datetime.now().isoformat()
+        }
+        
+    return sse_response(task_events(run))
+
 @app.get("/development-history")
 async def get_development_history():
     """تاريخ التطويرات"""
@@ -13,20 +13,47 @@ Advanced Brain System according to Abu Sham's World-Class Specifications
 - Observability & Monitoring
 """
 
-from fastapi import FastAPI, HTTPException, BackgroundTasks, Depends
+from fastapi import FastAPI, HTTPException, Depends, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from pydantic import BaseModel, Field
-from typing import List, Dict, Any, Optional, Union
+from typing import List, Dict, Any, Callable, Iterable, Optional, Union, Literal
 import asyncio
 import aiohttp
+import heapq
+import math
 import uuid
 import json
 import time
 from datetime import datetime, timedelta
 import logging
+import multiprocessing
 import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
 from contextlib import asynccontextmanager
+from pathlib import Path
+
+import numpy as np
+
+# المكونات المشتركة بين الخدمات في جذر المستودع
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from surooh_common.circuit_breaker import CircuitBreaker, breakers
+from surooh_common.http_client import close_shared_session, http_client, shared_session
+
+from ann_index import IVFIndex
+from auth import AuthError, TokenVerifier
+from chunker import Chunk, chunk_text, content_hash, iter_chunks
+from ingestion import IngestionJob, IngestionPipeline, QueueFullError, RegistryFullError, SharedJobView
+from rate_limiter import RateLimitDecision, TokenBucketLimiter, create_backend
+from segment_store import SegmentStore, file_lock
+from shared_state import SharedState
+from task_queue import (
+    BotRejectedError, BotUnavailableError, QueuedTask, RetryPolicy, TaskQueue, load_mapping, load_retry_policies
+)
+from vector_store import VectorStore, create_embedder, embed_texts
 
 # إعداد اللوجات المتقدمة
 logging.basicConfig(
@@ -35,6 +62,12 @@ logging.basicConfig(
 )
 logger = logging.getLogger("SuroohBrainEnterprise")
 
+# مجلد البيانات الدائمة (الوثائق، القطع، المتجهات)
+BRAIN_DATA_DIR = os.getenv(
+    "SUROOH_BRAIN_DATA_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+)
+
 # نماذج البيانات المتقدمة
 class IngestRequest(BaseModel):
     source_type: str = Field(..., description="نوع المصدر: gmail, github, bol, custom")
@@ -43,26 +76,32 @@ class IngestRequest(BaseModel):
     metadata: Dict[str, Any] = Field(default_factory=dict)
     user_id: str = Field(default="abu_sham")
 
+class BatchIngestRequest(BaseModel):
+    items: List[IngestRequest] = Field(..., min_length=1, max_length=1000, description="الوثائق المراد إدخالها دفعة واحدة")
+
 class QueryRequest(BaseModel):
     user_id: str = Field(default="abu_sham")
     session_id: Optional[str] = Field(None)
     query_text: str = Field(..., description="النص المراد الاستعلام عنه")
-    top_k: int = Field(default=3, description="عدد النتائج المطلوبة")
-    mode: str = Field(default="hybrid", description="نمط البحث: semantic, keyword, hybrid")
+    top_k: int = Field(default=3, ge=1, description="عدد النتائج المطلوبة")
+    mode: Literal["semantic", "keyword", "hybrid"] = Field(default="hybrid", description="نمط البحث: semantic, keyword, hybrid")
     context_length: int = Field(default=2000)
+    nprobe: Optional[int] = Field(None, ge=1, description="عدد قوائم الفهرس التقريبي المفحوصة: أعلى = دقة أكبر وزمن أطول")
+    exact: bool = Field(default=False, description="بحث كامل بدون الفهرس التقريبي")
 
 class ExecuteRequest(BaseModel):
     agent_name: str = Field(..., description="اسم البوت: code_master, design_genius, fullstack_pro")
     task_payload: Dict[str, Any] = Field(..., description="تفاصيل المهمة")
-    priority: str = Field(default="normal", description="الأولوية: low, normal, high, urgent")
+    priority: Literal["low", "normal", "high", "urgent"] = Field(default="normal", description="الأولوية: low, normal, high, urgent")
     user_id: str = Field(default="abu_sham")
 
 class TaskStatus(BaseModel):
     task_id: str
-    status: str  # pending, running, completed, failed
+    status: str  # queued, running, retrying, completed, failed
     result: Optional[Dict[str, Any]] = None
     error: Optional[str] = None
     attempts: int = 0
+    next_attempt_at: Optional[datetime] = None
     created_at: datetime
     updated_at: datetime
     trace_id: str
@@ -70,208 +109,665 @@ class TaskStatus(BaseModel):
 # 🔐 نظام الحماية والمصادقة
 security = HTTPBearer()
 
+# JWT (SUROOH_JWT_SECRET) + توكن الخدمة الداخلي، مع كاش للتوكنات المتحقق منها
+token_verifier = TokenVerifier.from_env()
+
 async def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
     """التحقق من صحة الـ token"""
-    token = credentials.credentials
+    try:
+        claims = token_verifier.verify(credentials.credentials)
+    except AuthError as e:
+        raise HTTPException(
+            status_code=401, detail=f"Unauthorized access: {e}", headers={"WWW-Authenticate": "Bearer"}
+        )
     
-    # في الإنتاج: التحقق من JWT أو OAuth2
-    if token == "surooh-enterprise-token-abu-sham" or token.startswith("ghp_"):
-        return {"user_id": "abu_sham", "role": "admin", "permissions": ["*"]}
+    return claims.user_info
+
+def require_scope(scope: str):
+    """اعتمادية تتطلب صلاحية محددة في التوكن"""
+    async def check_scope(user_info: dict = Depends(verify_token)):
+        permissions = user_info["permissions"]
+        if "*" not in permissions and scope not in permissions:
+            raise HTTPException(status_code=403, detail=f"Missing scope: {scope}")
+        return user_info
     
-    raise HTTPException(status_code=401, detail="Unauthorized access")
+    return check_scope
 
 # 🎛️ API Gateway والإدارة المركزية  
 class APIGateway:
     def __init__(self):
-        self.rate_limits = {}  # {user_id: {requests: count, window_start: timestamp}}
+        # مخزن الدلاء: memory (عامل واحد)، shared (كل عمال الجهاز)، redis (كل الأجهزة)
+        self.rate_limiter = TokenBucketLimiter(create_backend(os.path.join(BRAIN_DATA_DIR, "rate_limits.bin")))
         self.blocked_ips = set()
         
-    async def check_rate_limit(self, user_id: str, limit: int = 100, window: int = 3600):
-        """فحص معدل الطلبات"""
-        now = time.time()
+    async def check_rate_limit(
+        self,
+        user_id: str,
+        route: str,
+        response: Optional[Response] = None,
+        cost: Optional[float] = None,
+        tier: Optional[str] = None
+    ) -> RateLimitDecision:
+        """فحص معدل الطلبات بدلو مستقل لكل مستخدم ومسار (وحد فئة التوكن إن وُجد)"""
+        decision = await self.rate_limiter.acquire(user_id, route, cost=cost, tier=tier)
         
-        if user_id not in self.rate_limits:
-            self.rate_limits[user_id] = {"requests": 0, "window_start": now}
+        if not decision.allowed:
+            raise HTTPException(status_code=429, detail="Rate limit exceeded", headers=decision.headers())
             
-        user_limits = self.rate_limits[user_id]
+        if response is not None:
+            response.headers.update(decision.headers())
+        return decision
+
+# 📇 الفهرس المقلوب (كلمة → قائمة القطع) مع ترتيب BM25
+class InvertedIndex:
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.postings = {}       # {term: [(chunk_ordinal, term_frequency), ...]}
+        self.chunk_lengths = []  # عدد الكلمات في كل قطعة حسب رقمها في المخزن
+        self.chunk_count = 0
+        self.total_length = 0
+        self.k1 = k1
+        self.b = b
+        
+    @staticmethod
+    def tokenize(text: str) -> List[str]:
+        """تقطيع النص لكلمات"""
+        return text.lower().split()
+        
+    def add_chunk(self, chunk_ordinal: int, text: str):
+        """فهرسة قطعة برقمها في المخزن"""
+        terms = self.tokenize(text)
+        
+        # الإحماء والإدخال الجديد قد يفهرسان بترتيب غير متسلسل
+        if chunk_ordinal >= len(self.chunk_lengths):
+            self.chunk_lengths.extend([0] * (chunk_ordinal + 1 - len(self.chunk_lengths)))
+        self.chunk_lengths[chunk_ordinal] = len(terms)
+        self.chunk_count += 1
+        self.total_length += len(terms)
         
-        # إعادة تعيين النافذة إذا انتهت
-        if now - user_limits["window_start"] > window:
-            user_limits["requests"] = 0
-            user_limits["window_start"] = now
+        frequencies = {}
+        for term in terms:
+            frequencies[term] = frequencies.get(term, 0) + 1
+        for term, frequency in frequencies.items():
+            self.postings.setdefault(term, []).append((chunk_ordinal, frequency))
+                
+    def bm25_scores(self, query: str) -> Dict[int, float]:
+        """نقاط BM25 للقطع التي تشارك الاستعلام كلمة واحدة على الأقل"""
+        chunk_count = self.chunk_count
+        if not chunk_count:
+            return {}
             
-        user_limits["requests"] += 1
+        average_length = self.total_length / chunk_count or 1.0
+        scores = {}
         
-        if user_limits["requests"] > limit:
-            raise HTTPException(status_code=429, detail="Rate limit exceeded")
+        for term in set(self.tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+                
+            idf = math.log(1 + (chunk_count - len(postings) + 0.5) / (len(postings) + 0.5))
             
-        return True
+            for chunk_ordinal, frequency in postings:
+                length_norm = 1 - self.b + self.b * self.chunk_lengths[chunk_ordinal] / average_length
+                term_score = idf * frequency * (self.k1 + 1) / (frequency + self.k1 * length_norm)
+                scores[chunk_ordinal] = scores.get(chunk_ordinal, 0.0) + term_score
+                
+        return scores
 
 # 🧠 نظام الذاكرة المتقدم
 class MemoryService:
-    def __init__(self):
-        self.sessions = {}  # {session_id: {context, last_activity, pinned_docs}}
-        self.documents = {}  # {doc_id: {content, metadata, chunks}}
-        self.vectors = {}   # {vector_id: {embedding, metadata}}
+    def __init__(self, data_dir: str = BRAIN_DATA_DIR):
+        self.store = SegmentStore(data_dir)  # الوثائق والقطع على القرص (mmap)
+        self.state = SharedState(os.path.join(data_dir, "state.db"))  # الجلسات والمهام (مشتركة بين العمال)
+        self.doc_ordinals = {}  # {doc_id: doc_ordinal}
+        self.content_hashes = {}  # {بصمة الوثيقة: doc_id} لمنع تخزين نفس المحتوى مرتين
+        self.chunk_ordinals = {}  # {بصمة القطعة: chunk_ordinal} لإعادة استخدام القطع المتطابقة
+        self.embedder = create_embedder()
+        self.vectors = VectorStore(  # صف لكل قطعة: مفتاحه رقم القطعة في المخزن
+            self.embedder.dim,
+            path=os.path.join(data_dir, f"vectors_{self.embedder.name}_{self.embedder.dim}"),
+            lock=self.store.write_lock
+        )
+        self.index = InvertedIndex()  # فهرس مقلوب يُحدَّث عند التخزين
+        self.chunk_tokens = int(os.getenv("SUROOH_CHUNK_TOKENS", "512"))
+        self.chunk_overlap = int(os.getenv("SUROOH_CHUNK_OVERLAP", "64"))
+        self.warmup = {"state": "pending", "documents_loaded": 0, "chunks_embedded": 0}
+        self.synced_documents = 0  # كل الوثائق قبل هذا الرقم مسجلة في الفهارس المحلية
+        self.hashed_documents = 0  # كل الوثائق قبل هذا الرقم مسجلة في خرائط التكرار
+        self.dedup_ready = asyncio.Event()  # التخزين ينتظر تسجيل بصمات الوثائق الموجودة
+        self.worker_pool = None  # عمليات المعالجة (تُضبط من AdvancedBrainCore)
         
     async def create_session(self, user_id: str) -> str:
         """إنشاء جلسة جديدة"""
         session_id = str(uuid.uuid4())
-        self.sessions[session_id] = {
-            "user_id": user_id,
-            "context": [],
-            "pinned_docs": [],
-            "last_activity": datetime.now(),
-            "created_at": datetime.now()
-        }
+        self.state.create_session(session_id, user_id)
         logger.info(f"📝 تم إنشاء جلسة جديدة: {session_id} للمستخدم: {user_id}")
         return session_id
         
     async def add_to_context(self, session_id: str, context_item: dict):
-        """إضافة عنصر للسياق"""
-        if session_id in self.sessions:
-            self.sessions[session_id]["context"].append(context_item)
-            self.sessions[session_id]["last_activity"] = datetime.now()
-            
-            # الحد الأقصى للسياق
-            if len(self.sessions[session_id]["context"]) > 50:
-                self.sessions[session_id]["context"] = self.sessions[session_id]["context"][-50:]
+        """إضافة عنصر للسياق (الحد الأقصى 50 عنصر)"""
+        self.state.append_context(session_id, context_item, max_items=50)
                 
     async def get_session_context(self, session_id: str) -> List[dict]:
         """جلب سياق الجلسة"""
-        if session_id in self.sessions:
-            return self.sessions[session_id]["context"]
-        return []
-        
-    async def store_document(self, doc_id: str, content: str, metadata: dict):
-        """تخزين وثيقة في الذاكرة"""
-        chunks = await self.chunk_document(content)
-        
-        self.documents[doc_id] = {
-            "content": content,
-            "metadata": metadata,
-            "chunks": chunks,
-            "stored_at": datetime.now()
+        return self.state.get_context(session_id)
+        
+    async def store_document(
+        self,
+        doc_id: str,
+        content: str,
+        metadata: dict,
+        chunks: Optional[Iterable[Chunk]] = None
+    ) -> dict:
+        """تقطيع الوثيقة تدفقياً (أو استخدام قطع جاهزة) وتخزين الجديد فقط من محتواها"""
+        document_hash = content_hash(content)
+        await self.dedup_ready.wait()
+        
+        if chunks is None:
+            chunks = iter_chunks(content, self.chunk_tokens, self.chunk_overlap)
+            
+        # الكتابة تحت قفل المخزن بعد تسجيل ما أضافه العمال الآخرون (حتى يرى منع التكرار كل شيء)
+        with self.store.write_lock():
+            self.catch_up()
+            
+            # نفس المحتوى مخزن مسبقاً: إرجاع الوثيقة الموجودة بدون أي تخزين
+            existing_id = self.content_hashes.get(document_hash)
+            if existing_id is not None:
+                existing = self.store.document(self.doc_ordinals[existing_id])
+                logger.info(f"♻️ وثيقة مكررة: {doc_id} = {existing_id}")
+                return {
+                    "doc_id": existing_id,
+                    "duplicate": True,
+                    "new_ordinals": [],
+                    "chunks_new": 0,
+                    "chunks_reused": len(existing["chunks"])
+                }
+            
+            doc_ordinal = self.store.document_count
+            ordinals = []
+            new_ordinals = []
+            
+            # كل قطعة جديدة تُكتب وتُفهرس فور إنتاجها، والمكررة يُشار لنسختها الموجودة
+            for chunk in chunks:
+                ordinal = self.chunk_ordinals.get(chunk.chunk_id)
+                if ordinal is None:
+                    ordinal = self.store.append_chunk(chunk, doc_ordinal)
+                    self.chunk_ordinals[chunk.chunk_id] = ordinal
+                    self.index.add_chunk(ordinal, chunk.text)
+                    new_ordinals.append(ordinal)
+                ordinals.append(ordinal)
+                
+            self.store.append_document(doc_id, metadata, datetime.now().isoformat(), ordinals, document_hash)
+            self.doc_ordinals[doc_id] = doc_ordinal
+            self.content_hashes[document_hash] = doc_id
+            if self.synced_documents == doc_ordinal:
+                self.synced_documents += 1
+            if self.hashed_documents == doc_ordinal:
+                self.hashed_documents += 1
+        
+        logger.info(f"📚 تم تخزين وثيقة: {doc_id} ({len(new_ordinals)} قطعة جديدة من {len(ordinals)})")
+        return {
+            "doc_id": doc_id,
+            "duplicate": False,
+            "new_ordinals": new_ordinals,
+            "chunks_new": len(new_ordinals),
+            "chunks_reused": len(ordinals) - len(new_ordinals)
         }
         
-        logger.info(f"📚 تم تخزين وثيقة: {doc_id} ({len(chunks)} قطعة)")
-        return chunks
+    def duplicate_of(self, content: str) -> Optional[str]:
+        """معرف الوثيقة المخزنة بنفس المحتوى (قبل صرف وقت في تقطيعه)"""
+        return self.content_hashes.get(content_hash(content))
         
-    async def chunk_document(self, content: str, chunk_size: int = 512) -> List[dict]:
-        """تقطيع الوثيقة إلى أجزاء"""
-        words = content.split()
-        chunks = []
+    def missing_vectors(self, ordinals: List[int]) -> List[int]:
+        """القطع التي ليس لها متجه بعد (عند إعادة محاولة فشلت في منتصفها)"""
+        present = np.isin(ordinals, self.vectors.keys)
+        return [ordinal for ordinal, has_vector in zip(ordinals, present) if not has_vector]
         
-        for i in range(0, len(words), chunk_size):
-            chunk_words = words[i:i + chunk_size]
-            chunk_text = " ".join(chunk_words)
+    async def embed_chunks(
+        self,
+        ordinals: List[int],
+        batch_size: int = 256,
+        on_batch: Optional[Callable[[int, float], None]] = None
+    ) -> List[range]:
+        """إنشاء متجهات القطع المخزنة على دفعات وإرجاع صفوفها (on_batch: عدد القطع وزمن الدفعة)"""
+        rows = []
+        loop = asyncio.get_running_loop()
+        
+        for start in range(0, len(ordinals), batch_size):
+            batch = ordinals[start:start + batch_size]
+            batch_started = time.perf_counter()
+            texts = [self.store.chunk_text(ordinal) for ordinal in batch]
             
-            chunk = {
-                "chunk_id": str(uuid.uuid4()),
-                "text": chunk_text,
-                "position": i,
-                "word_count": len(chunk_words),
-                "created_at": datetime.now().isoformat()
-            }
-            chunks.append(chunk)
+            # المولد المحلي يحتاج المعالج: عملية منفصلة حتى لا يحجز الـ GIL عن الاستعلامات
+            if self.embedder.cpu_bound and self.worker_pool is not None:
+                embeddings = await loop.run_in_executor(self.worker_pool, embed_texts, self.embedder, texts)
+            else:
+                embeddings = await asyncio.to_thread(self.embedder.embed, texts)
+            rows.append(self.vectors.add(batch, embeddings))
             
-        return chunks
-
+            if on_batch is not None:
+                on_batch(len(batch), time.perf_counter() - batch_started)
+            
+        return rows
+        
+    def register_hash(self, doc_ordinal: int, record: dict):
+        """تسجيل وثيقة مخزنة في خرائط التكرار فقط"""
+        self.doc_ordinals.setdefault(record["doc_id"], doc_ordinal)
+        if record.get("content_hash"):
+            self.content_hashes.setdefault(record["content_hash"], record["doc_id"])
+            
+    def register_document(self, doc_ordinal: int, record: dict) -> List[int]:
+        """تسجيل وثيقة مخزنة في خرائط التكرار والفهرس المقلوب، وإرجاع القطع المفهرسة الآن"""
+        self.register_hash(doc_ordinal, record)
+            
+        # القطعة قد تتكرر في عدة وثائق، أو تكون فُهرست عند تخزينها في هذه العملية
+        indexed = []
+        for ordinal in record["chunks"]:
+            if ordinal >= self.store.chunk_count:
+                continue
+            chunk_id = self.store.chunk_id(ordinal)
+            if chunk_id in self.chunk_ordinals:
+                continue
+                
+            self.chunk_ordinals[chunk_id] = ordinal
+            self.index.add_chunk(ordinal, self.store.chunk_text(ordinal))
+            indexed.append(ordinal)
+            
+        return indexed
+        
+    def catch_up(self) -> int:
+        """رؤية ما أضافته العمليات الأخرى وتسجيل وثائقها (بعد اكتمال الإحماء)"""
+        self.store.refresh()
+        self.vectors.refresh()
+        if self.warmup["state"] != "ready":
+            # أثناء الإحماء: البصمات فقط حتى يرى منع التكرار وثائق العمال الآخرين
+            if self.dedup_ready.is_set():
+                while self.hashed_documents < self.store.document_count:
+                    self.register_hash(self.hashed_documents, self.store.document(self.hashed_documents))
+                    self.hashed_documents += 1
+            return 0
+            
+        start = self.synced_documents
+        while self.synced_documents < self.store.document_count:
+            self.register_document(self.synced_documents, self.store.document(self.synced_documents))
+            self.synced_documents += 1
+            
+        return self.synced_documents - start
+        
+    async def warm_up(self, batch_size: int = 512):
+        """إعادة بناء الفهرس المقلوب من المخزن الدائم في الخلفية"""
+        self.warmup["state"] = "running"
+        started = time.time()
+        
+        # عامل واحد فقط يكمل المتجهات الناقصة (باقي العمال يفهرسون فقط)
+        repair_fd = os.open(os.path.join(self.store.path, "warmup.lock"), os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            with file_lock(repair_fd, blocking=False) as repairing:
+                self.store.refresh()
+                self.vectors.refresh()
+                
+                # أولاً بصمات الوثائق (قراءة السجلات فقط): التخزين ينتظرها حتى لا يكرر وثيقة موجودة
+                while self.hashed_documents < self.store.document_count:
+                    self.register_hash(self.hashed_documents, self.store.document(self.hashed_documents))
+                    self.hashed_documents += 1
+                    if self.hashed_documents % 1000 == 0:
+                        await asyncio.sleep(0)
+                self.dedup_ready.set()
+                
+                # القطع التي لها متجه محفوظ مسبقاً
+                embedded = np.zeros(self.store.chunk_count, dtype=bool)
+                embedded[self.vectors.keys] = True
+                pending = []
+                
+                # الوثائق المضافة أثناء الإحماء تُفهرس مباشرة عند تخزينها
+                while self.synced_documents < self.store.document_count:
+                    doc_ordinal = self.synced_documents
+                    for ordinal in self.register_document(doc_ordinal, self.store.document(doc_ordinal)):
+                        if repairing and ordinal < len(embedded) and not embedded[ordinal]:
+                            pending.append(ordinal)
+                    self.synced_documents += 1
+                    
+                    # متجهات القطع التي لم تكتمل معالجتها قبل الإيقاف
+                    if len(pending) >= batch_size:
+                        self.warmup["chunks_embedded"] += len(pending)
+                        await self.embed_chunks(pending)
+                        pending = []
+                        
+                    self.warmup["documents_loaded"] = doc_ordinal + 1
+                    if doc_ordinal % 100 == 99:
+                        await asyncio.sleep(0)  # إفساح المجال للاستعلامات
+                        
+                self.warmup["chunks_embedded"] += len(pending)
+                await self.embed_chunks(pending)
+        finally:
+            os.close(repair_fd)
+            
+        self.warmup["state"] = "ready"
+        self.warmup["seconds"] = round(time.time() - started, 2)
+        
+        logger.info(f"🔥 اكتمل إحماء الذاكرة: {self.warmup}")
+        
 # 🔍 محرك البحث والاستعلام  
 class SearchEngine:
     def __init__(self, memory_service: MemoryService):
         self.memory = memory_service
         self.query_history = []
+        self.ann = IVFIndex(
+            memory_service.vectors,
+            nprobe=int(os.getenv("SUROOH_ANN_NPROBE", "8")),
+            min_train_size=int(os.getenv("SUROOH_ANN_MIN_TRAIN", "10000"))
+        )
+        self.ann_training = False
         
-    async def semantic_search(self, query: str, top_k: int = 3) -> List[dict]:
-        """البحث الدلالي (محاكاة - في الإنتاج يستخدم Vector DB)"""
-        results = []
+    async def index_vectors(self):
+        """إضافة كل المتجهات غير المفهرسة (من هذه العملية أو غيرها) وتدريب الفهرس عند الحاجة"""
+        self.ann.add(range(self.ann.indexed_size, len(self.memory.vectors)))
+        
+        if self.ann_training or not self.ann.needs_training():
+            return
+            
+        self.ann_training = True
+        try:
+            # التدريب في thread منفصل حتى لا يوقف الاستعلامات
+            self.ann.install(*await asyncio.to_thread(self.ann.build))
+            logger.info(f"🧭 تم تدريب الفهرس التقريبي: {self.ann.stats()}")
+        finally:
+            self.ann_training = False
+        
+    async def search(
+        self,
+        query: str,
+        top_k: int = 3,
+        mode: str = "hybrid",
+        nprobe: Optional[int] = None,
+        exact: bool = False
+    ) -> List[dict]:
+        """البحث حسب النمط المطلوب"""
+        if mode == "semantic":
+            return await self.semantic_search(query, top_k, nprobe=nprobe, exact=exact)
+        if mode == "keyword":
+            return await self.keyword_search(query, top_k)
+        return await self.hybrid_search(query, top_k, nprobe=nprobe, exact=exact)
+        
+    async def semantic_search(
+        self,
+        query: str,
+        top_k: int = 3,
+        nprobe: Optional[int] = None,
+        exact: bool = False
+    ) -> List[dict]:
+        """البحث الدلالي بالمتجهات (فهرس IVF تقريبي أو بحث كامل)"""
+        ranking = await self.rank_semantic(query, top_k, nprobe=nprobe, exact=exact)
+        return [self.build_result(ordinal, score) for ordinal, score in ranking]
+        
+    async def keyword_search(self, query: str, top_k: int = 3) -> List[dict]:
+        """البحث بالكلمات (BM25 عبر الفهرس المقلوب)"""
+        ranking = self.rank_keyword(query, top_k)
+        return [self.build_result(ordinal, score) for ordinal, score in ranking]
         
-        # محاكاة البحث في الوثائق المحفوظة
-        for doc_id, doc_data in self.memory.documents.items():
-            for chunk in doc_data["chunks"]:
-                # محاكاة حساب التشابه
-                similarity_score = self.calculate_similarity(query, chunk["text"])
+    async def hybrid_search(
+        self,
+        query: str,
+        top_k: int = 3,
+        nprobe: Optional[int] = None,
+        exact: bool = False,
+        rrf_k: int = 60
+    ) -> List[dict]:
+        """بحث هجين: دمج ترتيب BM25 والمتجهات بـ Reciprocal Rank Fusion"""
+        depth = max(top_k * 5, 20)  # عمق كافٍ من كل ترتيب قبل الدمج
+        rankings = [
+            self.rank_keyword(query, depth),
+            await self.rank_semantic(query, depth, nprobe=nprobe, exact=exact)
+        ]
+        
+        fused = {}
+        for ranking in rankings:
+            for rank, (ordinal, _) in enumerate(ranking, start=1):
+                fused[ordinal] = fused.get(ordinal, 0.0) + 1.0 / (rrf_k + rank)
                 
-                if similarity_score > 0.3:  # عتبة التشابه
-                    results.append({
-                        "doc_id": doc_id,
-                        "chunk_id": chunk["chunk_id"],
-                        "text": chunk["text"][:200] + "...",
-                        "score": similarity_score,
-                        "metadata": doc_data["metadata"]
-                    })
+        best = sorted(fused.items(), key=lambda item: item[1], reverse=True)[:top_k]
+        return [self.build_result(ordinal, score) for ordinal, score in best]
         
-        # ترتيب حسب النقاط وإرجاع أفضل النتائج
-        results.sort(key=lambda x: x["score"], reverse=True)
-        return results[:top_k]
+    async def rank_semantic(
+        self,
+        query: str,
+        limit: int,
+        nprobe: Optional[int] = None,
+        exact: bool = False
+    ) -> List[tuple]:
+        """ترتيب القطع بتشابه المتجهات: [(chunk_ordinal, score)]"""
+        query_vector = (await asyncio.to_thread(self.memory.embedder.embed, [query]))[0]
+        keys = self.memory.vectors.keys
         
-    def calculate_similarity(self, query: str, text: str) -> float:
-        """حساب التشابه (بسيط - في الإنتاج يستخدم embeddings)"""
-        query_words = set(query.lower().split())
-        text_words = set(text.lower().split())
+        return [
+            (int(keys[row]), score)
+            for row, score in self.ann.search(query_vector, limit, nprobe=nprobe, exact=exact)
+            if score > 0
+        ]
         
-        if not query_words or not text_words:
-            return 0.0
-            
-        intersection = query_words.intersection(text_words)
-        union = query_words.union(text_words)
+    def rank_keyword(self, query: str, limit: int) -> List[tuple]:
+        """ترتيب القطع بنقاط BM25: [(chunk_ordinal, score)]"""
+        scores = self.memory.index.bm25_scores(query)
         
-        return len(intersection) / len(union) if union else 0.0
+        # أفضل النتائج مع الحفاظ على ترتيب الإدخال عند تساوي النقاط
+        return heapq.nlargest(limit, scores.items(), key=lambda item: (item[1], -item[0]))
+        
+    def build_result(self, chunk_ordinal: int, score: float) -> dict:
+        """تجهيز نتيجة بحث لقطعة محددة (قراءة من mmap عند الطلب)"""
+        chunk = self.memory.store.chunk(chunk_ordinal)
+        doc_data = self.memory.store.document(chunk["doc_ordinal"])
+        
+        return {
+            "doc_id": doc_data["doc_id"],
+            "chunk_id": chunk["chunk_id"],
+            "text": chunk["text"][:200] + "...",
+            "score": score,
+            "metadata": doc_data["metadata"]
+        }
 
 # ⚙️ منسق التنفيذ (Orchestrator)
 class TaskOrchestrator:
-    def __init__(self):
-        self.active_tasks = {}  # {task_id: TaskStatus}
-        self.agent_queues = {
-            "code_master": [],
-            "design_genius": [],
-            "fullstack_pro": []
+    # منافذ البوتات
+    AGENT_PORTS = {
+        "code_master": 8003,
+        "design_genius": 8004,
+        "fullstack_pro": 8005
+    }
+    
+    def __init__(
+        self,
+        state: SharedState,
+        queue: TaskQueue,
+        concurrency: int = 2,
+        poll_interval: float = 1.0,
+        retry_policies: Optional[Dict[str, RetryPolicy]] = None,
+        default_retry_policy: Optional[RetryPolicy] = None
+    ):
+        self.state = state  # حالة المهام مشتركة بين العمال
+        self.queue = queue  # السجل الدائم للمهام المعلقة والجارية (الأولوية والحصص العادلة)
+        self.active_tasks = {}  # {task_id: TaskStatus} المهام التي ينفذها هذا العامل الآن
+        # الحد الأعلى للمهام الجارية لكل بوت يُفرض عبر كل العمال عند الحجز،
+        # وكل عامل يشغّل منفذين بقدره
+        self.concurrency = {
+            agent_name: queue.agent_limits.setdefault(agent_name, concurrency)
+            for agent_name in self.AGENT_PORTS
+        }
+        self.poll_interval = poll_interval  # مهام أضافها عامل آخر تُلتقط خلال هذه المدة
+        self.wakeups = {agent_name: asyncio.Event() for agent_name in self.AGENT_PORTS}
+        self.default_retry_policy = default_retry_policy or RetryPolicy()
+        self.retry_policies = retry_policies or {}  # {agent_name: RetryPolicy}
+        self.counters = {
+            agent_name: {"completed": 0, "retries": 0, "dead_lettered": 0, "replayed": 0}
+            for agent_name in self.AGENT_PORTS
         }
+        self.dispatchers: List[asyncio.Task] = []
         
-    async def create_task(self, request: ExecuteRequest) -> str:
-        """إنشاء مهمة جديدة"""
+    async def create_task(self, request: ExecuteRequest, user_id: str) -> str:
+        """إنشاء مهمة جديدة وإضافتها لطابور البوت (بدون انتظار التنفيذ)"""
+        if request.agent_name not in self.AGENT_PORTS:
+            raise HTTPException(status_code=404, detail=f"البوت {request.agent_name} غير موجود")
+            
         task_id = str(uuid.uuid4())
         trace_id = str(uuid.uuid4())
         
         task_status = TaskStatus(
             task_id=task_id,
-            status="pending",
+            status="queued",
             attempts=0,
             created_at=datetime.now(),
             updated_at=datetime.now(),
             trace_id=trace_id
         )
         
-        self.active_tasks[task_id] = task_status
+        self.state.save_task(task_id, task_status.status, task_status.model_dump(mode="json"))
+        self.queue.enqueue(task_id, request.agent_name, user_id, request.priority, request.task_payload)
+        self.wakeups[request.agent_name].set()
+        
+        logger.info(f"📋 تم إنشاء مهمة {task_id} للبوت {request.agent_name}")
+        return task_id
         
-        # إضافة إلى queue البوت المناسب
-        if request.agent_name in self.agent_queues:
-            self.agent_queues[request.agent_name].append({
-                "task_id": task_id,
-                "payload": request.task_payload,
-                "priority": request.priority,
-                "created_at": datetime.now().isoformat()
-            })
+    def start(self):
+        """تشغيل المنفذين لكل بوت بعد إرجاع مهام العمليات المتوقفة"""
+        if self.dispatchers:
+            return
             
-            logger.info(f"📋 تم إنشاء مهمة {task_id} للبوت {request.agent_name}")
+        recovered = self.queue.recover()
+        if recovered:
+            logger.info(f"♻️ إعادة {recovered} مهمة متوقفة للطابور")
             
-            # محاولة تنفيذ فوري
-            await self.execute_task(task_id, request.agent_name, request.task_payload)
-        else:
-            raise HTTPException(status_code=404, detail=f"البوت {request.agent_name} غير موجود")
+        self.dispatchers = [
+            asyncio.create_task(self.dispatch(agent_name))
+            for agent_name, concurrency in self.concurrency.items()
+            for _ in range(concurrency)
+        ]
+        
+    async def stop(self):
+        """إيقاف المنفذين (المهام الجارية تعود للطابور)"""
+        for dispatcher in self.dispatchers:
+            dispatcher.cancel()
+        await asyncio.gather(*self.dispatchers, return_exceptions=True)
+        self.dispatchers = []
+        
+    async def dispatch(self, agent_name: str):
+        """منفذ: حجز مهمة من طابور البوت وتنفيذها ثم التالية"""
+        wakeup = self.wakeups[agent_name]
+        breaker = self.breaker(agent_name)
+        
+        while True:
+            # البوت معطل: المهام تبقى في الطابور حتى ينجح فحص الصحة
+            if not breaker.ready():
+                await asyncio.sleep(min(self.poll_interval, max(breaker.retry_after(), 0.1)))
+                continue
+                
+            task = self.queue.claim(agent_name)
+            if task is None:
+                wakeup.clear()
+                try:
+                    await asyncio.wait_for(wakeup.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+                
+            try:
+                await self.run_task(task)
+            except asyncio.CancelledError:
+                self.queue.release(task.task_id)
+                raise
+            except Exception as e:
+                logger.error(f"❌ خطأ في منفذ {agent_name}: {e}")
+            finally:
+                self.active_tasks.pop(task.task_id, None)
+                wakeup.set()  # مكان فارغ تحت حد البوت
+                
+    async def run_task(self, task: QueuedTask):
+        """تنفيذ مهمة محجوزة على البوت ثم إبلاغ Smart Core، أو إعادة المحاولة، أو المهام الميتة"""
+        data = self.state.get_task(task.task_id)
+        if data is None:
+            self.queue.complete(task.task_id)
+            return
+        task_status = TaskStatus.model_validate(data)
+        task_status.attempts = task.attempts
+        task_status.next_attempt_at = None
+        self.active_tasks[task.task_id] = task_status
+        
+        policy = self.retry_policies.get(task.agent_name, self.default_retry_policy)
+        counters = self.counters[task.agent_name]
+        
+        try:
+            # مهمة أسقطت عاملها مرات متكررة لا تُنفذ مرة أخرى
+            if task.attempts > policy.max_attempts:
+                raise BotRejectedError(f"استنفدت المهمة {policy.max_attempts} محاولات")
+                
+            await self.execute_task(task.task_id, task.agent_name, task.payload)
+            
+        except Exception as e:
+            task_status.error = str(e)
+            task_status.updated_at = datetime.now()
+            
+            if policy.should_retry(e, task.attempts):
+                delay = policy.delay(task.attempts)
+                task_status.status = "retrying"
+                task_status.next_attempt_at = datetime.now() + timedelta(seconds=delay)
+                self.save_task(task.task_id)
+                self.queue.retry(task.task_id, delay, str(e))
+                asyncio.get_running_loop().call_later(delay, self.wakeups[task.agent_name].set)
+                counters["retries"] += 1
+                logger.warning(f"🔁 إعادة محاولة مهمة {task.task_id} بعد {delay:.1f}s ({task.attempts}/{policy.max_attempts}): {e}")
+            else:
+                task_status.status = "failed"
+                self.save_task(task.task_id)
+                self.queue.dead_letter(task.task_id, str(e))
+                counters["dead_lettered"] += 1
+                logger.error(f"❌ فشل مهمة {task.task_id} نهائياً بعد {task.attempts} محاولة: {e}")
+            return
             
-        # إرسال للـ Smart Core للتنفيذ
-        task_execution_result = None
+        self.queue.complete(task.task_id)
+        counters["completed"] += 1
+        await self.notify_smart_core(task)
+        
+    def replay(self, task_id: str) -> bool:
+        """إعادة مهمة من المهام الميتة للطابور"""
+        agent_name = self.queue.replay(task_id)
+        if agent_name is None:
+            return False
+            
+        data = self.state.get_task(task_id)
+        if data is not None:
+            task_status = TaskStatus.model_validate(data)
+            task_status.status = "queued"
+            task_status.attempts = 0
+            task_status.updated_at = datetime.now()
+            self.state.save_task(task_id, task_status.status, task_status.model_dump(mode="json"))
+            
+        self.counters[agent_name]["replayed"] += 1
+        self.wakeups[agent_name].set()
+        logger.info(f"♻️ إعادة تشغيل المهمة الميتة {task_id}")
+        return True
+        
+    def stats(self) -> dict:
+        """عدادات هذا العامل مع أعداد الطابور المشتركة"""
+        return {
+            "agents": {
+                agent_name: {
+                    "concurrency": self.concurrency[agent_name],
+                    "max_attempts": self.retry_policies.get(agent_name, self.default_retry_policy).max_attempts,
+                    **self.counters[agent_name]
+                }
+                for agent_name in self.AGENT_PORTS
+            },
+            "queue": self.queue.depth()
+        }
+        
+    async def notify_smart_core(self, task: QueuedTask):
+        """إرسال للـ Smart Core للتنفيذ"""
         try:
-            async with aiohttp.ClientSession() as session:
+            async with shared_session() as session:
                 async with session.post(
                     'http://localhost:8001/execute-from-brain',
                     json={
-                        "order_id": task_id,
-                        "command": request.task_payload.get("description", ""),
-                        "priority": request.priority,
-                        "context": {"user_id": "abu_sham", "agent": request.agent_name}
+                        "order_id": task.task_id,
+                        "command": task.payload.get("description", ""),
+                        "priority": task.priority,
+                        "context": {"user_id": task.user_id, "agent": task.agent_name}
                     }
                 ) as smart_response:
                     
@@ -284,26 +780,28 @@ class TaskOrchestrator:
         except Exception as e:
             logger.warning(f"⚠️ تعذر إرسال لـ Smart Core: {e}")
         
-        return task_id
+    def breaker(self, agent_name: str) -> CircuitBreaker:
+        """قاطع الدائرة لعنوان البوت (مشترك مع كل مسارات الإرسال في العملية)"""
+        base_url = f"http://localhost:{self.AGENT_PORTS[agent_name]}"
+        return breakers.get(base_url, probe_url=f"{base_url}/")
         
     async def execute_task(self, task_id: str, agent_name: str, payload: dict):
         """تنفيذ مهمة على بوت محدد"""
-        try:
-            self.active_tasks[task_id].status = "running"
-            self.active_tasks[task_id].updated_at = datetime.now()
-            
-            # محاولة الاتصال بالبوت
-            agent_ports = {
-                "code_master": 8003,
-                "design_genius": 8004,
-                "fullstack_pro": 8005
-            }
+        # محاولة الاتصال بالبوت
+        port = self.AGENT_PORTS.get(agent_name)
+        if not port:
+            raise BotRejectedError(f"البوت {agent_name} غير معرف")
             
-            port = agent_ports.get(agent_name)
-            if not port:
-                raise Exception(f"البوت {agent_name} غير معرف")
-                
-            async with aiohttp.ClientSession() as session:
+        breaker = self.breaker(agent_name)
+        if not breaker.allow():
+            raise BotUnavailableError(f"الدائرة مفتوحة للبوت {agent_name}")
+            
+        self.active_tasks[task_id].status = "running"
+        self.active_tasks[task_id].updated_at = datetime.now()
+        self.save_task(task_id)
+        
+        try:
+            async with shared_session() as session:
                 async with session.post(
                     f"http://localhost:{port}/execute",
                     json={
@@ -316,29 +814,39 @@ class TaskOrchestrator:
                     
                     if response.status == 200:
                         result = await response.json()
+                        breaker.record_success()
                         
                         self.active_tasks[task_id].status = "completed"
                         self.active_tasks[task_id].result = result
                         self.active_tasks[task_id].updated_at = datetime.now()
+                        self.save_task(task_id)
                         
                         logger.info(f"✅ مهمة {task_id} مكتملة بواسطة {agent_name}")
                         return result
+                    
+                    error_text = await response.text()
+                    # 429 و5xx: البوت مشغول أو معطل مؤقتاً، غيرها: رفض للمهمة نفسها
+                    if response.status >= 500:
+                        breaker.record_failure()
                     else:
-                        error_text = await response.text()
-                        raise Exception(f"البوت رفض المهمة: {response.status} - {error_text}")
-                        
-        except Exception as e:
-            self.active_tasks[task_id].status = "failed"
-            self.active_tasks[task_id].error = str(e)
-            self.active_tasks[task_id].attempts += 1
-            self.active_tasks[task_id].updated_at = datetime.now()
-            
-            logger.error(f"❌ فشل مهمة {task_id}: {e}")
-            raise e
+                        breaker.record_success()
+                    if response.status == 429 or response.status >= 500:
+                        raise BotUnavailableError(f"البوت غير متاح: {response.status} - {error_text}")
+                    raise BotRejectedError(f"البوت رفض المهمة: {response.status} - {error_text}")
+                    
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            breaker.record_failure()
+            raise BotUnavailableError(f"تعذر الاتصال بالبوت {agent_name}: {e!r}")
             
+    def save_task(self, task_id: str):
+        """حفظ حالة المهمة في المخزن المشترك"""
+        task_status = self.active_tasks[task_id]
+        self.state.save_task(task_id, task_status.status, task_status.model_dump(mode="json"))
+        
     async def get_task_status(self, task_id: str) -> Optional[TaskStatus]:
-        """جلب حالة المهمة"""
-        return self.active_tasks.get(task_id)
+        """جلب حالة المهمة (قد تكون أنشئت في عامل آخر)"""
+        data = self.state.get_task(task_id)
+        return TaskStatus.model_validate(data) if data else None
 
 # 🚀 المخ المتطور الرئيسي
 class AdvancedBrainCore:
@@ -346,14 +854,220 @@ class AdvancedBrainCore:
         self.api_gateway = APIGateway()
         self.memory_service = MemoryService()
         self.search_engine = SearchEngine(self.memory_service)
-        self.orchestrator = TaskOrchestrator()
+        default_retry_policy = RetryPolicy(max_attempts=int(os.getenv("SUROOH_TASK_MAX_ATTEMPTS", "3")))
+        self.orchestrator = TaskOrchestrator(
+            self.memory_service.state,
+            TaskQueue(
+                os.path.join(BRAIN_DATA_DIR, "task_queue.db"),
+                lease_seconds=float(os.getenv("SUROOH_TASK_LEASE_SECONDS", "120")),
+                aging_seconds=float(os.getenv("SUROOH_TASK_AGING_SECONDS", "60")),
+                # الحد الأعلى للمهام الجارية لكل بوت: "design_genius=1,fullstack_pro=4"
+                agent_limits=load_mapping(os.getenv("SUROOH_AGENT_CONCURRENCY", ""), int),
+                # أوزان الحصص بين المستخدمين: "abu_sham=2"
+                user_weights=load_mapping(os.getenv("SUROOH_USER_WEIGHTS", ""))
+            ),
+            concurrency=int(os.getenv("SUROOH_DISPATCH_CONCURRENCY", "2")),
+            # إعادة المحاولة لكل بوت: "design_genius=5/4/120" (محاولات/تأخير أساسي/أقصى تأخير)
+            retry_policies=load_retry_policies(os.getenv("SUROOH_TASK_RETRIES", ""), default_retry_policy),
+            default_retry_policy=default_retry_policy
+        )
         self.startup_time = datetime.now()
+        self.ingest_workers = int(os.getenv("SUROOH_INGEST_WORKERS", str(min(4, os.cpu_count() or 1))))
+        self.worker_pool = None  # عمليات التقطيع والمتجهات (0 عمال = داخل العملية)
+        self.ingestion = IngestionPipeline(
+            self.process_ingestion,
+            max_queue=int(os.getenv("SUROOH_INGEST_QUEUE_SIZE", "1000")),
+            concurrency=int(os.getenv("SUROOH_INGEST_CONCURRENCY", str(max(1, self.ingest_workers)))),
+            max_attempts=int(os.getenv("SUROOH_INGEST_MAX_ATTEMPTS", "3")),
+            max_jobs=int(os.getenv("SUROOH_INGEST_JOB_HISTORY", "10000")),
+            shared=self.memory_service.state,
+            job_retention=float(os.getenv("SUROOH_INGEST_JOB_RETENTION", "86400"))
+        )
         
         logger.info("🧠 تم تشغيل المخ المتطور - SmartCore Enterprise")
         
+    def start_worker_pool(self):
+        """تشغيل عمليات التقطيع مبكراً قبل إنشاء أي threads"""
+        if self.worker_pool is not None or self.ingest_workers <= 0:
+            return
+            
+        # fork: العمال يرثون مسار الوحدات بدون إعادة تشغيل ملف الخادم
+        context = multiprocessing.get_context("fork") if os.name == "posix" else None
+        self.worker_pool = ProcessPoolExecutor(max_workers=self.ingest_workers, mp_context=context)
+        self.worker_pool.submit(int).result()  # إنشاء العمليات الآن
+        self.memory_service.worker_pool = self.worker_pool
+        
+    async def chunk_contents(self, contents: List[Optional[str]]) -> List[Any]:
+        """تقطيع مجموعة نصوص بالتوازي (None = تخطي، والخطأ يُرجع مكان نتيجته)"""
+        memory = self.memory_service
+        self.start_worker_pool()
+        
+        if self.worker_pool is None:
+            return [
+                None if content is None else chunk_text(content, memory.chunk_tokens, memory.chunk_overlap)
+                for content in contents
+            ]
+            
+        loop = asyncio.get_running_loop()
+        
+        async def chunk(content: Optional[str]):
+            if content is None:
+                return None
+            return await loop.run_in_executor(
+                self.worker_pool, chunk_text, content, memory.chunk_tokens, memory.chunk_overlap
+            )
+            
+        return await asyncio.gather(*(chunk(content) for content in contents), return_exceptions=True)
+        
+    async def ingest_batch(self, items: List[IngestRequest], ingested_by: str) -> List[dict]:
+        """إدخال دفعة: تقطيع متوازٍ ← تخزين ← متجهات على دفعات ← تحديث الفهرس مرة واحدة"""
+        memory = self.memory_service
+        contents = [payload_to_content(item.raw_payload) for item in items]
+        
+        # المحتوى المخزن مسبقاً لا يُرسل للتقطيع
+        chunk_lists = await self.chunk_contents([
+            None if memory.duplicate_of(content) else content for content in contents
+        ])
+        
+        results = []
+        new_ordinals = []
+        for item, content, chunks in zip(items, contents, chunk_lists):
+            result = {"source_id": item.source_id}
+            try:
+                if isinstance(chunks, BaseException):
+                    raise chunks
+                    
+                stored = await memory.store_document(
+                    new_doc_id(item.source_type),
+                    content,
+                    ingest_metadata(item, ingested_by),
+                    chunks=chunks
+                )
+                result.update(
+                    ingestion_id=stored["doc_id"],
+                    status="duplicate" if stored["duplicate"] else "indexed",
+                    chunks_created=stored["chunks_new"],
+                    chunks_reused=stored["chunks_reused"],
+                    ordinals=stored["new_ordinals"]
+                )
+                new_ordinals.extend(stored["new_ordinals"])
+            except Exception as e:
+                logger.error(f"❌ فشل إدخال {item.source_id}: {e}")
+                result.update(status="failed", error=str(e), chunks_created=0, chunks_reused=0)
+            results.append(result)
+            
+        # متجهات كل قطع الدفعة معاً ثم تحديث الفهرس التقريبي مرة واحدة
+        embedding_seconds = index_seconds = 0.0
+        try:
+            started = time.perf_counter()
+            await memory.embed_chunks(new_ordinals)
+            embedding_seconds = time.perf_counter() - started
+            
+            started = time.perf_counter()
+            await self.search_engine.index_vectors()
+            index_seconds = time.perf_counter() - started
+        except Exception as e:
+            logger.error(f"❌ فشل إنشاء متجهات الدفعة: {e}")
+            for result in results:
+                if result.get("ordinals"):
+                    result.update(status="failed", error=f"embedding failed: {e}")
+                    
+        # تسجيل عناصر الدفعة حتى يمكن الاستعلام عنها بمعرفها مثل الإدخال المفرد
+        for result in results:
+            ordinals = result.pop("ordinals", None)
+            if "ingestion_id" not in result:
+                continue
+                
+            job = IngestionJob(result["ingestion_id"], "", {})
+            job.attempts = 1
+            job.error = result.get("error")
+            share = len(ordinals) / len(new_ordinals) if ordinals else 0.0
+            job.update(
+                "failed" if result["status"] == "failed" else "completed",
+                chunks_total=result["chunks_created"],
+                chunks_processed=0 if result["status"] == "failed" else result["chunks_created"],
+                chunks_reused=result["chunks_reused"],
+                duplicate=result["status"] == "duplicate",
+                embedding_ms=embedding_seconds * share * 1000,
+                index_commit_ms=index_seconds * 1000
+            )
+            self.ingestion.jobs.add(job)
+            
+        logger.info(f"📦 تم إدخال دفعة: {len(items)} وثيقة، {len(new_ordinals)} قطعة جديدة")
+        return results
+        
+    async def process_ingestion(self, job: IngestionJob):
+        """معالجة وظيفة إدخال من الطابور: تقطيع ← تخزين ← متجهات ← فهرس"""
+        memory = self.memory_service
+        
+        # التخزين يتم مرة واحدة، وإعادة المحاولة تكمل المتجهات فقط
+        if "new_ordinals" not in job.result:
+            job.update("chunking")
+            chunks = (await self.chunk_contents([job.content]))[0]
+            if isinstance(chunks, BaseException):
+                raise chunks
+            job.result = await memory.store_document(job.job_id, job.content, job.metadata, chunks=chunks)
+            job.content = ""  # المحتوى أصبح في المخزن
+            job.update(
+                chunks_total=job.result["chunks_new"],
+                chunks_reused=job.result["chunks_reused"],
+                duplicate=job.result["duplicate"]
+            )
+            
+        ordinals = job.result["new_ordinals"]
+        if job.attempts > 1:
+            ordinals = memory.missing_vectors(ordinals)
+            
+        def on_batch(count: int, seconds: float):
+            job.update(
+                chunks_processed=job.progress["chunks_processed"] + count,
+                embedding_ms=job.progress["embedding_ms"] + seconds * 1000
+            )
+            
+        job.update("embedding")
+        rows = await memory.embed_chunks(ordinals, on_batch=on_batch)
+        
+        job.update("indexing")
+        started = time.perf_counter()
+        await self.search_engine.index_vectors()
+        job.update(index_commit_ms=(time.perf_counter() - started) * 1000)
+        
+        logger.info(f"✅ تم معالجة وثيقة {job.job_id} ({len(ordinals)} قطعة، {sum(map(len, rows))} متجه)")
+        
+    async def warm_up(self):
+        """بناء الفهارس من البيانات الدائمة بعد التشغيل"""
+        try:
+            await self.memory_service.warm_up()
+            await self.search_engine.index_vectors()
+        except Exception as e:
+            self.memory_service.warmup["state"] = "failed"
+            self.memory_service.dedup_ready.set()  # الإدخال لا ينتظر إحماءً فشل
+            logger.error(f"❌ فشل إحماء الذاكرة: {e}")
+            
+    async def sync_loop(self, interval: float = 1.0):
+        """في وضع تعدد العمال: متابعة ما يضيفه العمال الآخرون للمخزن والمتجهات"""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                if self.memory_service.catch_up() or self.search_engine.ann.indexed_size < len(self.memory_service.vectors):
+                    await self.search_engine.index_vectors()
+            except Exception as e:
+                logger.error(f"❌ فشل مزامنة العامل: {e}")
+                
+    def shutdown(self):
+        """إغلاق العمليات والملفات الدائمة"""
+        if self.worker_pool is not None:
+            self.worker_pool.shutdown(cancel_futures=True)
+        self.memory_service.store.close()
+        self.memory_service.vectors.close()
+        self.api_gateway.rate_limiter.close()
+        self.memory_service.state.close()
+        self.orchestrator.queue.close()
+        
     async def health_check(self) -> dict:
         """فحص صحة النظام"""
         uptime = datetime.now() - self.startup_time
+        task_counts = self.memory_service.state.task_counts()
         
         return {
             "system": "🧠 سُروح المخ المتطور",
@@ -367,14 +1081,58 @@ class AdvancedBrainCore:
                 "orchestrator": "active"
             },
             "statistics": {
-                "total_sessions": len(self.memory_service.sessions),
-                "total_documents": len(self.memory_service.documents),
-                "active_tasks": len([t for t in self.orchestrator.active_tasks.values() if t.status in ["pending", "running"]]),
-                "completed_tasks": len([t for t in self.orchestrator.active_tasks.values() if t.status == "completed"])
+                "total_sessions": self.memory_service.state.session_count(),
+                "total_documents": self.memory_service.store.document_count,
+                "total_chunks": self.memory_service.store.chunk_count,
+                "total_vectors": len(self.memory_service.vectors),
+                "active_tasks": sum(task_counts.get(status, 0) for status in ("queued", "running", "retrying")),
+                "completed_tasks": task_counts.get("completed", 0)
             },
+            "memory_warmup": self.memory_service.warmup,
             "version": "2.0.0-enterprise"
         }
 
+# 🧰 أدوات الإدخال
+def payload_to_content(raw_payload: Union[str, dict]) -> str:
+    """تحويل البيانات الخام لنص (ترتيب مفاتيح ثابت حتى تتطابق بصمة نفس المحتوى)"""
+    if isinstance(raw_payload, dict):
+        return json.dumps(raw_payload, ensure_ascii=False, indent=2, sort_keys=True)
+    return str(raw_payload)
+
+def new_doc_id(source_type: str) -> str:
+    """إنشاء معرف للوثيقة"""
+    return f"{source_type}_{int(time.time())}_{str(uuid.uuid4())[:8]}"
+
+def ingest_metadata(request: IngestRequest, ingested_by: str) -> dict:
+    """بيانات الوثيقة الوصفية مع مصدرها"""
+    return {
+        **request.metadata,
+        "source_type": request.source_type,
+        "source_id": request.source_id,
+        "ingested_by": ingested_by
+    }
+
+def ingestion_summary(results: List[dict], started: float) -> dict:
+    """ملخص دفعة الإدخال مع الإنتاجية"""
+    elapsed = max(time.time() - started, 1e-6)
+    statuses = [result["status"] for result in results]
+    chunks_created = sum(result["chunks_created"] for result in results)
+    
+    return {
+        "items_total": len(results),
+        "items_indexed": statuses.count("indexed"),
+        "items_duplicate": statuses.count("duplicate"),
+        "items_failed": statuses.count("failed"),
+        "chunks_created": chunks_created,
+        "chunks_reused": sum(result["chunks_reused"] for result in results),
+        "elapsed_ms": round(elapsed * 1000),
+        "items_per_second": round(len(results) / elapsed, 1),
+        "chunks_per_second": round(chunks_created / elapsed, 1)
+    }
+
+# عدد عمليات uvicorn (أكثر من 1 = وضع تعدد العمال عبر asgi.py)
+BRAIN_WORKERS = int(os.getenv("SUROOH_BRAIN_WORKERS", "1"))
+
 # إنشاء نسخة المخ المتطور
 advanced_brain = AdvancedBrainCore()
 
@@ -382,8 +1140,20 @@ advanced_brain = AdvancedBrainCore()
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     logger.info("🚀 بدء تشغيل المخ المتطور...")
+    advanced_brain.start_worker_pool()
+    advanced_brain.ingestion.start()
+    advanced_brain.orchestrator.start()
+    warmup_task = asyncio.create_task(advanced_brain.warm_up())
+    sync_task = asyncio.create_task(advanced_brain.sync_loop()) if BRAIN_WORKERS > 1 else None
     yield
     logger.info("🛑 إيقاف المخ المتطور...")
+    warmup_task.cancel()
+    if sync_task:
+        sync_task.cancel()
+    await advanced_brain.ingestion.stop()
+    await advanced_brain.orchestrator.stop()
+    await close_shared_session()
+    advanced_brain.shutdown()
 
 app = FastAPI(
     title="🧠 سُروح - المخ المتطور",
@@ -418,69 +1188,251 @@ async def health_check():
 @app.post("/v1/ingest")
 async def ingest_data(
     request: IngestRequest,
-    background_tasks: BackgroundTasks,
-    user_info: dict = Depends(verify_token)
+    response: Response,
+    user_info: dict = Depends(require_scope("ingest"))
 ):
     """إدخال البيانات للفهرسة"""
     try:
         # فحص معدل الطلبات
-        await advanced_brain.api_gateway.check_rate_limit(user_info["user_id"])
+        rate_limit = await advanced_brain.api_gateway.check_rate_limit(
+            user_info["user_id"], "ingest", response, tier=user_info["tier"]
+        )
         
-        # إنشاء معرف للوثيقة
-        doc_id = f"{request.source_type}_{int(time.time())}_{str(uuid.uuid4())[:8]}"
+        memory = advanced_brain.memory_service
+        content = payload_to_content(request.raw_payload)
         
-        # تحويل البيانات للنص
-        if isinstance(request.raw_payload, dict):
-            content = json.dumps(request.raw_payload, ensure_ascii=False, indent=2)
-        else:
-            content = str(request.raw_payload)
-            
-        # تخزين في الذاكرة
-        chunks = await advanced_brain.memory_service.store_document(
-            doc_id, 
-            content, 
-            {
-                **request.metadata,
-                "source_type": request.source_type,
-                "source_id": request.source_id,
-                "ingested_by": user_info["user_id"]
+        # المحتوى المخزن مسبقاً لا يدخل الطابور
+        existing_id = memory.duplicate_of(content)
+        if existing_id is not None:
+            existing = memory.store.document(memory.doc_ordinals[existing_id])
+            return {
+                "success": True,
+                "ingestion_id": existing_id,
+                "chunks_created": 0,
+                "chunks_reused": len(existing["chunks"]),
+                "duplicate": True,
+                "status": "stored",
+                "trace_id": str(uuid.uuid4())
             }
+        
+        # المعالجة في خط الإدخال (202 + موقع الطابور، أو 429 عند الامتلاء)
+        job = IngestionJob(new_doc_id(request.source_type), content, ingest_metadata(request, user_info["user_id"]))
+        try:
+            position = advanced_brain.ingestion.submit(job)
+        except RegistryFullError as e:
+            raise HTTPException(
+                status_code=503,
+                detail="Too many ingestion jobs in progress",
+                headers={"Retry-After": str(e.retry_after)}
+            )
+        except QueueFullError as e:
+            raise HTTPException(
+                status_code=429,
+                detail="Ingestion queue is full",
+                headers={"Retry-After": str(e.retry_after)}
+            )
+        
+        return JSONResponse(status_code=202, headers=rate_limit.headers(), content={
+            "success": True,
+            "ingestion_id": job.job_id,
+            "status": "queued",
+            "queue_position": position,
+            "trace_id": str(uuid.uuid4())
+        })
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"❌ خطأ في إدخال البيانات: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/v1/ingest/batch")
+async def ingest_batch(
+    request: BatchIngestRequest,
+    response: Response,
+    user_info: dict = Depends(require_scope("ingest"))
+):
+    """إدخال مجموعة وثائق في طلب واحد (يُحسب طلباً واحداً في معدل الطلبات)"""
+    try:
+        await advanced_brain.api_gateway.check_rate_limit(
+            user_info["user_id"], "ingest_batch", response, tier=user_info["tier"]
         )
         
-        # معالجة في الخلفية
-        background_tasks.add_task(process_document_background, doc_id, chunks)
+        started = time.time()
+        results = await advanced_brain.ingest_batch(request.items, user_info["user_id"])
         
         return {
             "success": True,
-            "ingestion_id": doc_id,
-            "chunks_created": len(chunks),
-            "status": "processing",
+            "items": results,
+            "summary": ingestion_summary(results, started),
             "trace_id": str(uuid.uuid4())
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"❌ خطأ في إدخال البيانات: {e}")
+        logger.error(f"❌ خطأ في إدخال الدفعة: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/v1/ingest/ndjson")
+async def ingest_ndjson(
+    http_request: Request,
+    response: Response,
+    user_info: dict = Depends(require_scope("ingest"))
+):
+    """رفع متدفق بصيغة NDJSON (سطر = IngestRequest) يُعالج على دفعات أثناء القراءة"""
+    try:
+        await advanced_brain.api_gateway.check_rate_limit(
+            user_info["user_id"], "ingest_batch", response, tier=user_info["tier"]
+        )
+        
+        started = time.time()
+        batch_size = int(os.getenv("SUROOH_INGEST_BATCH_SIZE", "256"))
+        results = []
+        batch = []      # [(line_number, IngestRequest)]
+        pending = b""   # بقية سطر لم يكتمل بعد
+        line_number = 0
+        
+        async def flush():
+            stored = await advanced_brain.ingest_batch([item for _, item in batch], user_info["user_id"])
+            for (number, _), result in zip(batch, stored):
+                results.append({"line": number, **result})
+            batch.clear()
+            
+        async def parse(lines: List[bytes]):
+            nonlocal line_number
+            for line in lines:
+                line_number += 1
+                if not line.strip():
+                    continue
+                try:
+                    batch.append((line_number, IngestRequest.model_validate_json(line)))
+                except ValueError as e:
+                    results.append({
+                        "line": line_number, "status": "failed", "error": str(e),
+                        "chunks_created": 0, "chunks_reused": 0
+                    })
+                if len(batch) >= batch_size:
+                    await flush()
+                    
+        async for block in http_request.stream():
+            *lines, pending = (pending + block).split(b"\n")
+            await parse(lines)
+            
+        await parse([pending])
+        if batch:
+            await flush()
+            
+        results.sort(key=lambda result: result["line"])
+        return {
+            "success": True,
+            "items": results,
+            "summary": ingestion_summary(results, started),
+            "trace_id": str(uuid.uuid4())
+        }
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"❌ خطأ في الإدخال المتدفق: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+def stored_ingestion(ingestion_id: str) -> Optional[IngestionJob]:
+    """وظيفة مكتملة تُبنى من المخزن (الوثيقة محفوظة فعلاً)"""
+    memory = advanced_brain.memory_service
+    doc_ordinal = memory.doc_ordinals.get(ingestion_id)
+    if doc_ordinal is None:
+        return None
+        
+    record = memory.store.document(doc_ordinal)
+    job = IngestionJob(ingestion_id, "", {})
+    job.update("completed", chunks_total=len(record["chunks"]), chunks_processed=len(record["chunks"]))
+    job.created_at = job.updated_at = job.finished_at = datetime.fromisoformat(record["stored_at"]).timestamp()
+    return job
+
+def shared_ingestion_snapshot(ingestion_id: str) -> Optional[dict]:
+    """لقطة الوظيفة لعامل آخر: المخزن أولاً (الوثيقة المحفوظة مكتملة مهما كانت اللقطة)"""
+    job = stored_ingestion(ingestion_id)
+    if job is not None:
+        return job.to_dict()
+    return advanced_brain.memory_service.state.get_ingest_job(ingestion_id)
+
+def ingestion_status(ingestion_id: str):
+    """وظيفة الإدخال من سجل هذا العامل، ثم من المخزن، ثم من الحالة المشتركة (وظيفة عامل آخر)"""
+    job = advanced_brain.ingestion.jobs.get(ingestion_id) or stored_ingestion(ingestion_id)
+    if job is not None:
+        return job
+        
+    snapshot = advanced_brain.memory_service.state.get_ingest_job(ingestion_id)
+    if snapshot is None:
+        return None
+    return SharedJobView(
+        snapshot,
+        lambda: shared_ingestion_snapshot(ingestion_id),
+        stale_after=float(os.getenv("SUROOH_INGEST_STALE_SECONDS", "300"))
+    )
+
+@app.get("/v1/ingest/{ingestion_id}")
+async def get_ingestion_status(
+    ingestion_id: str,
+    user_info: dict = Depends(verify_token)
+):
+    """حالة وظيفة الإدخال وتقدمها"""
+    job = ingestion_status(ingestion_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="وظيفة الإدخال غير موجودة")
+        
+    return job.to_dict()
+
+@app.get("/v1/ingest/{ingestion_id}/events")
+async def stream_ingestion_events(
+    ingestion_id: str,
+    user_info: dict = Depends(verify_token)
+):
+    """متابعة تقدم الإدخال كأحداث SSE حتى اكتماله أو فشله"""
+    job = ingestion_status(ingestion_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="وظيفة الإدخال غير موجودة")
+        
+    async def events():
+        async for snapshot in job.watch():
+            if snapshot is None:
+                yield ": keep-alive\n\n"
+                continue
+            event = snapshot["state"] if snapshot["state"] in IngestionJob.FINAL_STATES else "progress"
+            yield f"event: {event}\ndata: {json.dumps(snapshot, ensure_ascii=False)}\n\n"
+            
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @app.post("/v1/query")
 async def query_brain(
     request: QueryRequest,
-    user_info: dict = Depends(verify_token)
+    response: Response,
+    user_info: dict = Depends(require_scope("query"))
 ):
     """استعلام ذكي من المخ"""
     try:
         # فحص معدل الطلبات
-        await advanced_brain.api_gateway.check_rate_limit(user_info["user_id"], limit=50)
+        await advanced_brain.api_gateway.check_rate_limit(
+            user_info["user_id"], "query", response, tier=user_info["tier"]
+        )
         
         trace_id = str(uuid.uuid4())
         start_time = time.time()
         
         logger.info(f"🔍 استعلام جديد: {request.query_text[:50]}... (trace: {trace_id})")
         
-        # البحث الدلالي
-        search_results = await advanced_brain.search_engine.semantic_search(
+        # البحث حسب النمط: semantic (متجهات)، keyword (BM25)، hybrid (دمج RRF)
+        search_results = await advanced_brain.search_engine.search(
             request.query_text, 
-            request.top_k
+            request.top_k,
+            mode=request.mode,
+            nprobe=request.nprobe,
+            exact=request.exact
         )
         
         # إنشاء الإجابة (في الإنتاج سيستخدم LLM مع السياق)
@@ -515,6 +1467,8 @@ async def query_brain(
             "confidence_score": 0.85 if search_results else 0.1
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"❌ خطأ في الاستعلام: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -522,26 +1476,32 @@ async def query_brain(
 @app.post("/v1/execute")
 async def execute_task(
     request: ExecuteRequest,
-    user_info: dict = Depends(verify_token)
+    response: Response,
+    user_info: dict = Depends(require_scope("execute"))
 ):
     """تنفيذ مهمة على بوت متخصص"""
     try:
         # فحص معدل الطلبات
-        await advanced_brain.api_gateway.check_rate_limit(user_info["user_id"], limit=20)
+        await advanced_brain.api_gateway.check_rate_limit(
+            user_info["user_id"], "execute", response, tier=user_info["tier"]
+        )
         
         logger.info(f"⚡ طلب تنفيذ مهمة على {request.agent_name}")
         
-        # إنشاء مهمة
-        task_id = await advanced_brain.orchestrator.create_task(request)
+        # إنشاء مهمة في طابور البوت والرد فوراً (التنفيذ عبر المنفذين)
+        task_id = await advanced_brain.orchestrator.create_task(request, user_info["user_id"])
         
+        response.status_code = 202
         return {
             "success": True,
             "task_id": task_id,
             "agent_name": request.agent_name,
-            "status": "initiated",
+            "status": "queued",
             "trace_id": str(uuid.uuid4())
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"❌ خطأ في تنفيذ المهمة: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -563,11 +1523,40 @@ async def get_task_status(
         "result": task_status.result,
         "error": task_status.error,
         "attempts": task_status.attempts,
+        "next_attempt_at": task_status.next_attempt_at.isoformat() if task_status.next_attempt_at else None,
         "created_at": task_status.created_at.isoformat(),
         "updated_at": task_status.updated_at.isoformat(),
         "trace_id": task_status.trace_id
     }
 
+@app.post("/v1/tasks/{task_id}/replay")
+async def replay_task(
+    task_id: str,
+    response: Response,
+    user_info: dict = Depends(require_scope("execute"))
+):
+    """إعادة مهمة فشلت نهائياً إلى طابور البوت"""
+    if not advanced_brain.orchestrator.replay(task_id):
+        if await advanced_brain.orchestrator.get_task_status(task_id) is None:
+            raise HTTPException(status_code=404, detail="المهمة غير موجودة")
+        raise HTTPException(status_code=409, detail="المهمة ليست ضمن المهام الميتة")
+        
+    response.status_code = 202
+    return {"success": True, "task_id": task_id, "status": "queued"}
+
+@app.get("/v1/dead-letters")
+async def list_dead_letters(
+    limit: int = 100,
+    user_info: dict = Depends(verify_token)
+):
+    """المهام التي استنفدت محاولاتها أو رفضها البوت"""
+    dead_letters = advanced_brain.orchestrator.queue.dead_letters(max(1, min(limit, 1000)))
+    
+    return {
+        "dead_letters": dead_letters,
+        "count": len(dead_letters)
+    }
+
 @app.get("/v1/sessions/{session_id}")
 async def get_session(
     session_id: str,
@@ -651,33 +1640,42 @@ async def get_metrics(user_info: dict = Depends(verify_token)):
             }
         },
         "memory_usage": {
-            "documents_total": len(advanced_brain.memory_service.documents),
-            "sessions_active": len(advanced_brain.memory_service.sessions),
-            "estimated_size_mb": len(advanced_brain.memory_service.documents) * 0.5
-        }
+            "documents_total": advanced_brain.memory_service.store.document_count,
+            "sessions_active": advanced_brain.memory_service.state.session_count(),
+            "disk_size_mb": round(advanced_brain.memory_service.store.size_bytes / (1024 * 1024), 2)
+        },
+        "ann_index": advanced_brain.search_engine.ann.stats(),
+        "rate_limiter": advanced_brain.api_gateway.rate_limiter.stats(),
+        "auth": token_verifier.stats(),
+        "ingestion": advanced_brain.ingestion.stats(),
+        "tasks": advanced_brain.orchestrator.stats(),
+        "circuit_breakers": breakers.stats(),
+        "http_client": http_client.stats()
     }
 
-# 🔧 معالجة الخلفية
-async def process_document_background(doc_id: str, chunks: List[dict]):
-    """معالجة الوثيقة في الخلفية"""
-    try:
-        logger.info(f"🔄 معالجة وثيقة {doc_id} في الخلفية...")
-        
-        # في الإنتاج: إنشاء embeddings وحفظها في Vector DB
-        await asyncio.sleep(2)  # محاكاة المعالجة
-        
-        logger.info(f"✅ تم معالجة وثيقة {doc_id} ({len(chunks)} قطعة)")
-        
-    except Exception as e:
-        logger.error(f"❌ خطأ في معالجة الخلفية: {e}")
-
 # تشغيل الخادم
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(
-        app, 
-        host="0.0.0.0", 
-        port=8006,
-        log_level="info",
-        access_log=True
-    )
\ No newline at end of file
+    
+    port = int(os.getenv("SUROOH_BRAIN_PORT", "8006"))
+    
+    if BRAIN_WORKERS > 1:
+        # كل عامل يحمّل التطبيق عبر asgi.py ويتشارك البيانات من مجلد البيانات
+        os.environ.setdefault("SUROOH_RATE_LIMIT_BACKEND", "shared")
+        uvicorn.run(
+            "asgi:app",
+            app_dir=os.path.dirname(os.path.abspath(__file__)),
+            host="0.0.0.0",
+            port=port,
+            workers=BRAIN_WORKERS,
+            log_level="info",
+            access_log=True
+        )
+    else:
+        uvicorn.run(
+            app, 
+            host="0.0.0.0", 
+            port=port,
+            log_level="info",
+            access_log=True
+        )
\ No newline at end of file
@@ -0,0 +1,182 @@
+"""
+🧭 فهرس البحث التقريبي (ANN) للمخ المتطور
+Inverted File Index (IVF) over VectorStore
+
+- تدريب مراكز k-means على عينة من المتجهات
+- إضافة تدريجية لكل متجه جديد إلى أقرب قائمة
+- البحث في أقرب nprobe قوائم فقط بدل كل المتجهات
+- قبل التدريب (مجموعة صغيرة) يرجع للبحث الكامل
+"""
+
+import math
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from vector_store import VectorStore, normalize_rows
+
+ASSIGN_BATCH_SIZE = 8192
+
+
+class IVFIndex:
+    """فهرس IVF فوق صفوف مخزن المتجهات"""
+
+    def __init__(
+        self,
+        store: VectorStore,
+        nlist: Optional[int] = None,
+        nprobe: int = 8,
+        min_train_size: int = 10000,
+        retrain_growth: float = 4.0,
+        kmeans_iterations: int = 10,
+        seed: int = 0
+    ):
+        self.store = store
+        self.nlist = nlist              # None = تلقائي (جذر عدد المتجهات)
+        self.nprobe = nprobe
+        self.min_train_size = min_train_size
+        self.retrain_growth = retrain_growth
+        self.kmeans_iterations = kmeans_iterations
+        self.rng = np.random.default_rng(seed)
+
+        self.centroids = None           # (nlist, dim)
+        self.trained_size = 0           # عدد المتجهات عند آخر تدريب
+        self.indexed_size = 0           # عدد الصفوف الموزعة على القوائم
+        self._lists = []                # [np.ndarray] أرقام الصفوف لكل قائمة (مع سعة إضافية)
+        self._list_sizes = None         # عدد الصفوف الفعلي في كل قائمة
+
+    @property
+    def is_trained(self) -> bool:
+        return self.centroids is not None
+
+    def needs_training(self) -> bool:
+        """هل حان وقت التدريب أو إعادة التدريب"""
+        size = len(self.store)
+        if not self.is_trained:
+            return size >= self.min_train_size
+        return size >= self.trained_size * self.retrain_growth
+
+    # 🏋️ التدريب
+    def build(self) -> Tuple[np.ndarray, List[np.ndarray], int]:
+        """تدريب المراكز وتوزيع الصفوف الحالية (آمن للتشغيل في thread منفصل)"""
+        size = len(self.store)
+        vectors = self.store.matrix[:size]
+        nlist = self.nlist or max(1, min(int(math.sqrt(size)), 4096))
+
+        # عينة محدودة تكفي لتدريب المراكز
+        sample_size = min(size, nlist * 64)
+        sample = vectors[self.rng.choice(size, sample_size, replace=False)]
+        centroids = self._kmeans(sample, nlist)
+
+        assignments = self._assign(vectors, centroids)
+        order = np.argsort(assignments, kind="stable")
+        bounds = np.searchsorted(assignments[order], np.arange(nlist + 1))
+        lists = [order[bounds[i]:bounds[i + 1]].astype(np.int64) for i in range(nlist)]
+
+        return centroids, lists, size
+
+    def install(self, centroids: np.ndarray, lists: List[np.ndarray], size: int):
+        """تفعيل نتيجة التدريب وتوزيع الصفوف المضافة أثناءه"""
+        self.centroids = centroids
+        self._lists = lists
+        self._list_sizes = np.array([len(rows) for rows in lists], dtype=np.int64)
+        self.trained_size = size
+        self.indexed_size = size
+
+        self.add(range(size, len(self.store)))
+
+    def train(self):
+        """تدريب متزامن (للاستخدام خارج الخادم مثل القياس)"""
+        self.install(*self.build())
+
+    def _kmeans(self, sample: np.ndarray, nlist: int) -> np.ndarray:
+        """k-means كروي (المتجهات مطبّعة لذا التشابه = الضرب النقطي)"""
+        centroids = sample[self.rng.choice(len(sample), nlist, replace=False)].copy()
+
+        for _ in range(self.kmeans_iterations):
+            assignments = self._assign(sample, centroids)
+            order = np.argsort(assignments, kind="stable")
+            counts = np.bincount(assignments, minlength=nlist)
+
+            sums = np.zeros_like(centroids)
+            present = np.flatnonzero(counts)
+            starts = np.concatenate(([0], np.cumsum(counts)[:-1]))[present]
+            sums[present] = np.add.reduceat(sample[order], starts, axis=0)
+
+            # إعادة زرع المراكز الفارغة من نقاط عشوائية
+            empty = counts == 0
+            if empty.any():
+                sums[empty] = sample[self.rng.choice(len(sample), int(empty.sum()))]
+
+            centroids = normalize_rows(sums)
+
+        return centroids
+
+    @staticmethod
+    def _assign(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+        """أقرب مركز لكل متجه (على دفعات للحد من الذاكرة)"""
+        assignments = np.empty(len(vectors), dtype=np.int64)
+        for start in range(0, len(vectors), ASSIGN_BATCH_SIZE):
+            batch = vectors[start:start + ASSIGN_BATCH_SIZE]
+            assignments[start:start + len(batch)] = np.argmax(batch @ centroids.T, axis=1)
+        return assignments
+
+    # ➕ الإضافة التدريجية
+    def add(self, rows: range):
+        """إضافة صفوف جديدة من مخزن المتجهات إلى أقرب قوائمها"""
+        if not self.is_trained or len(rows) == 0:
+            return
+
+        assignments = self._assign(self.store.matrix[rows.start:rows.stop], self.centroids)
+
+        for row, list_id in zip(rows, assignments):
+            size = self._list_sizes[list_id]
+            buffer = self._lists[list_id]
+
+            if size == len(buffer):
+                grown = np.empty(max(8, 2 * len(buffer)), dtype=np.int64)
+                grown[:size] = buffer[:size]
+                buffer = self._lists[list_id] = grown
+
+            buffer[size] = row
+            self._list_sizes[list_id] = size + 1
+
+        self.indexed_size = max(self.indexed_size, rows.stop)
+
+    # 🔍 البحث
+    def search(
+        self,
+        query_vector: np.ndarray,
+        top_k: int = 3,
+        nprobe: Optional[int] = None,
+        exact: bool = False
+    ) -> List[Tuple[int, float]]:
+        """أفضل top_k صف بالبحث في أقرب nprobe قوائم"""
+        if exact or not self.is_trained:
+            return self.store.search(query_vector, top_k)
+
+        nprobe = min(nprobe or self.nprobe, len(self.centroids))
+        centroid_scores = self.centroids @ query_vector
+        probed = np.argpartition(centroid_scores, -nprobe)[-nprobe:]
+
+        candidates = np.concatenate([self._lists[i][:self._list_sizes[i]] for i in probed])
+        if len(candidates) == 0 or top_k <= 0:
+            return []
+
+        scores = self.store.matrix[candidates] @ query_vector
+        k = min(top_k, len(candidates))
+
+        top = np.argpartition(scores, -k)[-k:] if k < len(candidates) else np.arange(len(candidates))
+        top = top[np.argsort(-scores[top], kind="stable")]
+
+        return [(int(candidates[i]), float(scores[i])) for i in top]
+
+    def stats(self) -> dict:
+        """إحصائيات الفهرس"""
+        return {
+            "trained": self.is_trained,
+            "nlist": len(self.centroids) if self.is_trained else 0,
+            "nprobe": self.nprobe,
+            "trained_size": self.trained_size,
+            "indexed_size": self.indexed_size
+        }
@@ -0,0 +1,39 @@
+"""
+🚀 نقطة دخول ASGI للمخ المتطور (وضع تعدد العمال)
+ASGI entrypoint for multi-worker deployments
+
+اسم الملف advanced-brain.py غير قابل للاستيراد مباشرة، لذلك يحمّله هذا الملف
+ويعرض app حتى يستطيع uvicorn تشغيل عدة عمليات:
+
+    SUROOH_BRAIN_WORKERS=4 python3 brain/advanced-brain.py
+    uvicorn asgi:app --app-dir brain --workers 4 --port 8006
+
+- المقاطع والمتجهات: ملفات mmap للقراءة من كل العمال، والكتابة تحت قفل ملف
+- الجلسات والمهام وحالة وظائف الإدخال: SQLite WAL مشتركة (shared_state.py)
+- حدود الطلبات: SUROOH_RATE_LIMIT_BACKEND=shared أو redis
+"""
+
+import importlib.util
+import os
+import sys
+
+BRAIN_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "advanced-brain.py")
+
+
+def load_brain():
+    """تحميل وحدة المخ مرة واحدة لكل عملية"""
+    # عند التشغيل عبر advanced-brain.py يكون الملف محمّلاً مسبقاً كوحدة رئيسية في العامل
+    for name in ("advanced_brain", "__mp_main__", "__main__"):
+        module = sys.modules.get(name)
+        module_file = getattr(module, "__file__", None)
+        if module_file and os.path.abspath(module_file) == BRAIN_PATH and hasattr(module, "app"):
+            return module
+
+    spec = importlib.util.spec_from_file_location("advanced_brain", BRAIN_PATH)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules["advanced_brain"] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+app = load_brain().app
@@ -0,0 +1,227 @@
+"""
+🔐 التحقق من التوكنات للمخ المتطور
+JWT (HS256) verification with a TTL'd LRU cache
+
+- تحقق حقيقي من توقيع JWT بخوارزمية HS256 (hmac من المكتبة القياسية)
+- فحص exp / nbf / iss / aud
+- كاش LRU محدود الحجم والعمر لنتائج التحقق: الطلبات المتكررة بنفس التوكن
+  لا تعيد فك الترميز ولا حساب التوقيع
+- Claims جاهزة مسبقاً (صلاحيات scopes + فئة حدود الطلبات) لكل توكن
+- توكن الخدمة الداخلي (SUROOH_SERVICE_TOKEN) للاتصال بين الخدمات: معطل ما لم يُضبط،
+  لأن صلاحيته كاملة ("*")
+
+إصدار توكن للتجربة:
+    SUROOH_JWT_SECRET=... python3 brain/auth.py --sub abu_sham --scope "query ingest" --ttl 3600
+"""
+
+import base64
+import hashlib
+import hmac
+import json
+import os
+import time
+from collections import OrderedDict
+from typing import Iterable, Optional, Tuple
+
+
+class AuthError(Exception):
+    """توكن غير صالح أو منتهي"""
+
+
+class Claims:
+    """بيانات التوكن بعد التحقق (تُحسب مرة واحدة وتُخزن في الكاش)"""
+
+    __slots__ = ("subject", "role", "scopes", "tier", "expires_at", "user_info")
+
+    def __init__(self, subject: str, role: str, scopes: Iterable[str], expires_at: float):
+        self.subject = subject
+        self.role = role
+        self.scopes = frozenset(scopes)
+        self.expires_at = expires_at
+
+        # فئة حدود الطلبات من صلاحية بصيغة tier:<name>
+        tiers = sorted(scope[5:] for scope in self.scopes if scope.startswith("tier:"))
+        self.tier = tiers[0] if tiers else None
+
+        # نفس شكل user_info الذي تستخدمه الواجهات
+        self.user_info = {
+            "user_id": subject,
+            "role": role,
+            "permissions": sorted(self.scopes),
+            "tier": self.tier
+        }
+
+    def has_scope(self, scope: str) -> bool:
+        return "*" in self.scopes or scope in self.scopes
+
+
+def b64url_decode(segment: str) -> bytes:
+    return base64.urlsafe_b64decode(segment + "=" * (-len(segment) % 4))
+
+
+def b64url_encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def issue_token(
+    secret: str,
+    subject: str,
+    scopes: Iterable[str] = (),
+    ttl: int = 3600,
+    role: str = "user",
+    issuer: Optional[str] = None,
+    audience: Optional[str] = None
+) -> str:
+    """إصدار JWT موقّع بـ HS256"""
+    now = int(time.time())
+    payload = {"sub": subject, "role": role, "scope": " ".join(scopes), "iat": now, "exp": now + ttl}
+    if issuer:
+        payload["iss"] = issuer
+    if audience:
+        payload["aud"] = audience
+
+    signing_input = ".".join(
+        b64url_encode(json.dumps(part, separators=(",", ":")).encode("utf-8"))
+        for part in ({"alg": "HS256", "typ": "JWT"}, payload)
+    )
+    signature = hmac.new(secret.encode("utf-8"), signing_input.encode("ascii"), hashlib.sha256).digest()
+    return f"{signing_input}.{b64url_encode(signature)}"
+
+
+class TokenVerifier:
+    """تحقق من JWT وتوكن الخدمة مع كاش للنتائج"""
+
+    def __init__(
+        self,
+        secret: Optional[str],
+        service_token: Optional[str] = None,
+        issuer: Optional[str] = None,
+        audience: Optional[str] = None,
+        leeway: float = 30,
+        cache_size: int = 10000,
+        cache_ttl: float = 60
+    ):
+        self.secret = secret.encode("utf-8") if secret else None
+        self.service_token = service_token
+        self.issuer = issuer
+        self.audience = audience
+        self.leeway = leeway
+        self.cache_size = cache_size
+        self.cache_ttl = cache_ttl
+        self.cache: "OrderedDict[str, Tuple[Claims, float]]" = OrderedDict()  # {token: (claims, valid_until)}
+        self.service_claims = Claims("abu_sham", "admin", ["*"], float("inf"))
+
+    @classmethod
+    def from_env(cls) -> "TokenVerifier":
+        return cls(
+            secret=os.getenv("SUROOH_JWT_SECRET"),
+            service_token=os.getenv("SUROOH_SERVICE_TOKEN") or None,
+            issuer=os.getenv("SUROOH_JWT_ISSUER"),
+            audience=os.getenv("SUROOH_JWT_AUDIENCE"),
+            cache_size=int(os.getenv("SUROOH_AUTH_CACHE_SIZE", "10000")),
+            cache_ttl=float(os.getenv("SUROOH_AUTH_CACHE_TTL", "60"))
+        )
+
+    def verify(self, token: str) -> Claims:
+        """Claims التوكن (من الكاش إن أمكن) أو AuthError"""
+        now = time.time()
+
+        cached = self.cache.get(token)
+        if cached is not None:
+            if cached[1] > now:
+                self.cache.move_to_end(token)
+                return cached[0]
+            del self.cache[token]
+
+        if self.service_token and hmac.compare_digest(token.encode("utf-8"), self.service_token.encode("utf-8")):
+            return self.service_claims
+
+        claims = self._decode(token, now)
+
+        # التوكن لا يبقى في الكاش بعد انتهاء صلاحيته
+        self.cache[token] = (claims, min(now + self.cache_ttl, claims.expires_at + self.leeway))
+        self.cache.move_to_end(token)
+        while len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+
+        return claims
+
+    def _decode(self, token: str, now: float) -> Claims:
+        """التحقق الكامل من JWT: البنية والخوارزمية والتوقيع والمدة"""
+        if self.secret is None:
+            raise AuthError("JWT verification is not configured")
+
+        try:
+            header_segment, payload_segment, signature_segment = token.split(".")
+            signing_input = f"{header_segment}.{payload_segment}".encode("ascii")
+            header = json.loads(b64url_decode(header_segment))
+            signature = b64url_decode(signature_segment)
+        except ValueError:  # يشمل UnicodeError لتوكن بحروف غير ASCII
+            raise AuthError("malformed token")
+
+        # خوارزمية ثابتة: لا نقبل alg=none ولا أي خوارزمية يختارها التوكن
+        if not isinstance(header, dict) or header.get("alg") != "HS256":
+            raise AuthError("unsupported algorithm")
+
+        expected = hmac.new(self.secret, signing_input, hashlib.sha256).digest()
+        if not hmac.compare_digest(signature, expected):
+            raise AuthError("invalid signature")
+
+        try:
+            payload = json.loads(b64url_decode(payload_segment))
+        except ValueError:
+            raise AuthError("malformed payload")
+        if not isinstance(payload, dict):
+            raise AuthError("malformed payload")
+
+        expires_at = payload.get("exp")
+        if not isinstance(expires_at, (int, float)) or expires_at + self.leeway < now:
+            raise AuthError("token expired")
+        not_before = payload.get("nbf")
+        if isinstance(not_before, (int, float)) and not_before - self.leeway > now:
+            raise AuthError("token not yet valid")
+        if self.issuer and payload.get("iss") != self.issuer:
+            raise AuthError("invalid issuer")
+        if self.audience:
+            audience = payload.get("aud")
+            audiences = audience if isinstance(audience, list) else [audience]
+            if self.audience not in audiences:
+                raise AuthError("invalid audience")
+
+        subject = payload.get("sub")
+        if not isinstance(subject, str) or not subject:
+            raise AuthError("missing subject")
+
+        scopes = payload.get("scopes", payload.get("scope", ""))
+        if isinstance(scopes, str):
+            scopes = scopes.split()
+
+        return Claims(subject, str(payload.get("role", "user")), scopes, float(expires_at))
+
+    def stats(self) -> dict:
+        return {
+            "jwt_enabled": self.secret is not None,
+            "service_token_enabled": bool(self.service_token),
+            "cached_tokens": len(self.cache),
+            "cache_ttl_seconds": self.cache_ttl
+        }
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Issue an HS256 token for the brain API")
+    parser.add_argument("--sub", required=True)
+    parser.add_argument("--scope", default="query", help="صلاحيات مفصولة بمسافة: query ingest execute tier:premium")
+    parser.add_argument("--role", default="user")
+    parser.add_argument("--ttl", type=int, default=3600)
+    args = parser.parse_args()
+
+    secret = os.getenv("SUROOH_JWT_SECRET")
+    if not secret:
+        parser.error("SUROOH_JWT_SECRET is not set")
+
+    print(issue_token(
+        secret, args.sub, args.scope.split(), ttl=args.ttl, role=args.role,
+        issuer=os.getenv("SUROOH_JWT_ISSUER"), audience=os.getenv("SUROOH_JWT_AUDIENCE")
+    ))
@@ -0,0 +1,105 @@
+"""
+✂️ مقطّع النصوص المتدفق للمخ المتطور
+Streaming, token-aware chunker
+
+- يمشي على النص كلمة كلمة بدون بناء قائمة كلمات كاملة
+- حجم القطعة بعدد التوكنات التقريبي (≈ 4 أحرف لكل توكن)
+- يفضّل القطع عند نهاية فقرة ثم نهاية جملة
+- تداخل (overlap) بين القطع المتتالية
+- معرف حتمي لكل قطعة من محتواها (للتعرف على التكرار)
+"""
+
+import hashlib
+import re
+from typing import Iterator, List, NamedTuple, Tuple
+
+WORD_PATTERN = re.compile(r"\S+")
+SENTENCE_ENDINGS = (".", "!", "?", "؟", "۔", "…", "。")
+
+# قوة نقطة القطع بعد الكلمة
+NO_BREAK, SENTENCE_BREAK, PARAGRAPH_BREAK = 0, 1, 2
+
+
+class Chunk(NamedTuple):
+    chunk_id: str    # blake2b-128 لنص القطعة
+    text: str
+    position: int    # ترتيب أول كلمة في الوثيقة
+    word_count: int
+
+
+def content_hash(text: str) -> str:
+    """بصمة حتمية للمحتوى (معرف القطعة وبصمة الوثيقة)"""
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def estimate_tokens(word: str) -> int:
+    """تقدير عدد التوكنات لكلمة (≈ 4 أحرف لكل توكن)"""
+    return max(1, (len(word) + 3) // 4)
+
+
+def iter_chunks(content: str, chunk_tokens: int = 512, overlap_tokens: int = 64) -> Iterator[Chunk]:
+    """تقطيع متدفق للنص إلى قطع بحجم chunk_tokens مع تداخل overlap_tokens"""
+    overlap_tokens = min(overlap_tokens, chunk_tokens // 4)
+    min_cut_tokens = chunk_tokens // 2
+
+    # نافذة الكلمات الحالية: (start, end, tokens, break_after)
+    window: List[list] = []
+    window_tokens = 0
+    first_position = 0   # ترتيب أول كلمة في النافذة
+    fresh_words = 0      # كلمات لم تظهر في أي قطعة سابقة
+
+    def emit(cut: int) -> Tuple[Chunk, int]:
+        """إخراج أول cut كلمة كقطعة وإرجاع بداية النافذة التالية"""
+        text = content[window[0][0]:window[cut - 1][1]]
+        chunk = Chunk(content_hash(text), text, first_position, cut)
+
+        # الرجوع للخلف بعدد كلمات لا يتجاوز overlap_tokens
+        keep_from, carried = cut, 0
+        while keep_from > 1 and carried + window[keep_from - 1][2] <= overlap_tokens:
+            keep_from -= 1
+            carried += window[keep_from][2]
+
+        return chunk, keep_from
+
+    for match in WORD_PATTERN.finditer(content):
+        start, end = match.span()
+
+        # نوع الفاصل بعد الكلمة السابقة يُعرف عند رؤية الكلمة التالية
+        if window:
+            previous = window[-1]
+            if content.count("\n", previous[1], start) >= 2:
+                previous[3] = PARAGRAPH_BREAK
+            elif content[previous[1] - 1] in SENTENCE_ENDINGS:
+                previous[3] = SENTENCE_BREAK
+
+        tokens = estimate_tokens(match.group())
+        window.append([start, end, tokens, NO_BREAK])
+        window_tokens += tokens
+        fresh_words += 1
+
+        if window_tokens < chunk_tokens:
+            continue
+
+        # أفضل نقطة قطع: آخر نهاية فقرة ثم آخر نهاية جملة بعد نصف الحجم
+        cut, best_break, running = len(window), NO_BREAK, 0
+        for index, (_, _, word_tokens, break_after) in enumerate(window[:-1]):
+            running += word_tokens
+            if running >= min_cut_tokens and break_after >= best_break and break_after != NO_BREAK:
+                cut, best_break = index + 1, break_after
+
+        chunk, keep_from = emit(cut)
+        yield chunk
+
+        first_position += keep_from
+        window = window[keep_from:]
+        window_tokens = sum(word[2] for word in window)
+        fresh_words = len(window) - (cut - keep_from)
+
+    if window and fresh_words > 0:
+        chunk, _ = emit(len(window))
+        yield chunk
+
+
+def chunk_text(content: str, chunk_tokens: int = 512, overlap_tokens: int = 64) -> List[Chunk]:
+    """تقطيع كامل للنص (يُستدعى داخل عملية منفصلة في الإدخال المجمّع)"""
+    return list(iter_chunks(content, chunk_tokens, overlap_tokens))
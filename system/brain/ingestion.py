@@ -0,0 +1,357 @@
+"""
+🏭 خط الإدخال في الخلفية للمخ المتطور
+Bounded Ingestion Pipeline
+
+- طابور asyncio محدود السعة بدل BackgroundTasks
+- عدد ثابت من العمال يسحبون الوظائف بالتوازي
+- ضغط عكسي: موقع الطابور للمتصل، أو رفض مع Retry-After عند الامتلاء
+- إعادة المحاولة بتأخير متزايد قبل اعتبار الوظيفة فاشلة
+- سجل وظائف محدود لمتابعة حالة كل إدخال وتقدمه (رفض بـ 503 إذا امتلأ بوظائف جارية)
+- حالة كل وظيفة تُنشر في الحالة المشتركة، فيتابعها أي عامل غير الذي ينفذها
+"""
+
+import asyncio
+import logging
+import math
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger("SuroohBrainEnterprise")
+
+
+class QueueFullError(Exception):
+    """الطابور ممتلئ: على المتصل المحاولة بعد retry_after ثانية"""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"ingestion queue is full, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+class RegistryFullError(QueueFullError):
+    """سجل الوظائف ممتلئ بوظائف لم تنته بعد (لا يمكن حذف أي منها)"""
+
+
+class IngestionJob:
+    """وظيفة إدخال وثيقة واحدة مع حالتها وتقدمها"""
+
+    FINAL_STATES = ("completed", "failed")
+
+    def __init__(self, job_id: str, content: str, metadata: dict):
+        self.job_id = job_id
+        self.content = content
+        self.metadata = metadata
+        self.state = "queued"     # queued, chunking, embedding, indexing, retrying, completed, failed
+        self.attempts = 0
+        self.error: Optional[str] = None
+        self.result: dict = {}    # ما أنجزه المعالج (يُستخدم لتخطي المراحل المكتملة عند الإعادة)
+        self.progress = {
+            "chunks_total": 0,
+            "chunks_processed": 0,
+            "chunks_reused": 0,
+            "duplicate": False,
+            "embedding_ms": 0.0,
+            "index_commit_ms": 0.0
+        }
+        self.created_at = self.updated_at = time.time()
+        self.finished_at: Optional[float] = None
+        self.on_change: Optional[Callable[["IngestionJob"], None]] = None  # نشر الحالة للعمال الآخرين
+        self._changed = asyncio.Event()
+
+    @property
+    def finished(self) -> bool:
+        return self.state in self.FINAL_STATES
+
+    def update(self, state: Optional[str] = None, **progress):
+        """تحديث الحالة أو التقدم وإيقاظ المتابعين"""
+        if state is not None:
+            self.state = state
+        self.progress.update(progress)
+        self.updated_at = time.time()
+        if self.finished:
+            self.finished_at = self.updated_at
+
+        self._changed.set()
+        self._changed = asyncio.Event()
+        if self.on_change is not None:
+            self.on_change(self)
+
+    async def watch(self, heartbeat: float = 15.0) -> AsyncIterator[Optional[dict]]:
+        """لقطة عند كل تغيير حتى انتهاء الوظيفة (None = لا تغيير خلال heartbeat ثانية)"""
+        changed = self._changed
+        yield self.to_dict()
+
+        while not self.finished:
+            try:
+                await asyncio.wait_for(changed.wait(), heartbeat)
+            except asyncio.TimeoutError:
+                yield None
+                continue
+            changed = self._changed
+            yield self.to_dict()
+
+    def to_dict(self) -> dict:
+        return {
+            "ingestion_id": self.job_id,
+            "state": self.state,
+            "attempts": self.attempts,
+            "error": self.error,
+            **self.progress,
+            "embedding_ms": round(self.progress["embedding_ms"], 1),
+            "index_commit_ms": round(self.progress["index_commit_ms"], 1),
+            "created_at": datetime.fromtimestamp(self.created_at).isoformat(),
+            "updated_at": datetime.fromtimestamp(self.updated_at).isoformat(),
+            "queryable_at": datetime.fromtimestamp(self.finished_at).isoformat()
+            if self.state == "completed" else None
+        }
+
+
+class SharedJobView:
+    """وظيفة ينفذها عامل آخر: لقطات حالتها من الحالة المشتركة بالاستطلاع
+
+    وظيفة لم تتغير لقطتها خلال stale_after ثانية تُعتبر متروكة (عامل على جهاز آخر
+    توقف مثلاً)، فتنتهي المتابعة بحالة failed بدل الانتظار للأبد
+    """
+
+    def __init__(
+        self,
+        snapshot: dict,
+        load: Callable[[], Optional[dict]],
+        poll_interval: float = 0.5,
+        stale_after: float = 300.0
+    ):
+        self.snapshot = snapshot
+        self.load = load
+        self.poll_interval = poll_interval
+        self.stale_after = stale_after
+
+    @property
+    def finished(self) -> bool:
+        return self.snapshot["state"] in IngestionJob.FINAL_STATES
+
+    async def watch(self, heartbeat: float = 15.0) -> AsyncIterator[Optional[dict]]:
+        """نفس عقد IngestionJob.watch لكن بقراءة الحالة المشتركة كل poll_interval"""
+        yield self.snapshot
+        changed_at = quiet_since = time.time()
+
+        while not self.finished:
+            await asyncio.sleep(self.poll_interval)
+            snapshot = self.load()
+            now = time.time()
+            if snapshot is not None and snapshot != self.snapshot:
+                self.snapshot = snapshot
+                changed_at = quiet_since = now
+                yield snapshot
+            elif now - changed_at >= self.stale_after:
+                self.snapshot = {
+                    **self.snapshot,
+                    "state": "failed",
+                    "error": f"لا تقدم من العامل المنفذ منذ {int(self.stale_after)} ثانية"
+                }
+                yield self.snapshot
+            elif now - quiet_since >= heartbeat:
+                quiet_since = now
+                yield None
+
+    def to_dict(self) -> dict:
+        return self.snapshot
+
+
+class JobRegistry:
+    """سجل الوظائف الأحدث (الوظائف المنتهية الأقدم تُحذف عند امتلائه)
+
+    shared: الحالة المشتركة (save_ingest_job/delete_ingest_job) لنشر الحالة لكل العمال؛
+    تحديثات التقدم تُنشر مرة كل publish_interval ثانية على الأكثر، وتغيير المرحلة فوراً
+    """
+
+    def __init__(self, max_jobs: int = 10000, shared=None, publish_interval: float = 0.5):
+        self.max_jobs = max_jobs
+        self.shared = shared
+        self.publish_interval = publish_interval
+        self.jobs: "OrderedDict[str, IngestionJob]" = OrderedDict()
+        self.finished: "OrderedDict[str, None]" = OrderedDict()  # الوظائف المنتهية بترتيب انتهائها
+        self.published: Dict[str, tuple] = {}  # {job_id: (state, published_at)}
+
+    def add(self, job: IngestionJob, retry_after: int = 1) -> bool:
+        """تسجيل وظيفة (False = وظيفة منتهية لم تُسجل لامتلاء السجل بوظائف جارية)"""
+        if len(self.jobs) >= self.max_jobs and not self._evict_finished():
+            if job.finished:
+                return False  # حالتها تُبنى من المخزن عند الطلب
+            raise RegistryFullError(retry_after)
+
+        self.jobs[job.job_id] = job
+        if job.finished:
+            self.finished[job.job_id] = None
+        if self.shared is not None:
+            job.on_change = self.publish
+            self.publish(job)
+        return True
+
+    def publish(self, job: IngestionJob):
+        """كتابة لقطة الوظيفة في الحالة المشتركة (مع تقليل كتابات التقدم)"""
+        state, published_at = self.published.get(job.job_id, (None, 0.0))
+        now = time.time()
+        if state == job.state and now - published_at < self.publish_interval:
+            return
+
+        self.shared.save_ingest_job(job.job_id, job.state, job.to_dict())
+        if job.finished:
+            self.published.pop(job.job_id, None)
+        else:
+            self.published[job.job_id] = (job.state, now)
+
+    def recover(self, retention_seconds: float) -> Tuple[int, int]:
+        """تنظيف الحالة المشتركة من وظائف العمليات المتوقفة والوظائف القديمة"""
+        if self.shared is None:
+            return 0, 0
+        return self.shared.recover_ingest_jobs(retention_seconds)
+
+    def finish(self, job: IngestionJob):
+        """الوظيفة انتهت وأصبحت قابلة للحذف"""
+        if job.job_id in self.jobs:
+            self.finished[job.job_id] = None
+
+    def _evict_finished(self) -> bool:
+        """حذف أقدم وظيفة منتهية (O(1))"""
+        if not self.finished:
+            return False
+        job_id, _ = self.finished.popitem(last=False)
+        del self.jobs[job_id]
+        if self.shared is not None:
+            self.shared.delete_ingest_job(job_id)
+        return True
+
+    def get(self, job_id: str) -> Optional[IngestionJob]:
+        return self.jobs.get(job_id)
+
+    def __len__(self) -> int:
+        return len(self.jobs)
+
+
+class IngestionPipeline:
+    """طابور محدود + عمال متوازيون فوق معالج وظائف async"""
+
+    def __init__(
+        self,
+        handler: Callable[[IngestionJob], Awaitable[None]],
+        max_queue: int = 1000,
+        concurrency: int = 2,
+        max_attempts: int = 3,
+        retry_delay: float = 1.0,
+        drain_timeout: float = 30.0,
+        max_jobs: int = 10000,
+        shared=None,
+        job_retention: float = 86400
+    ):
+        self.handler = handler
+        self.max_queue = max_queue
+        self.concurrency = max(1, concurrency)
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.drain_timeout = drain_timeout
+        self.job_retention = job_retention  # عمر حالة الوظيفة في الحالة المشتركة بعد آخر تحديث
+
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        self.jobs = JobRegistry(max_jobs, shared=shared)
+        self.workers: List[asyncio.Task] = []
+        self.running = 0
+        self.average_job_seconds = 1.0  # متوسط متحرك لتقدير Retry-After
+        self.counters = {"submitted": 0, "completed": 0, "failed": 0, "retried": 0, "rejected": 0}
+
+    def start(self):
+        """تشغيل العمال بعد تنظيف وظائف العمليات المتوقفة"""
+        if not self.workers:
+            orphaned, pruned = self.jobs.recover(self.job_retention)
+            if orphaned or pruned:
+                logger.info(f"♻️ وظائف إدخال متروكة: {orphaned} عُلمت فاشلة، {pruned} حُذفت")
+            self.workers = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+
+    async def stop(self):
+        """إنهاء الوظائف المنتظرة خلال drain_timeout ثم إيقاف العمال"""
+        if not self.workers:
+            return
+
+        try:
+            await asyncio.wait_for(self.queue.join(), self.drain_timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"⚠️ إيقاف خط الإدخال مع {self.queue.qsize()} وظيفة غير منفذة")
+
+        for worker in self.workers:
+            worker.cancel()
+        await asyncio.gather(*self.workers, return_exceptions=True)
+        self.workers = []
+
+    def submit(self, job: IngestionJob) -> int:
+        """إضافة وظيفة وإرجاع موقعها في الطابور (1 = التالية)"""
+        try:
+            if self.queue.full():
+                raise QueueFullError(self.retry_after())
+            self.jobs.add(job, retry_after=self.retry_after())
+        except QueueFullError:
+            self.counters["rejected"] += 1
+            raise
+
+        self.queue.put_nowait(job)
+        self.counters["submitted"] += 1
+        return self.queue.qsize()
+
+    def retry_after(self) -> int:
+        """تقدير الثواني حتى يتوفر مكان في الطابور"""
+        return max(1, math.ceil(self.queue.qsize() * self.average_job_seconds / self.concurrency))
+
+    async def _worker(self):
+        while True:
+            job = await self.queue.get()
+            self.running += 1
+            try:
+                await self._run(job)
+            finally:
+                self.running -= 1
+                self.queue.task_done()
+
+    async def _run(self, job: IngestionJob):
+        """تنفيذ الوظيفة مع إعادة المحاولة بتأخير متزايد"""
+        while True:
+            job.attempts += 1
+            started = time.time()
+
+            try:
+                await self.handler(job)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                job.error = str(e)
+                if job.attempts >= self.max_attempts:
+                    job.result = {}
+                    job.update("failed")
+                    self.jobs.finish(job)
+                    self.counters["failed"] += 1
+                    logger.error(f"❌ فشل إدخال {job.job_id} بعد {job.attempts} محاولات: {e}")
+                    return
+
+                job.update("retrying")
+                self.counters["retried"] += 1
+                logger.warning(f"🔁 إعادة إدخال {job.job_id} (محاولة {job.attempts}): {e}")
+                await asyncio.sleep(self.retry_delay * 2 ** (job.attempts - 1))
+                continue
+
+            job.error = None
+            job.result = {}
+            job.update("completed")
+            self.jobs.finish(job)
+            self.counters["completed"] += 1
+            self.average_job_seconds = 0.9 * self.average_job_seconds + 0.1 * (time.time() - started)
+            return
+
+    def stats(self) -> dict:
+        """إحصائيات خط الإدخال"""
+        return {
+            "queue_depth": self.queue.qsize(),
+            "queue_capacity": self.max_queue,
+            "workers": self.concurrency,
+            "running": self.running,
+            "average_job_ms": round(self.average_job_seconds * 1000),
+            "tracked_jobs": len(self.jobs),
+            **self.counters
+        }
@@ -0,0 +1,375 @@
+"""
+🚦 محدد معدل الطلبات للمخ المتطور
+Token Bucket Rate Limiter
+
+- دلو مستقل لكل (مستخدم، مسار) بحالة ثابتة الحجم: (رصيد، آخر تحديث)
+- الرصيد يمتلئ تدريجياً بدل نافذة ثابتة (بدون دفعة مضاعفة عند حد النافذة)
+- تكلفة قابلة للضبط لكل مسار
+- حذف الدلاء الخاملة: الدلو الممتلئ مساوٍ لدلو جديد فلا يُفقد شيء
+- قيم Retry-After و X-RateLimit-* لكل قرار
+- حالة الدلاء قابلة للاستبدال: ذاكرة العملية، ذاكرة مشتركة بين العمال، أو Redis
+"""
+
+import asyncio
+import hashlib
+import math
+import mmap
+import os
+import struct
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows: الذاكرة المشتركة غير مدعومة
+    fcntl = None
+
+
+class RateLimitPolicy:
+    """limit طلب كل window ثانية، وكل طلب يستهلك cost"""
+
+    def __init__(self, limit: int, window: float = 3600, cost: float = 1, bucket: Optional[str] = None):
+        self.limit = limit
+        self.window = window
+        self.cost = cost
+        self.bucket = bucket  # مسارات تتشارك نفس الدلو (None = دلو خاص بالمسار)
+
+    @property
+    def refill_rate(self) -> float:
+        """الرصيد المضاف كل ثانية"""
+        return self.limit / self.window
+
+
+class RateLimitDecision:
+    """نتيجة فحص الحد مع ترويسات HTTP"""
+
+    def __init__(self, allowed: bool, limit: int, remaining: float, reset_after: float, retry_after: float):
+        self.allowed = allowed
+        self.limit = limit
+        self.remaining = remaining
+        self.reset_after = reset_after   # ثوانٍ حتى يمتلئ الدلو
+        self.retry_after = retry_after   # ثوانٍ حتى يكفي الرصيد للطلب (0 = مسموح)
+
+    def headers(self) -> Dict[str, str]:
+        headers = {
+            "X-RateLimit-Limit": str(self.limit),
+            "X-RateLimit-Remaining": str(max(0, math.floor(self.remaining))),
+            "X-RateLimit-Reset": str(math.ceil(self.reset_after))
+        }
+        if not self.allowed:
+            headers["Retry-After"] = str(max(1, math.ceil(self.retry_after)))
+        return headers
+
+
+# الحدود الافتراضية لكل مسار (نفس حصص النافذة الثابتة السابقة)
+DEFAULT_POLICIES = {
+    "ingest": RateLimitPolicy(limit=100, window=3600),
+    "ingest_batch": RateLimitPolicy(limit=20, window=3600),
+    "query": RateLimitPolicy(limit=50, window=3600),
+    "execute": RateLimitPolicy(limit=20, window=3600)
+}
+
+
+def load_policies(spec: Optional[str] = None) -> Dict[str, RateLimitPolicy]:
+    """الحدود الافتراضية مع تعديلات SUROOH_RATE_LIMITS بصيغة route[@tier]=limit/window[:cost],...
+
+    route@tier حد خاص بالتوكنات التي تحمل صلاحية tier:<name> ويستخدم نفس دلو المسار
+    """
+    policies = dict(DEFAULT_POLICIES)
+    spec = os.getenv("SUROOH_RATE_LIMITS", "") if spec is None else spec
+
+    for entry in filter(None, (part.strip() for part in spec.split(","))):
+        route, rule = entry.split("=", 1)
+        route = route.strip()
+        rule, _, cost = rule.partition(":")
+        limit, _, window = rule.partition("/")
+        policies[route] = RateLimitPolicy(
+            limit=int(limit),
+            window=float(window or 3600),
+            cost=float(cost or 1),
+            bucket=route.partition("@")[0] if "@" in route else None
+        )
+
+    return policies
+
+
+def refill(tokens: float, updated_at: float, now: float, limit: float, rate: float, cost: float) -> Tuple[bool, float]:
+    """إضافة الرصيد المتراكم منذ آخر تحديث ثم خصم التكلفة إن كفى"""
+    tokens = min(limit, tokens + max(0.0, now - updated_at) * rate)
+    if tokens >= cost:
+        return True, tokens - cost
+    return False, tokens
+
+
+class RateLimitBackend:
+    """واجهة تخزين الدلاء: خصم ذري وإرجاع (مسموح، الرصيد المتبقي)"""
+    name = "base"
+
+    async def take(self, key: str, limit: float, rate: float, cost: float) -> Tuple[bool, float]:
+        raise NotImplementedError
+
+    def stats(self) -> dict:
+        return {"backend": self.name}
+
+    def close(self):
+        pass
+
+
+class MemoryBackend(RateLimitBackend):
+    """دلاء في ذاكرة العملية مرتبة حسب آخر استخدام (عامل واحد فقط)"""
+    name = "memory"
+
+    def __init__(self, max_keys: int = 100000, clock: Callable[[], float] = time.monotonic):
+        self.max_keys = max_keys
+        self.clock = clock
+        self.buckets: "OrderedDict[str, list]" = OrderedDict()  # {key: [tokens, updated_at, full_at]}
+
+    async def take(self, key: str, limit: float, rate: float, cost: float) -> Tuple[bool, float]:
+        now = self.clock()
+        state = self.buckets.get(key)
+        if state is None:
+            allowed, tokens = refill(limit, now, now, limit, rate, cost)
+        else:
+            allowed, tokens = refill(state[0], state[1], now, limit, rate, cost)
+            self.buckets.move_to_end(key)
+
+        self.buckets[key] = [tokens, now, now + (limit - tokens) / rate]
+        self._evict(now)
+        return allowed, tokens
+
+    def _evict(self, now: float):
+        """حذف الدلاء الممتلئة من بداية الترتيب، ثم الأقدم إذا تجاوز العدد الحد"""
+        while self.buckets:
+            key, state = next(iter(self.buckets.items()))
+            if state[2] > now and len(self.buckets) <= self.max_keys:
+                break
+            del self.buckets[key]
+
+    def stats(self) -> dict:
+        return {"backend": self.name, "tracked_buckets": len(self.buckets), "max_buckets": self.max_keys}
+
+
+# بصمة المفتاح، الرصيد، آخر تحديث، وقت الامتلاء
+SHARED_SLOT = struct.Struct("<Qddd")
+# العلامة، عدد الخانات، عدد الخانات المشغولة
+SHARED_HEADER = struct.Struct("<8sQQ")
+SHARED_COUNT = struct.Struct("<Q")
+SHARED_COUNT_OFFSET = 16
+SHARED_MAGIC = b"SRLIMIT2"
+
+
+class SharedMemoryBackend(RateLimitBackend):
+    """جدول دلاء ثابت الحجم في ملف mmap مشترك بين العمال مع قفل fcntl
+
+    - عنونة مفتوحة: المفتاح يُبحث عنه في نافذة probe خانات بعد موقع بصمته
+    - الخانة الفارغة أو التي امتلأ دلوها تُعاد للاستخدام (الدلو الممتلئ = دلو جديد)
+    - عند امتلاء النافذة تُستبدل الخانة الأقرب للامتلاء
+    - الخانات الممتلئة التي يمر بها البحث تُفرَّغ، وعدد الخانات المشغولة محفوظ في الترويسة
+    - القفل يُطلب بدون انتظار ويُعاد المحاولة بعد إفساح حلقة الأحداث (لا حجب للعامل)
+    """
+    name = "shared_memory"
+
+    def __init__(self, path: str, slots: int = 65536, probe: int = 32, clock: Callable[[], float] = time.time):
+        if fcntl is None:
+            raise RuntimeError("shared memory rate limiting requires fcntl (POSIX)")
+
+        self.path = path
+        self.clock = clock  # ساعة مشتركة بين العمليات
+        self.slots = slots
+        self.probe = min(probe, slots)
+        size = SHARED_HEADER.size + slots * SHARED_SLOT.size
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+
+        # أول عامل ينشئ الجدول، وتغيير الحجم يعيد إنشاءه
+        fcntl.flock(self.fd, fcntl.LOCK_EX)
+        try:
+            header = os.pread(self.fd, SHARED_COUNT_OFFSET, 0)
+            if os.fstat(self.fd).st_size != size or header != SHARED_HEADER.pack(SHARED_MAGIC, slots, 0)[:SHARED_COUNT_OFFSET]:
+                os.ftruncate(self.fd, 0)
+                os.ftruncate(self.fd, size)
+                os.pwrite(self.fd, SHARED_HEADER.pack(SHARED_MAGIC, slots, 0), 0)
+        finally:
+            fcntl.flock(self.fd, fcntl.LOCK_UN)
+
+        self.map = mmap.mmap(self.fd, size)
+
+    @staticmethod
+    def fingerprint(key: str) -> int:
+        """بصمة 64 بت غير صفرية (الصفر = خانة فارغة)"""
+        digest = int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "little")
+        return digest or 1
+
+    async def _lock(self):
+        """قفل الجدول بدون حجب حلقة الأحداث أثناء انتظار عامل آخر"""
+        while True:
+            try:
+                fcntl.flock(self.fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return
+            except BlockingIOError:
+                await asyncio.sleep(0)
+
+    def _occupied(self) -> int:
+        return SHARED_COUNT.unpack_from(self.map, SHARED_COUNT_OFFSET)[0]
+
+    async def take(self, key: str, limit: float, rate: float, cost: float) -> Tuple[bool, float]:
+        fingerprint = self.fingerprint(key)
+        start = fingerprint % self.slots
+
+        await self._lock()
+        try:
+            now = self.clock()
+            occupied = self._occupied()
+            found = reusable = oldest = None
+            oldest_full_at = math.inf
+
+            for step in range(self.probe):
+                offset = SHARED_HEADER.size + ((start + step) % self.slots) * SHARED_SLOT.size
+                slot_key, tokens, updated_at, full_at = SHARED_SLOT.unpack_from(self.map, offset)
+
+                if slot_key == fingerprint:
+                    found = (offset, tokens, updated_at)
+                    break
+                if slot_key != 0 and full_at <= now:
+                    # دلو ممتلئ = دلو جديد: تفريغ الخانة
+                    SHARED_SLOT.pack_into(self.map, offset, 0, 0.0, 0.0, 0.0)
+                    slot_key = 0
+                    occupied -= 1
+                if reusable is None and slot_key == 0:
+                    reusable = offset
+                if slot_key != 0 and full_at < oldest_full_at:
+                    oldest, oldest_full_at = offset, full_at
+
+            if found is not None:
+                offset, tokens, updated_at = found
+                allowed, tokens = refill(tokens, updated_at, now, limit, rate, cost)
+            else:
+                if reusable is not None:
+                    offset = reusable
+                    occupied += 1
+                else:
+                    offset = oldest
+                allowed, tokens = refill(limit, now, now, limit, rate, cost)
+
+            SHARED_SLOT.pack_into(self.map, offset, fingerprint, tokens, now, now + (limit - tokens) / rate)
+            SHARED_COUNT.pack_into(self.map, SHARED_COUNT_OFFSET, occupied)
+            return allowed, tokens
+        finally:
+            fcntl.flock(self.fd, fcntl.LOCK_UN)
+
+    def stats(self) -> dict:
+        # الخانات المشغولة (قد تشمل دلاء امتلأت ولم يمر بها بحث بعد)
+        return {"backend": self.name, "path": self.path, "tracked_buckets": self._occupied(), "max_buckets": self.slots}
+
+    def close(self):
+        self.map.close()
+        os.close(self.fd)
+
+
+# خصم ذري داخل Redis بساعة الخادم (نفس الحساب في كل العمال والأجهزة)
+REDIS_TOKEN_BUCKET = """
+local limit = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local time = redis.call('TIME')
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated_at')
+local tokens = tonumber(state[1])
+if tokens == nil then
+    tokens = limit
+else
+    tokens = math.min(limit, tokens + math.max(0, now - tonumber(state[2])) * rate)
+end
+
+local allowed = 0
+if tokens >= cost then
+    tokens = tokens - cost
+    allowed = 1
+end
+
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated_at', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil((limit - tokens) / rate * 1000) + 1000)
+return {allowed, tostring(tokens)}
+"""
+
+
+class RedisBackend(RateLimitBackend):
+    """دلاء في Redis (أو أي خادم متوافق) عبر سكربت Lua ذري"""
+    name = "redis"
+
+    def __init__(self, url: str, prefix: str = "surooh:ratelimit:"):
+        import redis.asyncio as redis
+
+        self.client = redis.from_url(url)
+        self.script = self.client.register_script(REDIS_TOKEN_BUCKET)
+        self.prefix = prefix
+        self.url = url
+
+    async def take(self, key: str, limit: float, rate: float, cost: float) -> Tuple[bool, float]:
+        allowed, tokens = await self.script(keys=[self.prefix + key], args=[limit, rate, cost])
+        return bool(allowed), float(tokens)
+
+    def stats(self) -> dict:
+        return {"backend": self.name, "prefix": self.prefix}
+
+
+def create_backend(default_path: str) -> RateLimitBackend:
+    """اختيار مخزن الدلاء من متغيرات البيئة"""
+    kind = os.getenv("SUROOH_RATE_LIMIT_BACKEND", "memory")
+
+    if kind == "memory":
+        return MemoryBackend(max_keys=int(os.getenv("SUROOH_RATE_LIMIT_MAX_KEYS", "100000")))
+    if kind == "shared":
+        return SharedMemoryBackend(
+            os.getenv("SUROOH_RATE_LIMIT_PATH", default_path),
+            slots=int(os.getenv("SUROOH_RATE_LIMIT_SLOTS", "65536"))
+        )
+    if kind == "redis":
+        return RedisBackend(os.getenv("SUROOH_REDIS_URL", "redis://localhost:6379/0"))
+
+    raise ValueError(f"مخزن حدود غير معروف: {kind}")
+
+
+class TokenBucketLimiter:
+    """حدود الطلبات لكل (مستخدم، مسار) فوق مخزن دلاء قابل للاستبدال"""
+
+    def __init__(self, backend: Optional[RateLimitBackend] = None, policies: Optional[Dict[str, RateLimitPolicy]] = None):
+        self.backend = backend if backend is not None else MemoryBackend()
+        self.policies = policies if policies is not None else load_policies()
+
+    def policy(self, route: str, tier: Optional[str] = None) -> RateLimitPolicy:
+        """حد الفئة route@tier إن وُجد وإلا حد المسار"""
+        if tier is not None:
+            tiered = self.policies.get(f"{route}@{tier}")
+            if tiered is not None:
+                return tiered
+        if route not in self.policies:
+            raise KeyError(f"لا يوجد حد معرف للمسار: {route}")
+        return self.policies[route]
+
+    async def acquire(
+        self, user_id: str, route: str, cost: Optional[float] = None, tier: Optional[str] = None
+    ) -> RateLimitDecision:
+        """خصم تكلفة الطلب من دلو المستخدم إن كفى الرصيد"""
+        policy = self.policy(route, tier)
+        cost = policy.cost if cost is None else cost
+        rate = policy.refill_rate
+
+        allowed, tokens = await self.backend.take(f"{user_id}:{policy.bucket or route}", policy.limit, rate, cost)
+
+        return RateLimitDecision(
+            allowed=allowed,
+            limit=policy.limit,
+            remaining=tokens,
+            reset_after=(policy.limit - tokens) / rate,
+            retry_after=0.0 if allowed else (cost - tokens) / rate
+        )
+
+    def stats(self) -> dict:
+        return self.backend.stats()
+
+    def close(self):
+        self.backend.close()
@@ -0,0 +1,246 @@
+"""
+💾 مخزن المقاطع الدائم للمخ المتطور
+Append-only Segment Store (mmap)
+
+- ملف بيانات إلحاقي (نصوص القطع وسجلات الوثائق)
+- ملف فهرس بسجلات ثابتة الطول (offset + length + حقول)
+- القراءة عبر mmap عند الطلب بدون تحميل النصوص في الذاكرة
+- الفتح عند التشغيل O(1) مهما كان حجم البيانات
+- عدة عمليات (عمال uvicorn) تقرأ نفس الملفات وتكتب تحت قفل ملف
+"""
+
+import json
+import mmap
+import os
+import struct
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Iterator, List, Optional
+
+from chunker import Chunk
+
+try:
+    import fcntl
+except ImportError:  # Windows: عامل واحد فقط بدون أقفال بين العمليات
+    fcntl = None
+
+# offset, length, doc_ordinal, position, word_count, chunk_id
+CHUNK_RECORD = struct.Struct("<QIIII16s")
+# offset, length
+DOCUMENT_RECORD = struct.Struct("<QI")
+
+
+class SegmentFile:
+    """ملف blobs إلحاقي مع فهرس سجلات ثابتة الطول"""
+
+    def __init__(self, data_path: str, index_path: str, record: struct.Struct):
+        self.data_path = data_path
+        self.index_path = index_path
+        self.record = record
+
+        self._recover()
+
+        self._data_writer = open(data_path, "ab")
+        self._index_writer = open(index_path, "ab")
+        self._data_size = self._data_writer.tell()
+        self._count = self._index_writer.tell() // record.size
+
+        self._data_map = None
+        self._index_map = None
+
+    def _recover(self):
+        """حذف السجلات الناقصة بعد توقف مفاجئ"""
+        for path in (self.data_path, self.index_path):
+            if not os.path.exists(path):
+                open(path, "wb").close()
+
+        data_size = os.path.getsize(self.data_path)
+        index_size = os.path.getsize(self.index_path)
+        count = index_size // self.record.size
+
+        # آخر سجل يجب أن يشير لبيانات مكتوبة بالكامل
+        with open(self.index_path, "rb") as index_file:
+            while count:
+                index_file.seek((count - 1) * self.record.size)
+                offset, length = self.record.unpack(index_file.read(self.record.size))[:2]
+                if offset + length <= data_size:
+                    break
+                count -= 1
+
+        if count * self.record.size != index_size:
+            with open(self.index_path, "r+b") as index_file:
+                index_file.truncate(count * self.record.size)
+
+    def __len__(self) -> int:
+        return self._count
+
+    def refresh(self):
+        """قراءة العدد والحجم من الملفات بعد إضافات عمليات أخرى"""
+        self._count = os.fstat(self._index_writer.fileno()).st_size // self.record.size
+        self._data_size = os.fstat(self._data_writer.fileno()).st_size
+
+    @property
+    def size_bytes(self) -> int:
+        return self._data_size + self._count * self.record.size
+
+    def append(self, blob: bytes, *fields) -> int:
+        """إضافة blob وسجله وإرجاع رقمه"""
+        offset = self._data_size
+        self._data_writer.write(blob)
+        self._data_writer.flush()
+        self._data_size += len(blob)
+
+        # السجل يُكتب بعد البيانات حتى لا يشير لبيانات ناقصة
+        self._index_writer.write(self.record.pack(offset, len(blob), *fields))
+        self._index_writer.flush()
+        self._count += 1
+
+        return self._count - 1
+
+    def _mapped(self, current: Optional[mmap.mmap], path: str, required: int) -> mmap.mmap:
+        """إعادة ربط mmap إذا كبر الملف بعد آخر ربط"""
+        if current is not None and len(current) >= required:
+            return current
+
+        # الربط القديم يُترك لجامع القمامة لأن القراءات السابقة قد تشير إليه
+        with open(path, "rb") as handle:
+            return mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def fields(self, ordinal: int) -> tuple:
+        """حقول السجل (offset, length, ...)"""
+        if not 0 <= ordinal < self._count:
+            raise IndexError(ordinal)
+
+        end = (ordinal + 1) * self.record.size
+        self._index_map = self._mapped(self._index_map, self.index_path, end)
+        return self.record.unpack_from(self._index_map, ordinal * self.record.size)
+
+    def blob(self, ordinal: int) -> memoryview:
+        """بيانات السجل كعرض على mmap بدون نسخ"""
+        offset, length = self.fields(ordinal)[:2]
+        if length == 0:
+            return memoryview(b"")
+
+        self._data_map = self._mapped(self._data_map, self.data_path, offset + length)
+        return memoryview(self._data_map)[offset:offset + length]
+
+    def close(self):
+        for handle in (self._data_writer, self._index_writer):
+            handle.flush()
+            os.fsync(handle.fileno())
+            handle.close()
+
+
+@contextmanager
+def file_lock(fd: int, blocking: bool = True) -> Iterator[bool]:
+    """قفل حصري بين العمليات على ملف مفتوح (يُرجع False إذا كان مأخوذاً وblocking=False)"""
+    if fcntl is None:
+        yield True
+        return
+
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        yield False
+        return
+
+    try:
+        yield True
+    finally:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+
+
+class SegmentStore:
+    """مخزن الوثائق والقطع على القرص"""
+
+    def __init__(self, path: str):
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self._lock_fd = os.open(os.path.join(path, "store.lock"), os.O_RDWR | os.O_CREAT, 0o600)
+
+        # الاستعادة بعد التوقف تحت القفل حتى لا تقطع سجلاً يكتبه عامل آخر
+        with self.write_lock():
+            self.chunks = SegmentFile(
+                os.path.join(path, "chunks.dat"), os.path.join(path, "chunks.idx"), CHUNK_RECORD
+            )
+            self.documents = SegmentFile(
+                os.path.join(path, "documents.dat"), os.path.join(path, "documents.idx"), DOCUMENT_RECORD
+            )
+        self.document = lru_cache(maxsize=4096)(self._read_document)
+
+    def write_lock(self):
+        """قفل الكتابة المشترك بين كل العمليات التي تفتح نفس المجلد (غير متداخل)"""
+        return file_lock(self._lock_fd)
+
+    def refresh(self):
+        """رؤية القطع والوثائق التي أضافتها عمليات أخرى"""
+        self.chunks.refresh()
+        self.documents.refresh()
+
+    @property
+    def chunk_count(self) -> int:
+        return len(self.chunks)
+
+    @property
+    def document_count(self) -> int:
+        return len(self.documents)
+
+    @property
+    def size_bytes(self) -> int:
+        return self.chunks.size_bytes + self.documents.size_bytes
+
+    def append_chunk(self, chunk: Chunk, doc_ordinal: int) -> int:
+        """تخزين قطعة وإرجاع رقمها"""
+        return self.chunks.append(
+            chunk.text.encode("utf-8"),
+            doc_ordinal,
+            chunk.position,
+            chunk.word_count,
+            bytes.fromhex(chunk.chunk_id)
+        )
+
+    def append_document(
+        self,
+        doc_id: str,
+        metadata: dict,
+        stored_at: str,
+        ordinals: List[int],
+        content_hash: str
+    ) -> int:
+        """تخزين سجل الوثيقة بعد قطعها وإرجاع رقمه"""
+        # سجل الوثيقة آخراً: قطع بدون سجل وثيقة = قطع يتيمة يتم تجاهلها
+        record = {
+            "doc_id": doc_id,
+            "metadata": metadata,
+            "stored_at": stored_at,
+            "content_hash": content_hash,
+            "chunks": ordinals
+        }
+        return self.documents.append(json.dumps(record, ensure_ascii=False).encode("utf-8"))
+
+    def chunk_text(self, ordinal: int) -> str:
+        """نص القطعة (يُفك ترميزه من mmap عند الطلب)"""
+        return str(self.chunks.blob(ordinal), "utf-8")
+
+    def chunk_id(self, ordinal: int) -> str:
+        """معرف القطعة (بصمة محتواها)"""
+        return self.chunks.fields(ordinal)[5].hex()
+
+    def chunk(self, ordinal: int) -> dict:
+        """سجل القطعة كاملاً"""
+        _, _, doc_ordinal, position, word_count, chunk_id = self.chunks.fields(ordinal)
+        return {
+            "chunk_id": chunk_id.hex(),
+            "text": self.chunk_text(ordinal),
+            "position": position,
+            "word_count": word_count,
+            "doc_ordinal": doc_ordinal
+        }
+
+    def _read_document(self, ordinal: int) -> dict:
+        return json.loads(str(self.documents.blob(ordinal), "utf-8"))
+
+    def close(self):
+        self.chunks.close()
+        self.documents.close()
+        os.close(self._lock_fd)
@@ -0,0 +1,205 @@
+"""
+🗄️ الحالة المشتركة بين عمال المخ المتطور
+Shared Mutable State (SQLite WAL)
+
+- الجلسات وسياقها والمهام وحالة وظائف الإدخال في قاعدة SQLite واحدة داخل مجلد البيانات
+- وضع WAL: قراءات متزامنة من كل العمال وكتابة واحدة في كل لحظة
+- كل عملية تعديل جملة SQL ذرية واحدة (أو معاملة قصيرة)
+- وظائف الإدخال تُسجل مع العملية المنفذة (host:pid)، فوظائف عملية توقفت فجأة
+  تُعلَّم فاشلة عند بدء التشغيل بدل أن تبقى "جارية" للأبد
+"""
+
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from task_queue import process_alive, worker_identity
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    session_id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    pinned_docs TEXT NOT NULL DEFAULT '[]',
+    created_at TEXT NOT NULL,
+    last_activity TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS session_context (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    session_id TEXT NOT NULL,
+    item TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS session_context_by_session ON session_context (session_id, id);
+CREATE TABLE IF NOT EXISTS tasks (
+    task_id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    data TEXT NOT NULL,
+    updated_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS tasks_by_status ON tasks (status);
+CREATE TABLE IF NOT EXISTS ingest_jobs (
+    job_id TEXT PRIMARY KEY,
+    state TEXT NOT NULL,
+    data TEXT NOT NULL,
+    updated_at TEXT NOT NULL,
+    owner TEXT
+);
+"""
+
+INGEST_FINAL_STATES = ("completed", "failed")
+
+# أعمدة أضيفت بعد إنشاء الجداول في إصدارات سابقة
+MIGRATIONS = {
+    ("ingest_jobs", "owner"): "ALTER TABLE ingest_jobs ADD COLUMN owner TEXT"
+}
+
+
+class SharedState:
+    """الجلسات والمهام في SQLite مشتركة بين كل العمليات"""
+
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.lock = threading.Lock()  # الاتصال نفسه مشترك مع threads العملية
+
+        self.db = sqlite3.connect(path, isolation_level=None, check_same_thread=False, timeout=5.0)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(SCHEMA)
+        self.worker_id = worker_identity()
+
+        for (table, column), statement in MIGRATIONS.items():
+            if column not in {row[1] for row in self.db.execute(f"PRAGMA table_info({table})")}:
+                self.db.execute(statement)
+
+    def _execute(self, sql: str, params: tuple = ()) -> sqlite3.Cursor:
+        with self.lock:
+            return self.db.execute(sql, params)
+
+    # 📝 الجلسات
+    def create_session(self, session_id: str, user_id: str):
+        now = datetime.now().isoformat()
+        self._execute(
+            "INSERT INTO sessions (session_id, user_id, created_at, last_activity) VALUES (?, ?, ?, ?)",
+            (session_id, user_id, now, now)
+        )
+
+    def append_context(self, session_id: str, item: dict, max_items: int = 50) -> bool:
+        """إضافة عنصر لسياق الجلسة مع الإبقاء على آخر max_items فقط"""
+        item_json = json.dumps(item, ensure_ascii=False, default=str)
+
+        with self.lock:
+            self.db.execute("BEGIN IMMEDIATE")
+            try:
+                updated = self.db.execute(
+                    "UPDATE sessions SET last_activity = ? WHERE session_id = ?",
+                    (datetime.now().isoformat(), session_id)
+                ).rowcount
+                if updated:
+                    self.db.execute(
+                        "INSERT INTO session_context (session_id, item) VALUES (?, ?)", (session_id, item_json)
+                    )
+                    self.db.execute(
+                        "DELETE FROM session_context WHERE session_id = ? AND id <= "
+                        "(SELECT id FROM session_context WHERE session_id = ? ORDER BY id DESC LIMIT 1 OFFSET ?)",
+                        (session_id, session_id, max_items)
+                    )
+                self.db.execute("COMMIT")
+            except BaseException:
+                self.db.execute("ROLLBACK")
+                raise
+
+        return bool(updated)
+
+    def get_context(self, session_id: str) -> List[dict]:
+        rows = self._execute(
+            "SELECT item FROM session_context WHERE session_id = ? ORDER BY id", (session_id,)
+        ).fetchall()
+        return [json.loads(item) for (item,) in rows]
+
+    def session_count(self) -> int:
+        return self._execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+    # 📋 المهام
+    def save_task(self, task_id: str, status: str, data: dict):
+        self._execute(
+            "INSERT INTO tasks (task_id, status, data, updated_at) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (task_id) DO UPDATE SET status = excluded.status, data = excluded.data, "
+            "updated_at = excluded.updated_at",
+            (task_id, status, json.dumps(data, ensure_ascii=False, default=str), datetime.now().isoformat())
+        )
+
+    def get_task(self, task_id: str) -> Optional[dict]:
+        row = self._execute("SELECT data FROM tasks WHERE task_id = ?", (task_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def task_counts(self) -> Dict[str, int]:
+        """عدد المهام في كل حالة"""
+        return dict(self._execute("SELECT status, COUNT(*) FROM tasks GROUP BY status").fetchall())
+
+    # 📥 وظائف الإدخال (العامل المنفذ يكتب، وأي عامل يقرأ)
+    def save_ingest_job(self, job_id: str, state: str, data: dict):
+        self._execute(
+            "INSERT INTO ingest_jobs (job_id, state, data, updated_at, owner) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT (job_id) DO UPDATE SET state = excluded.state, data = excluded.data, "
+            "updated_at = excluded.updated_at, owner = excluded.owner",
+            (job_id, state, json.dumps(data, ensure_ascii=False, default=str), datetime.now().isoformat(),
+             self.worker_id)
+        )
+
+    def get_ingest_job(self, job_id: str) -> Optional[dict]:
+        row = self._execute("SELECT data FROM ingest_jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def recover_ingest_jobs(self, retention_seconds: float = 86400) -> Tuple[int, int]:
+        """عند بدء التشغيل: تعليم وظائف العمليات المتوقفة على هذا الجهاز كفاشلة،
+        وحذف الوظائف التي لم تتغير منذ retention_seconds (المكتملة تُبنى من المخزن)
+
+        يرجع (عدد الوظائف المعلَّمة فاشلة، عدد الوظائف المحذوفة)
+        """
+        host = self.worker_id.rpartition(":")[0]
+        now = datetime.now()
+        placeholders = ", ".join("?" for _ in INGEST_FINAL_STATES)
+        orphaned = 0
+
+        with self.lock:
+            self.db.execute("BEGIN IMMEDIATE")
+            try:
+                rows = self.db.execute(
+                    f"SELECT job_id, data, owner FROM ingest_jobs WHERE state NOT IN ({placeholders})",
+                    INGEST_FINAL_STATES
+                ).fetchall()
+                for job_id, data, owner in rows:
+                    owner_host, _, pid = (owner or "").rpartition(":")
+                    if owner_host != host or not pid.isdigit() or process_alive(int(pid)):
+                        continue
+                    snapshot = json.loads(data)
+                    snapshot.update(
+                        state="failed", error="توقفت العملية المنفذة قبل اكتمال الإدخال",
+                        updated_at=now.isoformat()
+                    )
+                    self.db.execute(
+                        "UPDATE ingest_jobs SET state = 'failed', data = ?, updated_at = ? WHERE job_id = ?",
+                        (json.dumps(snapshot, ensure_ascii=False), now.isoformat(), job_id)
+                    )
+                    orphaned += 1
+
+                pruned = self.db.execute(
+                    "DELETE FROM ingest_jobs WHERE updated_at < ?",
+                    ((now - timedelta(seconds=retention_seconds)).isoformat(),)
+                ).rowcount
+                self.db.execute("COMMIT")
+            except BaseException:
+                self.db.execute("ROLLBACK")
+                raise
+
+        return orphaned, pruned
+
+    def delete_ingest_job(self, job_id: str):
+        self._execute("DELETE FROM ingest_jobs WHERE job_id = ?", (job_id,))
+
+    def close(self):
+        with self.lock:
+            self.db.close()
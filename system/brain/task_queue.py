@@ -0,0 +1,365 @@
+"""
+📬 طابور مهام البوتات الدائم للمخ المتطور
+Durable Task Queue (SQLite WAL journal)
+
+- كل مهمة تُكتب في السجل قبل الرد على /v1/execute، فلا تضيع عند إعادة التشغيل
+- المنفذون (dispatchers) في أي عامل يحجزون المهام بمعاملة ذرية واحدة
+- الجدولة: الأولوية أولاً (مع ترقية المهام المنتظرة طويلاً)، ثم حصص عادلة موزونة
+  بين المستخدمين، ثم الأقدم. وحد أعلى للمهام الجارية لكل بوت عبر كل العمال
+- إعادة المحاولة بتأخير أسي عشوائي حسب سياسة كل بوت، والمهام المستنفدة تبقى
+  في السجل بحالة dead حتى تُعاد يدوياً (replay)
+- الحجز مؤقت (lease): مهمة عامل توقف فجأة تعود للطابور عند انتهاء المهلة،
+  أو فوراً عند بدء التشغيل إذا كانت العملية الحاجزة على نفس الجهاز لم تعد موجودة
+"""
+
+import json
+import os
+import random
+import socket
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS task_queue (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    task_id TEXT NOT NULL UNIQUE,
+    agent_name TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    priority TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    state TEXT NOT NULL DEFAULT 'queued',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    enqueued_at REAL NOT NULL,
+    claimed_by TEXT,
+    lease_until REAL,
+    available_at REAL,
+    last_error TEXT,
+    dead_at REAL
+);
+CREATE INDEX IF NOT EXISTS task_queue_by_agent ON task_queue (agent_name, state, seq);
+CREATE TABLE IF NOT EXISTS fair_share (
+    agent_name TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    vtime REAL NOT NULL,
+    PRIMARY KEY (agent_name, user_id)
+);
+"""
+
+PRIORITY_LEVELS = {"low": 0, "normal": 1, "high": 2, "urgent": 3}
+
+# الترقية بالانتظار تتوقف عند high: مهام urgent تبقى أولاً دائماً
+MAX_AGED_LEVEL = PRIORITY_LEVELS["high"]
+
+PRIORITY_SQL = "CASE q.priority " + " ".join(
+    f"WHEN '{name}' THEN {level}" for name, level in PRIORITY_LEVELS.items()
+) + " ELSE 1 END"
+
+
+# أعمدة أضيفت بعد إنشاء الجدول في إصدارات سابقة
+MIGRATIONS = {
+    "available_at": "ALTER TABLE task_queue ADD COLUMN available_at REAL",
+    "last_error": "ALTER TABLE task_queue ADD COLUMN last_error TEXT",
+    "dead_at": "ALTER TABLE task_queue ADD COLUMN dead_at REAL"
+}
+
+
+class BotUnavailableError(Exception):
+    """البوت لا يستجيب أو مشغول مؤقتاً (قابل لإعادة المحاولة)"""
+
+
+class BotRejectedError(Exception):
+    """البوت رفض المهمة نفسها (إعادة المحاولة لن تفيد)"""
+
+
+class RetryPolicy:
+    """سياسة إعادة المحاولة لبوت: عدد المحاولات والتأخير الأسي مع jitter كامل"""
+
+    def __init__(
+        self,
+        max_attempts: int = 3,
+        base_delay: float = 2.0,
+        max_delay: float = 60.0,
+        retryable: tuple = (BotUnavailableError,)
+    ):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retryable = retryable
+
+    def should_retry(self, error: BaseException, attempts: int) -> bool:
+        return attempts < self.max_attempts and isinstance(error, self.retryable)
+
+    def delay(self, attempts: int) -> float:
+        """تأخير عشوائي بين 0 وسقف يتضاعف مع كل محاولة (يمنع عودة الطلبات دفعة واحدة)"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempts - 1)))
+
+
+def load_retry_policies(spec: str, default: RetryPolicy) -> Dict[str, RetryPolicy]:
+    """سياسات البوتات بصيغة agent=max_attempts[/base_delay[/max_delay]],..."""
+    policies = {}
+    for entry in filter(None, (part.strip() for part in spec.split(","))):
+        agent_name, _, rule = entry.partition("=")
+        max_attempts, _, rest = rule.partition("/")
+        base_delay, _, max_delay = rest.partition("/")
+        policies[agent_name.strip()] = RetryPolicy(
+            max_attempts=int(max_attempts),
+            base_delay=float(base_delay or default.base_delay),
+            max_delay=float(max_delay or default.max_delay)
+        )
+    return policies
+
+
+def load_mapping(spec: str, cast=float) -> Dict[str, float]:
+    """قراءة إعداد بصيغة name=value,name=value"""
+    mapping = {}
+    for entry in filter(None, (part.strip() for part in spec.split(","))):
+        name, _, value = entry.partition("=")
+        mapping[name.strip()] = cast(value)
+    return mapping
+
+
+def worker_identity() -> str:
+    """معرف العملية الحاجزة: host:pid"""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class QueuedTask:
+    """مهمة محجوزة من الطابور"""
+
+    __slots__ = ("task_id", "agent_name", "user_id", "priority", "payload", "attempts", "enqueued_at")
+
+    def __init__(self, task_id: str, agent_name: str, user_id: str, priority: str,
+                 payload: dict, attempts: int, enqueued_at: float):
+        self.task_id = task_id
+        self.agent_name = agent_name
+        self.user_id = user_id
+        self.priority = priority
+        self.payload = payload
+        self.attempts = attempts
+        self.enqueued_at = enqueued_at
+
+
+class TaskQueue:
+    """سجل المهام المعلقة والجارية مشترك بين كل العمال"""
+
+    def __init__(
+        self,
+        path: str,
+        lease_seconds: float = 120,
+        aging_seconds: float = 60,
+        agent_limits: Optional[Dict[str, int]] = None,
+        user_weights: Optional[Dict[str, float]] = None
+    ):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.aging_seconds = aging_seconds  # كل فترة انتظار ترفع المهمة مستوى أولوية واحد
+        self.agent_limits = agent_limits or {}  # {agent_name: أقصى مهام جارية عبر كل العمال}
+        self.user_weights = user_weights or {}  # {user_id: وزن الحصة} (الافتراضي 1)
+        self.worker_id = worker_identity()
+        self.lock = threading.Lock()
+
+        self.db = sqlite3.connect(path, isolation_level=None, check_same_thread=False, timeout=5.0)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(SCHEMA)
+
+        columns = {row[1] for row in self.db.execute("PRAGMA table_info(task_queue)")}
+        for column, statement in MIGRATIONS.items():
+            if column not in columns:
+                self.db.execute(statement)
+
+    def enqueue(self, task_id: str, agent_name: str, user_id: str, priority: str, payload: dict):
+        with self.lock:
+            self.db.execute("BEGIN IMMEDIATE")
+            try:
+                self.db.execute(
+                    "INSERT INTO task_queue (task_id, agent_name, user_id, priority, payload, enqueued_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (task_id, agent_name, user_id, priority,
+                     json.dumps(payload, ensure_ascii=False, default=str), time.time())
+                )
+                # المستخدم العائد بعد خمول يبدأ من أقل وقت افتراضي بين المستخدمين المنتظرين
+                # (لا يجمع رصيداً من فترة غيابه يحتكر به البوت)
+                self.db.execute(
+                    "INSERT INTO fair_share (agent_name, user_id, vtime) VALUES (?1, ?2, "
+                    "COALESCE((SELECT MIN(f.vtime) FROM fair_share f WHERE f.agent_name = ?1 AND EXISTS "
+                    "(SELECT 1 FROM task_queue q WHERE q.agent_name = ?1 AND q.user_id = f.user_id "
+                    "AND q.state = 'queued' AND q.task_id != ?3)), 0)) "
+                    "ON CONFLICT (agent_name, user_id) DO UPDATE SET vtime = MAX(vtime, excluded.vtime)",
+                    (agent_name, user_id, task_id)
+                )
+                self.db.execute("COMMIT")
+            except BaseException:
+                self.db.execute("ROLLBACK")
+                raise
+
+    def claim(self, agent_name: str) -> Optional[QueuedTask]:
+        """حجز المهمة التالية للبوت حسب الأولوية ثم الحصة العادلة ثم الأقدم"""
+        now = time.time()
+
+        with self.lock:
+            # فحص قراءة فقط قبل قفل الكتابة: المنفذ الخامل لا يحجز قاعدة البيانات كل ثانية
+            # (مهمة تصل بعد الفحص تُحجز في الإيقاظ أو الدورة التالية)
+            if not self.db.execute(
+                "SELECT EXISTS (SELECT 1 FROM task_queue WHERE agent_name = :agent AND "
+                "((state = 'queued' AND COALESCE(available_at, 0) <= :now) "
+                "OR (state = 'running' AND lease_until < :now)))",
+                {"agent": agent_name, "now": now}
+            ).fetchone()[0]:
+                return None
+
+            self.db.execute("BEGIN IMMEDIATE")
+            try:
+                row = None
+                running = self.db.execute(
+                    "SELECT COUNT(*) FROM task_queue WHERE agent_name = ? AND state = 'running' "
+                    "AND lease_until >= ?",
+                    (agent_name, now)
+                ).fetchone()[0]
+
+                if running < self.agent_limits.get(agent_name, float("inf")):
+                    row = self.db.execute(
+                        "SELECT q.task_id, q.agent_name, q.user_id, q.priority, q.payload, q.attempts, "
+                        "q.enqueued_at FROM task_queue q LEFT JOIN fair_share f "
+                        "ON f.agent_name = q.agent_name AND f.user_id = q.user_id "
+                        "WHERE q.agent_name = :agent AND "
+                        "((q.state = 'queued' AND COALESCE(q.available_at, 0) <= :now) "
+                        "OR (q.state = 'running' AND q.lease_until < :now)) "
+                        f"ORDER BY CASE WHEN {PRIORITY_SQL} = 3 THEN 3 "
+                        f"ELSE MIN({MAX_AGED_LEVEL}, {PRIORITY_SQL} + CAST((:now - q.enqueued_at) / :aging AS INTEGER)) END DESC, "
+                        "COALESCE(f.vtime, 0), q.seq LIMIT 1",
+                        {"agent": agent_name, "now": now, "aging": self.aging_seconds}
+                    ).fetchone()
+
+                if row is not None:
+                    self.db.execute(
+                        "UPDATE task_queue SET state = 'running', attempts = attempts + 1, "
+                        "claimed_by = ?, lease_until = ? WHERE task_id = ?",
+                        (self.worker_id, now + self.lease_seconds, row[0])
+                    )
+                    # كل مهمة تكلف المستخدم 1/وزنه من الوقت الافتراضي
+                    self.db.execute(
+                        "UPDATE fair_share SET vtime = vtime + ? WHERE agent_name = ? AND user_id = ?",
+                        (1.0 / self.user_weights.get(row[2], 1.0), agent_name, row[2])
+                    )
+                self.db.execute("COMMIT")
+            except BaseException:
+                self.db.execute("ROLLBACK")
+                raise
+
+        if row is None:
+            return None
+
+        task_id, agent, user_id, priority, payload, attempts, enqueued_at = row
+        return QueuedTask(task_id, agent, user_id, priority, json.loads(payload), attempts + 1, enqueued_at)
+
+    def complete(self, task_id: str):
+        """إزالة المهمة من السجل بعد انتهائها (النتيجة محفوظة في حالة المهمة)"""
+        with self.lock:
+            self.db.execute("DELETE FROM task_queue WHERE task_id = ?", (task_id,))
+
+    def retry(self, task_id: str, delay: float, error: str):
+        """إرجاع المهمة للطابور بعد delay ثانية"""
+        with self.lock:
+            self.db.execute(
+                "UPDATE task_queue SET state = 'queued', claimed_by = NULL, lease_until = NULL, "
+                "available_at = ?, last_error = ? WHERE task_id = ?",
+                (time.time() + delay, error, task_id)
+            )
+
+    def dead_letter(self, task_id: str, error: str):
+        """نقل المهمة لقائمة المهام الميتة (تبقى بحمولتها حتى replay)"""
+        with self.lock:
+            self.db.execute(
+                "UPDATE task_queue SET state = 'dead', claimed_by = NULL, lease_until = NULL, "
+                "last_error = ?, dead_at = ? WHERE task_id = ?",
+                (error, time.time(), task_id)
+            )
+
+    def replay(self, task_id: str) -> Optional[str]:
+        """إعادة مهمة ميتة للطابور بعداد محاولات جديد (يرجع اسم البوت أو None)"""
+        with self.lock:
+            row = self.db.execute(
+                "SELECT agent_name FROM task_queue WHERE task_id = ? AND state = 'dead'", (task_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            replayed = self.db.execute(
+                "UPDATE task_queue SET state = 'queued', attempts = 0, available_at = NULL, dead_at = NULL, "
+                "enqueued_at = ? WHERE task_id = ? AND state = 'dead'",
+                (time.time(), task_id)
+            ).rowcount
+        return row[0] if replayed else None
+
+    def dead_letters(self, limit: int = 100) -> List[dict]:
+        """المهام الميتة الأحدث أولاً"""
+        with self.lock:
+            rows = self.db.execute(
+                "SELECT task_id, agent_name, user_id, priority, attempts, last_error, enqueued_at, dead_at "
+                "FROM task_queue WHERE state = 'dead' ORDER BY dead_at DESC LIMIT ?",
+                (limit,)
+            ).fetchall()
+
+        columns = ("task_id", "agent_name", "user_id", "priority", "attempts", "last_error", "enqueued_at", "dead_at")
+        return [dict(zip(columns, row)) for row in rows]
+
+    def release(self, task_id: str):
+        """إرجاع مهمة محجوزة للطابور (عند الإيقاف قبل انتهائها)"""
+        with self.lock:
+            self.db.execute(
+                "UPDATE task_queue SET state = 'queued', claimed_by = NULL, lease_until = NULL "
+                "WHERE task_id = ? AND claimed_by = ?",
+                (task_id, self.worker_id)
+            )
+
+    def recover(self) -> int:
+        """إرجاع مهام العمليات المتوقفة على هذا الجهاز للطابور فوراً"""
+        host = socket.gethostname()
+        orphaned = []
+
+        with self.lock:
+            rows = self.db.execute(
+                "SELECT task_id, claimed_by FROM task_queue WHERE state = 'running'"
+            ).fetchall()
+            for task_id, claimed_by in rows:
+                claimed_host, _, pid = (claimed_by or "").rpartition(":")
+                if claimed_host == host and pid.isdigit() and not process_alive(int(pid)):
+                    orphaned.append(task_id)
+
+            for task_id in orphaned:
+                self.db.execute(
+                    "UPDATE task_queue SET state = 'queued', claimed_by = NULL, lease_until = NULL "
+                    "WHERE task_id = ? AND state = 'running'",
+                    (task_id,)
+                )
+
+        return len(orphaned)
+
+    def depth(self) -> Dict[str, Dict[str, int]]:
+        """عدد المهام لكل بوت وحالة"""
+        with self.lock:
+            rows = self.db.execute(
+                "SELECT agent_name, state, COUNT(*) FROM task_queue GROUP BY agent_name, state"
+            ).fetchall()
+
+        depth = {}
+        for agent_name, state, count in rows:
+            depth.setdefault(agent_name, {})[state] = count
+        return depth
+
+    def close(self):
+        with self.lock:
+            self.db.close()
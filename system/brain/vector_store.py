@@ -0,0 +1,226 @@
+"""
+🧮 مخزن المتجهات للمخ المتطور
+Embedding Pipeline + Vector Store
+
+- Embedder: واجهة قابلة للاستبدال لتحويل النصوص إلى متجهات
+- HashingEmbedder: متجهات محلية حتمية بدون إنترنت (feature hashing)
+- OpenAIEmbedder: متجهات OpenAI للإنتاج
+- VectorStore: مصفوفة float32 متصلة مع بحث بعملية ضرب واحدة
+"""
+
+import hashlib
+import os
+from contextlib import nullcontext
+from typing import Callable, ContextManager, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+class Embedder:
+    """واجهة مولد المتجهات"""
+    name: str = "base"
+    dim: int = 0
+    cpu_bound: bool = False  # True = يستفيد من التشغيل في عملية منفصلة
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        """تحويل مجموعة نصوص إلى مصفوفة (n, dim) من نوع float32"""
+        raise NotImplementedError
+
+
+class HashingEmbedder(Embedder):
+    """مولد متجهات محلي حتمي يعتمد على تجزئة الكلمات"""
+
+    cpu_bound = True
+
+    def __init__(self, dim: int = 256):
+        self.name = "hashing"
+        self.dim = dim
+
+    def _feature(self, token: str) -> Tuple[int, float]:
+        """موقع الكلمة في المتجه وإشارتها"""
+        digest = int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest(), "little")
+        return digest % self.dim, 1.0 if digest >> 63 else -1.0
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+
+        for row, text in enumerate(texts):
+            for token in text.lower().split():
+                column, sign = self._feature(token)
+                matrix[row, column] += sign
+
+        return normalize_rows(matrix)
+
+
+class OpenAIEmbedder(Embedder):
+    """مولد متجهات OpenAI"""
+
+    def __init__(self, model: str = "text-embedding-3-small", dim: int = 1536):
+        import openai
+
+        self.client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        self.model = model
+        self.name = f"openai-{model}"
+        self.dim = dim
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        response = self.client.embeddings.create(model=self.model, input=list(texts))
+        matrix = np.array([item.embedding for item in response.data], dtype=np.float32)
+        return normalize_rows(matrix)
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """تطبيع الصفوف لطول 1 حتى يصبح الضرب النقطي = تشابه cosine"""
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    matrix /= norms
+    return matrix
+
+
+def embed_texts(embedder: Embedder, texts: Sequence[str]) -> np.ndarray:
+    """إنشاء المتجهات داخل عملية منفصلة (دالة على مستوى الوحدة لتُنقل بـ pickle)"""
+    return embedder.embed(texts)
+
+
+def create_embedder() -> Embedder:
+    """اختيار مولد المتجهات من متغيرات البيئة"""
+    kind = os.getenv("SUROOH_EMBEDDER", "hashing")
+
+    if kind == "openai":
+        return OpenAIEmbedder(model=os.getenv("SUROOH_EMBEDDING_MODEL", "text-embedding-3-small"))
+    if kind == "hashing":
+        return HashingEmbedder(dim=int(os.getenv("SUROOH_EMBEDDING_DIM", "256")))
+
+    raise ValueError(f"مولد متجهات غير معروف: {kind}")
+
+
+class VectorStore:
+    """مخزن متجهات بمصفوفة float32 متصلة (في الذاكرة أو ملف mmap)"""
+
+    def __init__(
+        self,
+        dim: int,
+        path: Optional[str] = None,
+        initial_capacity: int = 1024,
+        lock: Optional[Callable[[], ContextManager]] = None
+    ):
+        self.dim = dim
+        self.path = path
+        self.size = 0
+        self.lock = lock or nullcontext  # قفل الكتابة عند مشاركة الملفات بين عدة عمليات
+
+        if path is None:
+            self._matrix = np.zeros((initial_capacity, dim), dtype=np.float32)
+            self._keys = np.zeros(initial_capacity, dtype=np.int64)
+        else:
+            self._open_files()
+
+    def _open_files(self):
+        """فتح ملفات المتجهات والمفاتيح مع حذف أي صف ناقص"""
+        vectors_path, keys_path = self.path + ".f32", self.path + ".keys"
+        for file_path in (vectors_path, keys_path):
+            if not os.path.exists(file_path):
+                open(file_path, "wb").close()
+
+        row_bytes = self.dim * 4
+        with self.lock():
+            self.size = min(os.path.getsize(vectors_path) // row_bytes, os.path.getsize(keys_path) // 8)
+
+            for file_path, width in ((vectors_path, row_bytes), (keys_path, 8)):
+                with open(file_path, "r+b") as handle:
+                    handle.truncate(self.size * width)
+
+        self._vectors_writer = open(vectors_path, "ab")
+        self._keys_writer = open(keys_path, "ab")
+        self._mapped_size = -1
+
+    def refresh(self):
+        """رؤية المتجهات التي أضافتها عمليات أخرى"""
+        if self.path is not None:
+            self.size = min(
+                os.fstat(self._vectors_writer.fileno()).st_size // (self.dim * 4),
+                os.fstat(self._keys_writer.fileno()).st_size // 8
+            )
+
+    def _remap(self):
+        """ربط الملفات بـ np.memmap بعد أي إضافة (عملية O(1))"""
+        if self._mapped_size == self.size:
+            return
+
+        if self.size == 0:
+            self._matrix = np.zeros((0, self.dim), dtype=np.float32)
+            self._keys = np.zeros(0, dtype=np.int64)
+        else:
+            self._matrix = np.memmap(self.path + ".f32", dtype=np.float32, mode="r", shape=(self.size, self.dim))
+            self._keys = np.memmap(self.path + ".keys", dtype=np.int64, mode="r", shape=(self.size,))
+        self._mapped_size = self.size
+
+    def __len__(self) -> int:
+        return self.size
+
+    @property
+    def matrix(self) -> np.ndarray:
+        """الصفوف المستخدمة فقط (بدون نسخ)"""
+        if self.path is not None:
+            self._remap()
+        return self._matrix[:self.size]
+
+    @property
+    def keys(self) -> np.ndarray:
+        """مفتاح كل صف (رقم القطعة في المخزن)"""
+        if self.path is not None:
+            self._remap()
+        return self._keys[:self.size]
+
+    def add(self, keys: Sequence[int], vectors: np.ndarray) -> range:
+        """إضافة متجهات وإرجاع أرقام صفوفها"""
+        count = len(keys)
+
+        if self.path is not None:
+            # عمليات أخرى قد تكون أضافت صفوفاً: رقم الصف يُحسب من حجم الملف تحت القفل
+            with self.lock():
+                self.refresh()
+                rows = range(self.size, self.size + count)
+                self._vectors_writer.write(np.ascontiguousarray(vectors, dtype=np.float32).tobytes())
+                self._keys_writer.write(np.asarray(keys, dtype=np.int64).tobytes())
+                self._vectors_writer.flush()
+                self._keys_writer.flush()
+                self.size = rows.stop
+            return rows
+
+        required = self.size + count
+        rows = range(self.size, required)
+
+        # مضاعفة السعة عند الحاجة للحفاظ على مصفوفة متصلة
+        if required > len(self._matrix):
+            capacity = max(required, 2 * len(self._matrix))
+            grown = np.zeros((capacity, self.dim), dtype=np.float32)
+            grown[:self.size] = self._matrix[:self.size]
+            self._matrix = grown
+
+            grown_keys = np.zeros(capacity, dtype=np.int64)
+            grown_keys[:self.size] = self._keys[:self.size]
+            self._keys = grown_keys
+
+        self._matrix[self.size:required] = vectors
+        self._keys[self.size:required] = keys
+        self.size = required
+        return rows
+
+    def search(self, query_vector: np.ndarray, top_k: int = 3) -> List[Tuple[int, float]]:
+        """أفضل top_k صف بعملية ضرب مصفوفة × متجه واحدة"""
+        if self.size == 0 or top_k <= 0:
+            return []
+
+        scores = self.matrix @ query_vector
+        k = min(top_k, self.size)
+
+        top_rows = np.argpartition(scores, -k)[-k:] if k < self.size else np.arange(self.size)
+        top_rows = top_rows[np.argsort(-scores[top_rows], kind="stable")]
+
+        return [(int(row), float(scores[row])) for row in top_rows]
+
+    def close(self):
+        if self.path is not None:
+            self._vectors_writer.close()
+            self._keys_writer.close()
@@ -0,0 +1,12 @@
+"""
+مسارات الاستيراد للاختبارات: وحدات المخ (system/brain) والمكونات المشتركة (surooh_common)
+"""
+
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+
+for path in (ROOT, ROOT / "system" / "brain"):
+    if str(path) not in sys.path:
+        sys.path.insert(0, str(path))
@@ -0,0 +1,148 @@
+"""
+اختبارات خط الإدخال (system/brain/ingestion.py) وحالة وظائفه المشتركة بين العمال
+"""
+
+import asyncio
+import os
+import socket
+
+import pytest
+
+from ingestion import IngestionJob, IngestionPipeline, JobRegistry, SharedJobView
+from shared_state import SharedState
+from test_task_queue import dead_pid
+
+
+@pytest.fixture(scope="module")
+def brain(tmp_path_factory):
+    """وحدة المخ محمّلة ببيانات مؤقتة (بدون تشغيل lifespan)"""
+    os.environ.setdefault("SUROOH_BRAIN_DATA_DIR", str(tmp_path_factory.mktemp("brain")))
+    import asgi
+    return asgi.load_brain()
+
+
+async def idle_handler(job):
+    pass
+
+
+def collect(view: SharedJobView) -> list:
+    async def scenario():
+        return [snapshot async for snapshot in view.watch(heartbeat=60)]
+    return asyncio.run(scenario())
+
+
+def test_restart_mid_job_marks_orphaned_job_failed(tmp_path):
+    path = str(tmp_path / "state.db")
+
+    # عامل توقف فجأة أثناء مرحلة المتجهات
+    crashed = SharedState(path)
+    crashed.worker_id = f"{socket.gethostname()}:{dead_pid()}"
+    registry = JobRegistry(shared=crashed)
+    job = IngestionJob("doc-1", "نص", {})
+    registry.add(job)
+    job.update("embedding", chunks_total=10, chunks_processed=4)
+    crashed.close()
+
+    # عامل آخر يقرأ اللقطة قبل إعادة التشغيل: ما زالت جارية
+    other = SharedState(path)
+    assert other.get_ingest_job("doc-1")["state"] == "embedding"
+
+    restarted = SharedState(path)
+
+    async def start_and_stop():
+        pipeline = IngestionPipeline(idle_handler, shared=restarted)
+        pipeline.start()
+        await pipeline.stop()
+
+    asyncio.run(start_and_stop())
+
+    snapshot = other.get_ingest_job("doc-1")
+    assert snapshot["state"] == "failed"
+    assert snapshot["chunks_processed"] == 4
+    assert snapshot["error"]
+
+    # المتابعة من عامل آخر تنتهي فوراً بالحالة النهائية
+    view = SharedJobView(snapshot, lambda: other.get_ingest_job("doc-1"))
+    assert [s["state"] for s in collect(view)] == ["failed"]
+    other.close()
+    restarted.close()
+
+
+def test_recover_keeps_jobs_of_live_workers(tmp_path):
+    state = SharedState(str(tmp_path / "state.db"))  # هذه العملية نفسها حية
+    registry = JobRegistry(shared=state)
+    job = IngestionJob("doc-1", "نص", {})
+    registry.add(job)
+    job.update("chunking")
+
+    assert state.recover_ingest_jobs() == (0, 0)
+    assert state.get_ingest_job("doc-1")["state"] == "chunking"
+    state.close()
+
+
+def test_recover_prunes_old_rows(tmp_path):
+    state = SharedState(str(tmp_path / "state.db"))
+    registry = JobRegistry(shared=state)
+    job = IngestionJob("doc-1", "نص", {})
+    registry.add(job)
+    job.update("completed")
+
+    assert state.recover_ingest_jobs(retention_seconds=3600) == (0, 0)
+    assert state.recover_ingest_jobs(retention_seconds=0) == (0, 1)
+    assert state.get_ingest_job("doc-1") is None
+    state.close()
+
+
+def test_watch_gives_up_on_stale_snapshot():
+    snapshot = IngestionJob("doc-1", "نص", {}).to_dict()
+    snapshot["state"] = "embedding"
+    view = SharedJobView(snapshot, lambda: dict(snapshot), poll_interval=0.01, stale_after=0.1)
+
+    states = [s["state"] for s in collect(view) if s is not None]
+    assert states == ["embedding", "failed"]
+
+
+def test_watch_follows_progress_until_final_state():
+    snapshots = iter([
+        {"ingestion_id": "doc-1", "state": "embedding", "chunks_processed": 1},
+        {"ingestion_id": "doc-1", "state": "embedding", "chunks_processed": 1},
+        {"ingestion_id": "doc-1", "state": "completed", "chunks_processed": 2}
+    ])
+    view = SharedJobView(
+        {"ingestion_id": "doc-1", "state": "queued", "chunks_processed": 0},
+        lambda: next(snapshots), poll_interval=0.01
+    )
+
+    assert [s["state"] for s in collect(view)] == ["queued", "embedding", "completed"]
+
+
+def close_memory(memory):
+    memory.store.close()
+    memory.vectors.close()
+    memory.state.close()
+
+
+def test_ingest_during_warm_up_sees_existing_documents(brain, tmp_path):
+    data_dir = str(tmp_path / "brain")
+    content = "وثيقة مخزنة قبل إعادة التشغيل"
+
+    before = brain.MemoryService(data_dir)
+    asyncio.run(before.warm_up())
+    assert not asyncio.run(before.store_document("doc-1", content, {}))["duplicate"]
+    close_memory(before)
+
+    # بعد إعادة التشغيل يصل نفس المحتوى قبل أن يبدأ الإحماء
+    restarted = brain.MemoryService(data_dir)
+
+    async def scenario():
+        stored, _ = await asyncio.gather(restarted.store_document("doc-2", content, {}), restarted.warm_up())
+        return stored
+
+    try:
+        stored = asyncio.run(scenario())
+        assert stored["duplicate"]
+        assert stored["doc_id"] == "doc-1"
+        assert restarted.store.document_count == 1
+        assert restarted.warmup["state"] == "ready"
+    finally:
+        close_memory(restarted)
@@ -0,0 +1,37 @@
+"""
+اختبارات مصنف النوايا المشترك (surooh_common/intent.py)
+"""
+
+import pytest
+
+from surooh_common.intent import category_classifier
+
+
+def legacy_category(message: str) -> str:
+    """تصنيف المخ قبل المصنف المشترك (surooh-project/brain/brain-server.py)"""
+    message = message.lower()
+    if any(word in message for word in ["موقع", "تطبيق", "برنامج", "نظام"]):
+        return "development"
+    if any(word in message for word in ["تصميم", "شعار", "واجهة"]):
+        return "design"
+    return "general"
+
+
+@pytest.mark.parametrize("message", [
+    "أريد موقع لشركتي",
+    "تطبيق جوال للطلبات",
+    "تصميم شعار جديد",
+    "تصميم واجهة وشعار وهوية لموقع المتجر",  # كلمة تطوير واحدة تغلب ثلاث كلمات تصميم
+    "شعار لبرنامج المحاسبة",
+    "نظام إدارة مع واجهة بسيطة",
+    "أحتاج منصة تعليمية",
+    "افتح متجر إلكتروني",
+    "كيف حالك اليوم؟",
+    "WEB APP",
+])
+def test_category_matches_legacy_routing(message):
+    assert category_classifier.classify(message).first(default="general") == legacy_category(message)
+
+
+def test_category_tolerates_spelling_variants():
+    assert category_classifier.classify("واجهه المستخدم").first(default="general") == "design"
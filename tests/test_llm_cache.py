@@ -0,0 +1,120 @@
+"""
+اختبارات كاش ردود نماذج اللغة (surooh_common/llm_cache.py) عبر LLMClient بالخلفية المحلية
+"""
+
+import asyncio
+
+import pytest
+
+from surooh_common.llm_cache import LLMCache, cache_key
+from surooh_common.llm_client import LLMClient
+
+
+class FakeClock:
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class CountingClient(LLMClient):
+    """LLMClient بالخلفية المحلية مع عدّ الاستدعاءات الفعلية للخلفية"""
+
+    def __init__(self, cache: LLMCache):
+        super().__init__(backend="fake", cache=cache)
+        self.backend_calls = 0
+        chat = self.backend.chat
+
+        async def counting_chat(**kwargs):
+            self.backend_calls += 1
+            return await chat(**kwargs)
+
+        self.backend.chat = counting_chat
+
+
+def ask(client, content: str, **kwargs):
+    messages = [{"role": "system", "content": "حلل الأمر"}, {"role": "user", "content": content}]
+    return asyncio.run(client.chat(model="gpt-4", messages=messages, **kwargs))
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def client(clock):
+    return CountingClient(LLMCache(max_entries=100, ttl=60, max_temperature=0.3, clock=clock))
+
+
+def test_hit_on_equivalent_prompt(client):
+    first = ask(client, "صمم  شعار\n\n\nلشركتي ", temperature=0.2)
+    second = ask(client, "صمم شعار\n\nلشركتي", temperature=0.2)
+
+    assert client.backend_calls == 1
+    assert getattr(second, "cached", False)
+    assert second.choices[0].message.content == first.choices[0].message.content
+    assert client.cache.memory_hits == 1
+
+
+def test_different_params_do_not_share_entries(client):
+    ask(client, "اكتب دالة", temperature=0.2, max_tokens=100)
+    ask(client, "اكتب دالة", temperature=0.2, max_tokens=200)
+    assert client.backend_calls == 2
+
+
+def test_miss_above_max_temperature(client):
+    ask(client, "اكتب قصة", temperature=0.7)
+    ask(client, "اكتب قصة", temperature=0.7)
+    assert client.backend_calls == 2
+    assert client.cache.stores == 0
+
+
+@pytest.mark.parametrize("params", [{}, {"temperature": None}])
+def test_default_temperature_not_cached(client, params):
+    ask(client, "اكتب قصة", **params)
+    ask(client, "اكتب قصة", **params)
+    assert client.backend_calls == 2
+
+
+def test_unserializable_params_skip_cache(client):
+    params = {"temperature": 0.0, "metadata": object()}
+    assert cache_key("gpt-4", [{"role": "user", "content": "x"}], params) is None
+
+    ask(client, "اكتب دالة", **params)
+    ask(client, "اكتب دالة", **params)
+    assert client.backend_calls == 2
+    assert client.cache.stores == 0
+
+
+def test_ttl_expiry(client, clock):
+    ask(client, "اكتب دالة", temperature=0.0)
+
+    clock.now += 59
+    ask(client, "اكتب دالة", temperature=0.0)
+    assert client.backend_calls == 1
+
+    clock.now += 2
+    ask(client, "اكتب دالة", temperature=0.0)
+    assert client.backend_calls == 2
+
+
+def test_sqlite_tier_survives_new_instance(tmp_path, clock):
+    db_path = str(tmp_path / "llm_cache.db")
+    first = CountingClient(LLMCache(ttl=60, db_path=db_path, clock=clock))
+    ask(first, "اكتب دالة", temperature=0.0)
+    first.cache.close()
+
+    second = CountingClient(LLMCache(ttl=60, db_path=db_path, clock=clock))
+    response = ask(second, "اكتب دالة", temperature=0.0)
+    assert second.backend_calls == 0
+    assert response.cached
+    assert second.cache.disk_hits == 1
+
+    # المدخل المنتهي لا يُقرأ من القرص أيضاً
+    second.cache.memory.clear()
+    clock.now += 61
+    ask(second, "اكتب دالة", temperature=0.0)
+    assert second.backend_calls == 1
+    second.cache.close()
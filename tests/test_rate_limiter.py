@@ -0,0 +1,256 @@
+"""
+اختبارات محدد معدل الطلبات (system/brain/rate_limiter.py) بساعة محقونة
+"""
+
+import asyncio
+import os
+
+import pytest
+from fastapi import HTTPException
+
+from rate_limiter import MemoryBackend, RateLimitPolicy, TokenBucketLimiter
+
+
+class FakeClock:
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def limiter(clock):
+    # 10 طلبات كل 100 ثانية: طلب جديد كل 10 ثوانٍ
+    return TokenBucketLimiter(MemoryBackend(clock=clock), {"query": RateLimitPolicy(limit=10, window=100)})
+
+
+def acquire(limiter, user_id: str = "u1", route: str = "query", **kwargs):
+    return asyncio.run(limiter.acquire(user_id, route, **kwargs))
+
+
+def test_burst_up_to_limit_then_rejected(limiter):
+    decisions = [acquire(limiter) for _ in range(10)]
+    assert all(decision.allowed for decision in decisions)
+    assert [decision.headers()["X-RateLimit-Remaining"] for decision in decisions[-3:]] == ["2", "1", "0"]
+
+    rejected = acquire(limiter)
+    assert not rejected.allowed
+    assert rejected.retry_after == pytest.approx(10.0)
+
+
+def test_refill_over_time(limiter, clock):
+    for _ in range(10):
+        acquire(limiter)
+    assert not acquire(limiter).allowed
+
+    clock.advance(9.9)
+    assert not acquire(limiter).allowed
+
+    clock.advance(0.1)
+    assert acquire(limiter).allowed
+    assert not acquire(limiter).allowed
+
+    # الرصيد لا يتجاوز الحد مهما طال الخمول
+    clock.advance(10_000)
+    assert sum(acquire(limiter).allowed for _ in range(15)) == 10
+
+
+def test_buckets_are_per_user_and_route(clock):
+    limiter = TokenBucketLimiter(MemoryBackend(clock=clock), {
+        "query": RateLimitPolicy(limit=1, window=60),
+        "ingest": RateLimitPolicy(limit=1, window=60)
+    })
+    assert acquire(limiter, "u1", "query").allowed
+    assert not acquire(limiter, "u1", "query").allowed
+    assert acquire(limiter, "u2", "query").allowed
+    assert acquire(limiter, "u1", "ingest").allowed
+
+
+def test_cost_and_tier_policy(clock):
+    limiter = TokenBucketLimiter(MemoryBackend(clock=clock), {
+        "ingest_batch": RateLimitPolicy(limit=10, window=100),
+        "ingest_batch@premium": RateLimitPolicy(limit=100, window=100, bucket="ingest_batch")
+    })
+    assert acquire(limiter, route="ingest_batch", cost=8).allowed
+    assert not acquire(limiter, route="ingest_batch", cost=8).allowed
+    assert acquire(limiter, "u2", "ingest_batch", cost=80, tier="premium").allowed
+
+
+def test_headers(limiter, clock):
+    allowed = acquire(limiter)
+    assert allowed.headers() == {
+        "X-RateLimit-Limit": "10",
+        "X-RateLimit-Remaining": "9",
+        "X-RateLimit-Reset": "10"
+    }
+
+    for _ in range(9):
+        acquire(limiter)
+    clock.advance(2.5)
+    rejected = acquire(limiter)
+    assert rejected.headers() == {
+        "X-RateLimit-Limit": "10",
+        "X-RateLimit-Remaining": "0",
+        "X-RateLimit-Reset": "98",
+        "Retry-After": "8"
+    }
+
+
+@pytest.fixture(scope="module")
+def brain(tmp_path_factory):
+    """وحدة المخ محمّلة ببيانات مؤقتة (بدون تشغيل lifespan)"""
+    os.environ.setdefault("SUROOH_BRAIN_DATA_DIR", str(tmp_path_factory.mktemp("brain")))
+    import asgi
+    return asgi.load_brain()
+
+
+def test_gateway_returns_429_when_burst_exhausted(brain, limiter):
+    gateway = brain.APIGateway()
+    gateway.rate_limiter = limiter
+
+    for _ in range(10):
+        asyncio.run(gateway.check_rate_limit("u1", "query"))
+
+    with pytest.raises(HTTPException) as rejected:
+        asyncio.run(gateway.check_rate_limit("u1", "query"))
+    assert rejected.value.status_code == 429
+    assert rejected.value.headers["Retry-After"] == "10"
+    assert rejected.value.headers["X-RateLimit-Remaining"] == "0"
+
+
+def shared_limiter(path: str, clock) -> TokenBucketLimiter:
+    from rate_limiter import SharedMemoryBackend
+
+    return TokenBucketLimiter(
+        SharedMemoryBackend(path, slots=1024, clock=clock), {"query": RateLimitPolicy(limit=10, window=100)}
+    )
+
+
+def test_shared_memory_instances_enforce_one_budget(tmp_path, clock):
+    path = str(tmp_path / "rate_limits.bin")
+    first, second = shared_limiter(path, clock), shared_limiter(path, clock)
+    try:
+        allowed = [acquire(limiter).allowed for limiter in (first, second) * 8]
+        assert sum(allowed) == 10
+        assert not acquire(first).allowed and not acquire(second).allowed
+
+        # الرصيد المسترد يظهر للنسختين
+        clock.advance(10)
+        assert acquire(second).allowed
+        assert not acquire(first).allowed
+    finally:
+        first.close()
+        second.close()
+
+
+def _acquire_in_process(path: str, attempts: int, results):
+    limiter = shared_limiter(path, FakeClock())  # نفس الساعة الثابتة: بدون استرداد أثناء الاختبار
+    results.put(sum(acquire(limiter).allowed for _ in range(attempts)))
+    limiter.close()
+
+
+def test_shared_memory_budget_across_processes(tmp_path):
+    import multiprocessing
+
+    path = str(tmp_path / "rate_limits.bin")
+    shared_limiter(path, FakeClock()).close()  # إنشاء الجدول قبل بدء العمليات
+
+    context = multiprocessing.get_context("fork")
+    results = context.Queue()
+    workers = [context.Process(target=_acquire_in_process, args=(path, 10, results)) for _ in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(10)
+
+    assert sum(results.get(timeout=5) for _ in workers) == 10
+
+
+def test_shared_memory_tracks_occupied_slots(tmp_path, clock):
+    from rate_limiter import SharedMemoryBackend
+
+    path = str(tmp_path / "rate_limits.bin")
+    first, second = shared_limiter(path, clock), shared_limiter(path, clock)
+    try:
+        for user_id in ("u1", "u2", "u3", "u1"):
+            acquire(first, user_id)
+        assert first.stats()["tracked_buckets"] == 3
+        assert second.stats()["tracked_buckets"] == 3
+    finally:
+        first.close()
+        second.close()
+
+    # خانة واحدة: الاستبدال لا يزيد العدد، والدلو الممتلئ يُفرَّغ قبل إعادة استخدامه
+    single = TokenBucketLimiter(
+        SharedMemoryBackend(str(tmp_path / "single.bin"), slots=1, probe=1, clock=clock),
+        {"query": RateLimitPolicy(limit=10, window=100)}
+    )
+    try:
+        acquire(single, "u1")
+        acquire(single, "u2")
+        assert single.stats()["tracked_buckets"] == 1
+        clock.advance(100)
+        acquire(single, "u3")
+        assert single.stats()["tracked_buckets"] == 1
+    finally:
+        single.close()
+
+
+def test_shared_memory_lock_does_not_block_event_loop(tmp_path, clock):
+    import fcntl
+
+    path = str(tmp_path / "rate_limits.bin")
+    limiter = shared_limiter(path, clock)
+    holder = os.open(path, os.O_RDWR)
+
+    async def scenario():
+        # عامل آخر يحمل القفل: الطلب ينتظر دون إيقاف بقية المهام
+        fcntl.flock(holder, fcntl.LOCK_EX)
+        task = asyncio.ensure_future(limiter.acquire("u1", "query"))
+        for _ in range(5):
+            await asyncio.sleep(0)
+        assert not task.done()
+
+        fcntl.flock(holder, fcntl.LOCK_UN)
+        return await task
+
+    try:
+        assert asyncio.run(scenario()).allowed
+    finally:
+        os.close(holder)
+        limiter.close()
+
+
+def test_redis_instances_enforce_one_budget():
+    redis = pytest.importorskip("redis")
+    from rate_limiter import RedisBackend
+
+    url = os.getenv("SUROOH_REDIS_URL", "redis://localhost:6379/0")
+    try:
+        redis.Redis.from_url(url, socket_connect_timeout=0.5).ping()
+    except redis.RedisError:
+        pytest.skip(f"redis غير متاح على {url}")
+
+    async def scenario():
+        prefix = f"surooh:test:{os.getpid()}:"
+        policies = {"query": RateLimitPolicy(limit=10, window=3600)}
+        first = TokenBucketLimiter(RedisBackend(url, prefix=prefix), policies)
+        second = TokenBucketLimiter(RedisBackend(url, prefix=prefix), policies)
+        try:
+            decisions = [await limiter.acquire("u1", "query") for limiter in (first, second) * 8]
+            return sum(decision.allowed for decision in decisions)
+        finally:
+            await first.backend.client.delete(prefix + "u1:query")
+            await first.backend.client.aclose()
+            await second.backend.client.aclose()
+
+    assert asyncio.run(scenario()) == 10
@@ -0,0 +1,83 @@
+"""
+اختبارات الموجّه الدلالي (surooh_common/semantic_router.py)
+"""
+
+import json
+
+from surooh_common.semantic_router import SemanticRouter
+
+
+def read_lines(path) -> list:
+    with open(path, encoding="utf-8") as handle:
+        return [json.loads(line) for line in handle]
+
+
+def test_near_duplicate_routes_to_learned_bot():
+    router = SemanticRouter()
+    router.learn("أريد تصميم شعار لشركتي الجديدة", "design_genius")
+
+    match = router.route("أريد تصميم شعار لشركتي الجديده")
+    assert match is not None
+    assert match.bot == "design_genius"
+
+
+def test_shared_words_with_different_task_do_not_match():
+    router = SemanticRouter()
+    router.learn("أريد تصميم شعار لشركتي الجديدة", "design_genius")
+
+    # نفس الكلمات تقريباً لكن المهمة برمجة
+    assert router.route("أريد كود لشركتي الجديدة") is None
+    # بدون كلمات مفتاحية: التشابه وحده تحت العتبة
+    assert router.route("أريد تطبيق لشركتي الجديدة") is None
+
+
+def test_classifier_vetoes_similar_command_for_another_bot():
+    router = SemanticRouter(threshold=0.7)
+    router.learn("أريد تصميم شعار لشركتي الجديدة", "design_genius")
+
+    assert router.route("أريد كود لشركتي الجديدة") is None
+    assert router.vetoed == 1
+
+    without_check = SemanticRouter(threshold=0.7, classifier=None)
+    without_check.learn("أريد تصميم شعار لشركتي الجديدة", "design_genius")
+    assert without_check.route("أريد كود لشركتي الجديدة").bot == "design_genius"
+
+
+def test_learn_skips_unchanged_choice(tmp_path):
+    path = str(tmp_path / "router.jsonl")
+    router = SemanticRouter(path=path)
+    router.learn("اكتب دالة بايثون", "code_master")
+    router.learn("اكتب دالة بايثون", "code_master")
+    router.learn("اكتب  دالة بايثون", "code_master")
+    assert len(read_lines(path)) == 1
+
+    router.learn("اكتب دالة بايثون", "fullstack_pro")
+    assert read_lines(path)[-1] == {"command": "اكتب دالة بايثون", "bot": "fullstack_pro"}
+    assert len(router) == 1
+
+
+def test_eviction_compacts_file(tmp_path):
+    path = str(tmp_path / "router.jsonl")
+    router = SemanticRouter(max_entries=8, path=path)
+    for i in range(20):
+        router.learn(f"مهمة رقم {i} للبوت", "code_master")
+
+    lines = read_lines(path)
+    assert [line["command"] for line in lines] == router.commands
+    assert len(lines) <= 8
+
+    reloaded = SemanticRouter(max_entries=8, path=path)
+    assert reloaded.commands == router.commands
+
+
+def test_load_compacts_duplicate_lines(tmp_path):
+    path = tmp_path / "router.jsonl"
+    path.write_text(
+        "\n".join(json.dumps({"command": "صمم شعار", "bot": bot}, ensure_ascii=False)
+                  for bot in ("code_master", "design_genius")) + "\n{\"command\": \"ناقص",
+        encoding="utf-8"
+    )
+
+    router = SemanticRouter(path=str(path))
+    assert router.bots == ["design_genius"]
+    assert read_lines(path) == [{"command": "صمم شعار", "bot": "design_genius"}]
@@ -0,0 +1,34 @@
+"""
+اختبارات اختيار البوت في Smart Core الذكي (system/smartcore/intelligent-smartcore.py)
+"""
+
+import importlib.util
+from pathlib import Path
+
+import pytest
+
+SMARTCORE_PATH = Path(__file__).resolve().parents[1] / "system" / "smartcore" / "intelligent-smartcore.py"
+
+
+@pytest.fixture(scope="module")
+def smartcore():
+    """اسم الملف غير قابل للاستيراد مباشرة، فيُحمّل من مساره"""
+    spec = importlib.util.spec_from_file_location("intelligent_smartcore", SMARTCORE_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module.IntelligentSmartCore()
+
+
+def test_named_bot_wins_over_keyword_scores(smartcore):
+    # كلمات التصميم في التحليل أثقل من وزن الاسم، لكن النموذج سمّى البوت صراحة
+    analysis = "البوت المناسب: code_master، رغم ذكر تصميم واجهة ui وشعار وهوية بصرية وبوستر"
+    assert smartcore.extract_bot_from_analysis(analysis) == "code_master"
+
+
+def test_named_bot_is_case_insensitive(smartcore):
+    assert smartcore.extract_bot_from_analysis("Recommended bot: Design_Genius") == "design_genius"
+
+
+def test_keywords_used_when_no_bot_named(smartcore):
+    assert smartcore.extract_bot_from_analysis("المهمة تصميم شعار") == "design_genius"
+    assert smartcore.extract_bot_from_analysis("تحليل عام") == "fullstack_pro"
@@ -0,0 +1,120 @@
+"""
+اختبارات بث الردود بين الخدمات (surooh_common/streaming.py)
+
+بث SSE من task_events يُمرر كرد aiohttp مزيف إلى collect_events ثم إلى TokenChannel،
+كما يفعل Smart Core عند تمرير بث البوت للمخ
+"""
+
+import asyncio
+
+import pytest
+
+from surooh_common.streaming import StreamError, TokenChannel, collect_events, sse_event, task_events
+
+
+class FakeResponse:
+    """رد aiohttp مزيف: content يعطي أسطر البث كبايتات كما تصل من الشبكة"""
+
+    def __init__(self, body: str):
+        self.content = self._lines(body)
+
+    @staticmethod
+    async def _lines(body: str):
+        for line in body.splitlines(keepends=True):
+            yield line.encode("utf-8")
+
+
+async def render(events) -> str:
+    return "".join([event async for event in events])
+
+
+def drain(channel: TokenChannel) -> list:
+    items = []
+    while not channel.queue.empty():
+        items.append(channel.queue.get_nowait())
+    return items
+
+
+async def relay(body: str):
+    """تمرير بث إلى قناة جديدة كما في Smart Core (مع وسم البوت)"""
+    channel = TokenChannel()
+    try:
+        result = await collect_events(FakeResponse(body), channel, bot="code_master")
+    finally:
+        tokens = drain(channel)
+    return result, tokens
+
+
+async def bot_stream(run) -> str:
+    return await render(task_events(run))
+
+
+def test_relay_preserves_token_order_and_done_payload():
+    async def run(channel):
+        for part in ["def ", "add", "(a, b)", ":\n", "    return a + b"]:
+            channel(part)
+            await asyncio.sleep(0)
+        return {"success": True, "result": {"code": "def add(a, b):\n    return a + b"}}
+
+    async def scenario():
+        return await relay(await bot_stream(run))
+
+    result, tokens = asyncio.run(scenario())
+    assert "".join(token["text"] for token in tokens) == "def add(a, b):\n    return a + b"
+    assert [token["text"] for token in tokens][:2] == ["def ", "add"]
+    assert all(token["bot"] == "code_master" for token in tokens)
+    assert result == {"success": True, "result": {"code": "def add(a, b):\n    return a + b"}}
+
+
+def test_token_meta_survives_relay():
+    async def run(channel):
+        channel("تحليل", stage="analysis")
+        channel("وصف", stage="description")
+        return {"success": True}
+
+    async def scenario():
+        return await relay(await bot_stream(run))
+
+    _, tokens = asyncio.run(scenario())
+    assert tokens == [
+        {"text": "تحليل", "stage": "analysis", "bot": "code_master"},
+        {"text": "وصف", "stage": "description", "bot": "code_master"}
+    ]
+
+
+def test_error_event_raises_after_partial_tokens():
+    async def run(channel):
+        channel("جزء أول")
+        raise RuntimeError("انتهت مهلة النموذج")
+
+    async def scenario():
+        body = await bot_stream(run)
+        assert "event: error" in body
+        return await relay(body)
+
+    with pytest.raises(StreamError, match="انتهت مهلة النموذج"):
+        asyncio.run(scenario())
+
+
+def test_truncated_stream_raises():
+    body = sse_event("token", {"text": "def "}) + sse_event("token", {"text": "add"})
+
+    with pytest.raises(StreamError, match="انقطع البث"):
+        asyncio.run(relay(body))
+
+    # حدث done مقطوع قبل السطر الفارغ الذي ينهيه لا يُحسب
+    cut = body + sse_event("done", {"success": True})[:-1]
+    with pytest.raises(StreamError):
+        asyncio.run(relay(cut))
+
+
+def test_keep_alive_comments_and_crlf_are_ignored():
+    body = (
+        ": keep-alive\r\n\r\n"
+        + sse_event("token", {"text": "أ"}).replace("\n", "\r\n")
+        + ": keep-alive\n\n"
+        + sse_event("done", {"success": True})
+    )
+    result, tokens = asyncio.run(relay(body))
+    assert [token["text"] for token in tokens] == ["أ"]
+    assert result == {"success": True}
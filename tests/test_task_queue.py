@@ -0,0 +1,195 @@
+"""
+اختبارات طابور المهام الدائم (system/brain/task_queue.py)
+"""
+
+import socket
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+from task_queue import TaskQueue
+
+
+@pytest.fixture
+def queue_path(tmp_path):
+    return str(tmp_path / "tasks.db")
+
+
+@pytest.fixture
+def queue(queue_path):
+    task_queue = TaskQueue(queue_path)
+    yield task_queue
+    task_queue.close()
+
+
+def dead_pid() -> int:
+    """رقم عملية انتهت للتو (لا توجد عملية حية به)"""
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+    return process.pid
+
+
+def test_enqueue_claim_complete(queue):
+    queue.enqueue("t1", "code_master", "u1", "normal", {"command": "اكتب دالة"})
+
+    task = queue.claim("code_master")
+    assert task.task_id == "t1"
+    assert task.payload == {"command": "اكتب دالة"}
+    assert task.attempts == 1
+    assert queue.depth() == {"code_master": {"running": 1}}
+
+    # المهمة محجوزة: لا يحجزها منفذ آخر
+    assert queue.claim("code_master") is None
+
+    queue.complete("t1")
+    assert queue.depth() == {}
+    assert queue.claim("code_master") is None
+
+
+def test_running_task_recovered_after_restart(queue_path):
+    before = TaskQueue(queue_path, lease_seconds=3600)
+    before.worker_id = f"{socket.gethostname()}:{dead_pid()}"  # العملية الحاجزة توقفت فجأة
+    before.enqueue("t1", "code_master", "u1", "normal", {})
+    assert before.claim("code_master").task_id == "t1"
+    before.close()
+
+    after = TaskQueue(queue_path, lease_seconds=3600)
+    try:
+        assert after.recover() == 1
+        task = after.claim("code_master")
+        assert task.task_id == "t1"
+        assert task.attempts == 2
+    finally:
+        after.close()
+
+
+def test_live_claims_not_recovered(queue_path, queue):
+    queue.enqueue("t1", "code_master", "u1", "normal", {})
+    assert queue.claim("code_master") is not None
+
+    other = TaskQueue(queue_path)
+    try:
+        assert other.recover() == 0
+        assert other.claim("code_master") is None
+    finally:
+        other.close()
+
+
+def test_idle_claim_skips_write_lock(queue_path, queue):
+    queue.enqueue("t1", "design_genius", "u1", "normal", {})
+
+    # عامل آخر يحمل قفل الكتابة: المنفذ الخامل يرجع فوراً بدل انتظار القفل
+    writer = sqlite3.connect(queue_path, isolation_level=None)
+    writer.execute("BEGIN IMMEDIATE")
+    try:
+        started = time.monotonic()
+        assert queue.claim("code_master") is None
+        assert time.monotonic() - started < 1.0
+    finally:
+        writer.execute("ROLLBACK")
+        writer.close()
+
+    assert queue.claim("design_genius").task_id == "t1"
+
+
+def test_concurrent_dispatchers_claim_each_task_once(queue_path):
+    total = 200
+    producer = TaskQueue(queue_path)
+    for i in range(total):
+        producer.enqueue(f"t{i}", "code_master", f"u{i % 7}", "normal", {"i": i})
+    producer.close()
+
+    # منفذون باتصالات مستقلة كما في العمال المختلفين
+    dispatchers = [TaskQueue(queue_path, lease_seconds=3600) for _ in range(8)]
+    claimed = []
+    claimed_lock = threading.Lock()
+    start = threading.Barrier(len(dispatchers))
+
+    def dispatch(task_queue):
+        start.wait()
+        while True:
+            task = task_queue.claim("code_master")
+            if task is None:
+                return
+            with claimed_lock:
+                claimed.append(task.task_id)
+
+    threads = [threading.Thread(target=dispatch, args=(d,)) for d in dispatchers]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    for task_queue in dispatchers:
+        task_queue.close()
+
+    assert len(claimed) == total
+    assert len(set(claimed)) == total
+
+
+def backdate(task_queue, task_id: str, seconds: float):
+    """محاكاة انتظار المهمة في الطابور seconds ثانية"""
+    task_queue.db.execute(
+        "UPDATE task_queue SET enqueued_at = enqueued_at - ? WHERE task_id = ?", (seconds, task_id)
+    )
+
+
+def claim_order(task_queue, agent_name: str) -> list:
+    order = []
+    while True:
+        task = task_queue.claim(agent_name)
+        if task is None:
+            return order
+        order.append(task.task_id)
+
+
+def test_aging_lets_waiting_low_priority_task_overtake(queue_path):
+    queue = TaskQueue(queue_path, aging_seconds=60)
+    try:
+        queue.enqueue("old-low", "code_master", "u1", "low", {})
+        backdate(queue, "old-low", 180)  # ثلاث فترات انتظار: low ترتقي إلى high
+        queue.enqueue("new-high-1", "code_master", "u1", "high", {})
+        queue.enqueue("new-high-2", "code_master", "u1", "high", {})
+
+        assert claim_order(queue, "code_master") == ["old-low", "new-high-1", "new-high-2"]
+    finally:
+        queue.close()
+
+
+def test_aging_stops_below_urgent(queue_path):
+    queue = TaskQueue(queue_path, aging_seconds=60)
+    try:
+        queue.enqueue("old-low", "code_master", "u1", "low", {})
+        backdate(queue, "old-low", 3600)
+        queue.enqueue("fresh-low", "code_master", "u1", "low", {})
+        queue.enqueue("new-urgent", "code_master", "u1", "urgent", {})
+
+        assert claim_order(queue, "code_master") == ["new-urgent", "old-low", "fresh-low"]
+    finally:
+        queue.close()
+
+
+def test_fair_share_between_users(queue):
+    for i in range(10):
+        queue.enqueue(f"a{i}", "code_master", "heavy", "normal", {})
+    queue.enqueue("b0", "code_master", "light", "normal", {})
+    queue.enqueue("b1", "code_master", "light", "normal", {})
+
+    # مستخدم بعشر مهام سابقة لا يؤخر مهمتي المستخدم الآخر إلى النهاية
+    assert claim_order(queue, "code_master")[:4] == ["a0", "b0", "a1", "b1"]
+
+
+def test_user_weights_scale_share(queue_path):
+    queue = TaskQueue(queue_path, user_weights={"gold": 2})
+    try:
+        for i in range(6):
+            queue.enqueue(f"g{i}", "code_master", "gold", "normal", {})
+            queue.enqueue(f"s{i}", "code_master", "standard", "normal", {})
+
+        first_six = claim_order(queue, "code_master")[:6]
+        assert sum(task_id.startswith("g") for task_id in first_six) == 4
+    finally:
+        queue.close()